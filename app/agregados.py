@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Agregados mensuales materializados (CLI/lote --agregados, casilla de la GUI).
+- Al calcular un mes se escribe `<salida_dir>/agregados/agregado_AAAA-MM_<residente>.csv`:
+  horas, bruto y neto por (grado, tipo de día, municipio). Unas pocas filas por residente y mes.
+- Recalcular un mes solo reescribe su fichero (escritura atómica); los demás no se tocan.
+- El municipio se agrupa normalizado como en el calendario ("dos hermanas" = "Dos Hermanas") y se
+  escribe con el nombre de data/municipios_sevilla.csv. Las horas sin importe (grado con la
+  tarifa vacía) cuentan en horas pero no en bruto/neto, que quedan vacíos si no hay ningún importe.
+- Las consultas de varios meses (año hasta la fecha, certificados anuales) solo leen estos
+  ficheros, elegidos por su nombre, sin volver al detalle horario:
+  `python main.py agregados --anio 2025 --hasta 2025-06 --por residente grado`
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from app.calendario import _normalizar_municipio
+
+CARPETA = "agregados"  # dentro de la carpeta de salida
+COLUMNAS = ["residente", "mes", "grado", "tipo_dia", "municipio", "horas", "bruto", "neto"]
+CLAVES = ("residente", "mes", "grado", "tipo_dia", "municipio")
+_NOMBRE = re.compile(r"^agregado_(\d{4})-(\d{2})_(.+)\.csv$")
+
+def _texto(v) -> str:
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return ""
+    return str(v)
+
+def _numero(v):
+    """Importe como float; None si falta o es NaN."""
+    if v is None or (isinstance(v, str) and not v.strip()):
+        return None
+    v = float(v)
+    return None if math.isnan(v) else v
+
+@lru_cache(maxsize=None)
+def _nombres_municipios() -> dict:
+    """{municipio normalizado: nombre del listado}."""
+    from app.municipios import cargar_municipios
+    return {_normalizar_municipio(m): m for m in cargar_municipios()}
+
+def nombre_municipio(municipio) -> str:
+    """Nombre con el que se agrupa un municipio: el del listado, o el normalizado si no está."""
+    norm = _normalizar_municipio(_texto(municipio))
+    return _nombres_municipios().get(norm, norm)
+
+def acumular(acum: dict, detalle) -> dict:
+    """
+    Suma horas e importe del detalle (DataFrame o lista de dicts; horario, por segmentos o
+    por tramos) en acum[(grado, tipo_dia, municipio)] = [horas, importe]; el importe es None
+    mientras no haya ninguno (tarifa vacía).
+    """
+    campos = ("grado", "tipo_dia", "municipio", "horas", "importe")
+    if hasattr(detalle, "columns"):
+        if detalle.empty or "tipo_dia" not in detalle.columns:
+            return acum
+        filas = zip(*(detalle[c].tolist() for c in campos))
+    else:
+        filas = ((r["grado"], r["tipo_dia"], r.get("municipio", ""), r["horas"], r["importe"]) for r in detalle)
+    nombres = {}  # municipio tal cual -> nombre_municipio (una vez por valor distinto)
+    for grado, tipo, muni, horas, importe in filas:
+        nombre = nombres.get(muni)
+        if nombre is None:
+            nombre = nombres[muni] = nombre_municipio(muni)
+        v = acum.setdefault((_texto(grado), _texto(tipo), nombre), [0.0, None])
+        v[0] += float(horas)
+        importe = float(importe) if importe not in ("", None) else math.nan
+        if importe == importe:  # NaN: tarifa vacía
+            v[1] = importe if v[1] is None else v[1] + importe
+    return acum
+
+def acumulando(resultados, acum: dict):
+    """Deja pasar los (detalle, resumen) de `calcular_por_bloques` acumulando cada detalle."""
+    for detalle, resumen in resultados:
+        acumular(acum, detalle)
+        yield detalle, resumen
+
+def ruta_agregado(salida_dir: Path, residente: str, anio: int, mes: int) -> Path:
+    """Fichero del mes de `residente`, saneado como los nombres del CLI (sin / ni ..: no sale de agregados/)."""
+    residente = re.sub(r"[^A-Za-z0-9_-]+", "_", str(residente)) or "sin_nombre"
+    return Path(salida_dir) / CARPETA / f"agregado_{anio:04d}-{mes:02d}_{residente}.csv"
+
+def escribir_agregado(acum: dict, salida_dir: Path, residente: str, anio: int, mes: int,
+                      irpf_percent: float = 0.0) -> Path:
+    """Sustituye el fichero del mes de `residente` (vacío si no hay guardias)."""
+    path = ruta_agregado(salida_dir, residente, anio, mes)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(COLUMNAS)
+        for (grado, tipo, muni), (horas, importe) in sorted(acum.items()):
+            bruto = "" if importe is None else round(importe, 4)
+            neto = "" if importe is None else round(bruto * (1.0 - irpf_percent / 100.0), 4)
+            w.writerow([residente, f"{anio:04d}-{mes:02d}", grado, tipo, muni, round(horas, 4), bruto, neto])
+    os.replace(tmp, path)
+    return path
+
+def ficheros(carpeta: Path, anio: int = None, desde: str = None, hasta: str = None, residente: str = None) -> list:
+    """Ficheros de agregados de `carpeta` dentro del rango, elegidos solo por el nombre."""
+    out = []
+    for p in sorted(Path(carpeta).glob("agregado_*.csv")):
+        m = _NOMBRE.match(p.name)
+        if not m:
+            continue
+        mes = f"{m.group(1)}-{m.group(2)}"
+        if ((anio is not None and int(m.group(1)) != anio) or (desde and mes < desde) or
+                (hasta and mes > hasta) or (residente is not None and m.group(3) != residente)):
+            continue
+        out.append(p)
+    return out
+
+def consultar(carpeta: Path, por=("residente",), anio: int = None, desde: str = None, hasta: str = None,
+              residente: str = None, grado: str = None, tipo_dia: str = None, municipio: str = None) -> list:
+    """Horas, bruto y neto sumados por `por` (claves de CLAVES) sobre los meses pedidos."""
+    por = list(por or [])
+    for k in por:
+        if k not in CLAVES:
+            raise ValueError(f"agrupación desconocida: {k} (use {', '.join(CLAVES)})")
+    filtros = {"grado": grado, "tipo_dia": tipo_dia,
+               "municipio": None if municipio is None else nombre_municipio(municipio)}
+    totales = {}
+    for p in ficheros(carpeta, anio, desde, hasta, residente):
+        with open(p, newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                r["municipio"] = nombre_municipio(r["municipio"])  # ficheros escritos sin normalizar
+                if any(v is not None and r[k] != v for k, v in filtros.items()):
+                    continue
+                t = totales.setdefault(tuple(r[k] for k in por), [0.0, 0.0, 0.0])
+                t[0] += float(r["horas"]); t[1] += _numero(r["bruto"]) or 0.0; t[2] += _numero(r["neto"]) or 0.0
+    return [dict(zip(por, clave), horas=round(h, 4), bruto=round(b, 4), neto=round(n, 4))
+            for clave, (h, b, n) in sorted(totales.items())]
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(prog="main.py agregados",
+                                description="Totales de varios meses a partir de los agregados mensuales")
+    p.add_argument("--carpeta", type=Path, default=Path("output") / CARPETA)
+    p.add_argument("--por", nargs="*", default=["residente"], choices=list(CLAVES),
+                   help="Agrupar por estas claves (sin valores: total global)")
+    p.add_argument("--anio", type=int)
+    p.add_argument("--desde", help="Primer mes incluido (AAAA-MM)")
+    p.add_argument("--hasta", help="Último mes incluido (AAAA-MM); con --anio, año hasta la fecha")
+    p.add_argument("--residente")
+    p.add_argument("--grado")
+    p.add_argument("--tipo_dia", choices=["normal", "festivo", "especial"])
+    p.add_argument("--municipio")
+    p.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.carpeta.is_dir():
+        raise SystemExit(f"Error: no existe la carpeta de agregados {args.carpeta}")
+    t0 = time.perf_counter()
+    filas = consultar(args.carpeta, args.por, anio=args.anio, desde=args.desde, hasta=args.hasta,
+                      residente=args.residente, grado=args.grado, tipo_dia=args.tipo_dia,
+                      municipio=args.municipio)
+    ms = (time.perf_counter() - t0) * 1000
+    if args.json:
+        print(json.dumps(filas, ensure_ascii=False, indent=2))
+        return
+    columnas = list(args.por) + ["horas", "bruto", "neto"]
+    anchos = [max([len(c)] + [len(str(f[c])) for f in filas]) for c in columnas]
+    print("  ".join(c.ljust(a) for c, a in zip(columnas, anchos)))
+    for f in filas:
+        print("  ".join(str(f[c]).ljust(a) for c, a in zip(columnas, anchos)))
+    print(f"({len(filas)} filas, {ms:.1f} ms)")
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Caché de resultados por guardia para recálculos incrementales (GUI y CLI --cache).
+- Clave: hash de la fila normalizada + % IRPF + municipio por defecto.
+- Todas las entradas pertenecen a una huella de configuración (`huella_cache`: contenido de
+  reglas.yml, tarifas.xlsx, festivos de data/ y el festivos.bin con el que se calcula); si la
+  huella cambia, la caché se vacía.
+- Solo se calculan las guardias nuevas o modificadas (con el núcleo de app/nucleo.py).
+  La clave no incluye `--motor`: los tres motores dan el mismo resultado con la resolución
+  de 60 min, que es la única con la que el CLI admite `--cache` para el de intervalos.
+Sin pandas: devuelve listas de dicts, como app/rapido.py.
+"""
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+
+from app.nucleo import calcular_guardia, limitar_irpf
+from app.festivos_compilados import NOMBRE_COMPILADO, festivos_al_dia, fuentes_festivos
+
+RUTA_CACHE = Path(".cache/resultados.pkl")
+VERSION = 1
+
+# Campos de la guardia que influyen en el resultado
+CAMPOS = ["inicio_datetime", "fin_datetime", "municipio", "tipo_guardia", "grado",
+          "observaciones", "tipo_ini", "tipo_fin"]
+
+def fuentes_config(reglas_path: Path = Path("config/reglas.yml"),
+                   tarifas_path: Path = Path("config/tarifas.xlsx"),
+                   base: Path = Path("data")) -> list:
+    """
+    Ficheros de origen de los resultados: reglas, tarifas y `fuentes_festivos` (de los que se
+    compila data/festivos.bin). Es lo que vigilan el servicio y `vigilar`.
+    """
+    return [Path(reglas_path), Path(tarifas_path)] + fuentes_festivos(base)
+
+def huella_config(rutas) -> str:
+    h = hashlib.sha1(f"v{VERSION}".encode())
+    for p in rutas:
+        h.update(str(p).encode())
+        try:
+            h.update(Path(p).read_bytes())
+        except OSError:
+            h.update(b"<ausente>")
+    return h.hexdigest()
+
+def huella_cache(reglas_path: Path = Path("config/reglas.yml"),
+                 tarifas_path: Path = Path("config/tarifas.xlsx"),
+                 base: Path = Path("data")) -> str:
+    """
+    Huella de `fuentes_config` más el festivos.bin con el que se calcula. Lo pone al día
+    antes, para que recompilarlo durante el cálculo no vacíe la caché en la siguiente ejecución.
+    """
+    festivos_al_dia(base)
+    return huella_config(fuentes_config(reglas_path, tarifas_path, base) + [Path(base) / NOMBRE_COMPILADO])
+
+def clave_guardia(row, irpf: float, municipio_default: str) -> str:
+    valores = [str(row.get(c, "") or "") for c in CAMPOS] + [repr(irpf), municipio_default or ""]
+    return hashlib.sha1(json.dumps(valores, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class CacheResultados:
+    def __init__(self, ruta: Path = None, max_guardias: int = 200_000):
+        self.ruta = Path(ruta) if ruta else None
+        self.max_guardias = max_guardias
+        self.huella = None
+        self._entradas = OrderedDict()  # clave -> (bloques del detalle, fila del resumen)
+        self.aciertos = 0
+        self.fallos = 0
+        self._modificada = False
+        if self.ruta and self.ruta.exists():
+            try:
+                with open(self.ruta, "rb") as f:
+                    datos = pickle.load(f)
+                if datos.get("version") == VERSION:
+                    self.huella = datos["huella"]
+                    self._entradas = datos["entradas"]
+            except Exception:
+                pass
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _preparar(self, huella: str):
+        if huella != self.huella:
+            self._entradas.clear()
+            self.huella = huella
+            self._modificada = True
+
+    def calcular(self, filas, columnas, calendario, tarifas, huella: str,
+                 irpf_percent: float = 0.0, municipio_default: str = ""):
+        """
+        Como rapido.calcular: (detalle, resumen) como listas de dicts, en el orden de `filas`.
+        Las guardias ya vistas con la misma huella no se recalculan.
+        """
+        self._preparar(huella)
+        has_ini = "tipo_ini" in columnas
+        has_fin = "tipo_fin" in columnas
+        irpf = limitar_irpf(irpf_percent)
+        self.aciertos = self.fallos = 0
+        detalle, resumen = [], []
+        for row in filas:
+            clave = clave_guardia(row, irpf, municipio_default)
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                entrada = calcular_guardia(row, calendario, tarifas, irpf, has_ini, has_fin)
+                self._entradas[clave] = entrada
+                self.fallos += 1
+                self._modificada = True
+            else:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+            detalle.extend(entrada[0])
+            resumen.append(entrada[1])
+        while len(self._entradas) > self.max_guardias:
+            self._entradas.popitem(last=False)
+        return detalle, resumen
+
+    def guardar(self):
+        """Persiste la caché en `ruta` (solo si cambió desde que se cargó)."""
+        if not self.ruta or not self._modificada:
+            return
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.ruta.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": VERSION, "huella": self.huella, "entradas": self._entradas}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.ruta)
+        self._modificada = False
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from pandas.api.types import union_categoricals
+from datetime import datetime, time, timedelta
 
-def _parse_dt(s: str) -> datetime:
-    return datetime.fromisoformat(str(s).strip())
+from app.nucleo import (COLUMNAS_RESUMEN, TIPOS_DIA as _TIPOS_DIA, calcular_guardia, limitar_irpf,
+                        parse_dt as _parse_dt, tipos_forzados)
 
 def calcular_importes(
     df_guardias: pd.DataFrame,
@@ -29,70 +31,502 @@ def calcular_importes(
 
     has_ini = "tipo_ini" in df_guardias.columns
     has_fin = "tipo_fin" in df_guardias.columns
-
-    irpf = float(irpf_percent or 0.0)
-    if irpf < 0: irpf = 0.0
-    if irpf > 100: irpf = 100.0
+    irpf = limitar_irpf(irpf_percent)
 
     for _, row in df_guardias.iterrows():
+        bloques, fila = calcular_guardia(row, calendario, tarifas, irpf, has_ini, has_fin)
+        detalle_rows.extend(bloques)
+        resumen_rows.append(fila)
+
+    detalle = pd.DataFrame(detalle_rows)
+    resumen_guardias = pd.DataFrame(resumen_rows, columns=COLUMNAS_RESUMEN)
+
+    return detalle, resumen_guardias
+
+
+# ---- Motor vectorizado ----
+_US_HORA = 3_600_000_000
+_US_DIA = 24 * _US_HORA
+
+def _codigo_override(valor) -> int:
+    """-1 = sin override; 0..2 = tipo válido; 3 = valor no reconocido (se ignora)."""
+    v = str(valor).strip()
+    if not v:
+        return -1
+    return _TIPOS_DIA.index(v) if v in _TIPOS_DIA else 3
+
+def _como_texto(us: np.ndarray) -> np.ndarray:
+    """
+    Equivalente vectorizado de datetime.isoformat(sep=" ") para epoch en µs. Cada instante
+    distinto se formatea una vez (un año tiene 8760 horas, el detalle cientos de miles de filas).
+    """
+    uni, inversa = np.unique(us, return_inverse=True)
+    dt = uni.astype("datetime64[us]")
+    txt = np.datetime_as_string(dt, unit="s")
+    con_us = (uni % 1_000_000) != 0
+    if con_us.any():
+        txt = np.where(con_us, np.datetime_as_string(dt, unit="us"), txt)
+    return np.char.replace(txt.astype(str), "T", " ")[inversa.reshape(-1)]
+
+def _categoria(valores, idx=None, codigos=None, categorias=None) -> pd.Categorical:
+    """
+    `valores[idx]` como category: cada texto distinto (p.ej. las observaciones de una guardia)
+    se guarda una vez y cada fila lleva solo un código. Admite códigos ya factorizados.
+    """
+    if codigos is None:
+        codigos, categorias = pd.factorize(pd.Series(valores, dtype=object))
+    if idx is not None:
+        codigos = codigos[idx]
+    return pd.Categorical.from_codes(codigos, categories=pd.Index(categorias, dtype=object))
+
+def _expandir_bloques(ini_us: np.ndarray, fin_us: np.ndarray, paso: int = _US_HORA):
+    """
+    Cortes de `fraccionar_por_hora` para muchos intervalos a la vez (epoch en µs;
+    `paso` = duración del bloque, 1 hora por defecto).
+    Devuelve (idx, t0, t1, n_bloques, offsets): intervalo de origen, inicio y fin de
+    cada bloque, nº de bloques por intervalo y posición del primero.
+    """
+    n = len(ini_us)
+    h0 = ini_us - ini_us % paso
+    n_bloques = np.where(fin_us > ini_us, (fin_us - h0 + paso - 1) // paso, 0)
+    offsets = np.concatenate(([0], np.cumsum(n_bloques)[:-1])) if n else np.zeros(0, dtype="int64")
+    idx = np.repeat(np.arange(n), n_bloques)
+    k = np.arange(int(n_bloques.sum())) - np.repeat(offsets, n_bloques)
+    t0 = np.where(k == 0, ini_us[idx], h0[idx] + k * paso)
+    t1 = np.minimum(h0[idx] + (k + 1) * paso, fin_us[idx])
+    return idx, t0, t1, n_bloques, offsets
+
+def _a_us(textos) -> np.ndarray:
+    """Epoch en µs de fechas ISO sin zona horaria (np.datetime64 no guarda la zona)."""
+    return np.array([_parse_dt(t) for t in textos], dtype="datetime64[us]").astype("int64")
+
+def _textos(df_guardias: pd.DataFrame, nombre: str) -> list:
+    if nombre in df_guardias.columns:
+        return ["" if v is None or v != v else v for v in df_guardias[nombre].tolist()]  # NaN != NaN
+    return [""] * len(df_guardias)
+
+def _tipos_bloques(df_guardias: pd.DataFrame, calendario, inicios, fines, municipios):
+    """
+    Parte del motor vectorizado que no depende de las tarifas: bloques horarios de todas las
+    guardias (fechas sin zona horaria) y tipo de día de cada bloque (código de TIPOS_DIA).
+    Devuelve (idx, t0, t1, n_bloques, offsets, tipo, muni_cod, muni_uni).
+    """
+    n_g = len(df_guardias)
+    has_ini = "tipo_ini" in df_guardias.columns
+    has_fin = "tipo_fin" in df_guardias.columns
+
+    # Expansión a bloques horarios (mismas reglas que fraccionar_por_hora)
+    ini_us = np.array(inicios, dtype="datetime64[us]").astype("int64")
+    fin_us = np.array(fines, dtype="datetime64[us]").astype("int64")
+    idx, t0, t1, n_bloques, offsets = _expandir_bloques(ini_us, fin_us)
+
+    # Tipo de día: una llamada al calendario por (fecha, municipio) distinto
+    dia = t0 // _US_DIA
+    muni_cod, muni_uni = pd.factorize(pd.Series(municipios, dtype=object))
+    clave = dia * max(len(muni_uni), 1) + muni_cod[idx]
+    claves_uni, inversa = np.unique(clave, return_inverse=True)
+    tipos_uni = np.empty(len(claves_uni), dtype="int64")
+    for i, c in enumerate(claves_uni.tolist()):
+        d, m = divmod(c, max(len(muni_uni), 1))
+        fecha = np.datetime64(d, "D").astype(object)
+        tipos_uni[i] = _TIPOS_DIA.index(calendario.tipo_en_fecha(datetime.combine(fecha, time()), muni_uni[m]))
+    tipo = tipos_uni[inversa.reshape(-1)]
+
+    # Overrides tipo_ini / tipo_fin (tipo_fin prevalece si ambos caen el mismo día)
+    ovr_ini = np.array([_codigo_override(v) for v in df_guardias["tipo_ini"].tolist()] if has_ini else [-1] * n_g, dtype="int64")
+    ovr_fin = np.array([_codigo_override(v) for v in df_guardias["tipo_fin"].tolist()] if has_fin else [-1] * n_g, dtype="int64")
+    dia_ini = ini_us // _US_DIA
+    dia_fin = fin_us // _US_DIA
+    es_fin = (ovr_fin[idx] >= 0) & (dia == dia_fin[idx])
+    es_ini = (ovr_ini[idx] >= 0) & (dia == dia_ini[idx])
+    ovr = np.where(es_fin, ovr_fin[idx], np.where(es_ini, ovr_ini[idx], -1))
+    tipo = np.where((ovr >= 0) & (ovr <= 2), ovr, tipo)
+    return idx, t0, t1, n_bloques, offsets, tipo, muni_cod, muni_uni
+
+def horas_por_tipo_dia(df_guardias: pd.DataFrame, calendario, tarifas) -> np.ndarray:
+    """
+    Horas de cada guardia por tipo de día (n_guardias x 3, columnas de TIPOS_DIA), con los
+    mismos bloques y tipos que los motores por horas. `tarifas` solo se consulta con fechas
+    con zona horaria, que se calculan con el motor iterativo.
+    """
+    n_g = len(df_guardias)
+    inicios = [_parse_dt(v) for v in df_guardias["inicio_datetime"].tolist()] if n_g else []
+    fines = [_parse_dt(v) for v in df_guardias["fin_datetime"].tolist()] if n_g else []
+    if any(d.tzinfo is not None for d in inicios + fines):
+        has_ini, has_fin = "tipo_ini" in df_guardias.columns, "tipo_fin" in df_guardias.columns
+        horas = np.zeros((n_g, 3), dtype="float64")
+        for i, row in enumerate(df_guardias.to_dict("records")):
+            bloques, _ = calcular_guardia(row, calendario, tarifas, 0.0, has_ini, has_fin)
+            for b in bloques:
+                horas[i, _TIPOS_DIA.index(b["tipo_dia"])] += b["horas"]
+        return horas
+    idx, _, _, _, _, tipo, _, _ = _tipos_bloques(df_guardias, calendario, inicios, fines,
+                                                 _textos(df_guardias, "municipio"))
+    return np.bincount(idx * 3 + tipo, minlength=n_g * 3).reshape(n_g, 3).astype("float64")
+
+def calcular_importes_vectorizado(
+    df_guardias: pd.DataFrame,
+    calendario,
+    tarifas,
+    reglas: dict,
+    anio: int,
+    mes: int,
+    irpf_percent: float = 0.0
+):
+    """
+    Mismo resultado que `calcular_importes`, pero sin bucle por hora:
+    - Expande todas las guardias a bloques horarios con arrays NumPy.
+    - Consulta el calendario una sola vez por (fecha, municipio) distinto.
+    - Aplica 'tipo_ini'/'tipo_fin' como máscaras.
+    - El bruto por guardia se acumula en el mismo orden que el motor iterativo,
+      para que los CSV resultantes sean idénticos byte a byte.
+    - Detalle compacto: inicio/fin del bloque en datetime64 y municipio, grado, tipo de día
+      y observaciones como category (unos 40 bytes por fila en lugar de ~130).
+    """
+    irpf = limitar_irpf(irpf_percent)
+
+    n_g = len(df_guardias)
+    inicios = [_parse_dt(v) for v in df_guardias["inicio_datetime"].tolist()] if n_g else []
+    fines = [_parse_dt(v) for v in df_guardias["fin_datetime"].tolist()] if n_g else []
+    if any(d.tzinfo is not None for d in inicios + fines):
+        # Fechas con zona horaria: no se vectorizan, se delega en el motor iterativo.
+        return calcular_importes(df_guardias, calendario, tarifas, reglas, anio, mes, irpf_percent)
+
+    municipios = _textos(df_guardias, "municipio")
+    observs = _textos(df_guardias, "observaciones")
+    grados = df_guardias["grado"].tolist() if n_g else []
+
+    # Precios por guardia: índice (grado, tipo_guardia) sobre la matriz densa de tarifas
+    gi, ti = tarifas.indices(grados, _textos(df_guardias, "tipo_guardia"))
+    precios_g = tarifas.matriz[gi, ti].reshape(n_g, 3)
+
+    idx, t0, t1, n_bloques, offsets, tipo, muni_cod, muni_uni = _tipos_bloques(
+        df_guardias, calendario, inicios, fines, municipios)
+    total = len(idx)
+
+    horas = np.ones(total, dtype="float64")
+    eur_hora = precios_g[idx, tipo] if total else np.zeros(0, dtype="float64")
+    precios_uni, inv_p = np.unique(eur_hora, return_inverse=True)
+    importe = np.array([round(p * 1.0, 4) for p in precios_uni.tolist()], dtype="float64")[inv_p.reshape(-1)]
+
+    # Bruto por guardia: suma secuencial (como `bruto_guardia += importe`),
+    # avanzando a la vez sobre todas las guardias que aún tienen bloques.
+    orden = np.argsort(-n_bloques, kind="stable")
+    n_ord = n_bloques[orden]
+    off_ord = offsets[orden]
+    acum = np.zeros(n_g, dtype="float64")
+    for paso in range(int(n_ord[0]) if n_g else 0):
+        activos = int(np.searchsorted(-n_ord, -paso, side="left"))
+        acum[:activos] += importe[off_ord[:activos] + paso]
+    bruto_g = np.empty(n_g, dtype="float64")
+    bruto_g[orden] = acum
+
+    if total:
+        # Detalle compacto: fechas en datetime64 y textos como category; `detalle_en_formato`
+        # los pasa a texto al escribir.
+        detalle = pd.DataFrame({
+            "inicio_bloque": t0.astype("datetime64[us]"),
+            "fin_bloque": t1.astype("datetime64[us]"),
+            "municipio": _categoria(None, idx, muni_cod, muni_uni),
+            "grado": _categoria(grados, idx),
+            "tipo_dia": pd.Categorical.from_codes(tipo, categories=pd.Index(_TIPOS_DIA, dtype=object)),
+            "horas": horas,
+            "eur_hora": eur_hora,
+            "importe": importe,
+            "observaciones": _categoria(observs, idx),
+        })
+    else:
+        detalle = pd.DataFrame([])
+
+    resumen_rows = []
+    for i, bruto in enumerate(bruto_g.tolist()):
+        bruto_guardia = round(bruto, 4)
+        resumen_rows.append({
+            "Rango": grados[i],
+            "Fecha inicial + hora inicial": inicios[i].isoformat(sep=" "),
+            "Fecha final + hora final": fines[i].isoformat(sep=" "),
+            "Resultado": bruto_guardia,
+            "% IRPF": irpf,
+            "Total día": round(bruto_guardia * (1.0 - irpf / 100.0), 4),
+            "Municipio": municipios[i],
+            "Observaciones": observs[i],
+        })
+    resumen_guardias = pd.DataFrame(resumen_rows, columns=COLUMNAS_RESUMEN)
+
+    return detalle, resumen_guardias
+
+# ---- Motor por intervalos ----
+def minutos_resolucion(reglas: dict) -> int:
+    """`resolucion_horas` de las reglas (minutos por bloque; 60 si falta). Debe dividir el día."""
+    minutos = int((reglas or {}).get("resolucion_horas") or 60)
+    if minutos <= 0 or (24 * 60) % minutos:
+        raise ValueError(f"resolucion_horas={minutos}: debe ser un divisor de 1440 minutos")
+    return minutos
+
+def _tramos_por_dia(inicio: datetime, fin: datetime):
+    """(t0, t1, medianoche) de cada día natural que toca [inicio, fin)."""
+    t = inicio
+    while t < fin:
+        medianoche = datetime.combine(t.date(), time(), tzinfo=t.tzinfo)
+        corte = min(medianoche + timedelta(days=1), fin)
+        yield t, corte, medianoche
+        t = corte
+
+def _bloques_en_tramo(t0: datetime, t1: datetime, medianoche: datetime, paso: timedelta) -> int:
+    """Bloques de `paso` alineados al reloj que toca [t0, t1): un bloque empezado cuenta entero."""
+    return -((medianoche - t1) // paso) - (t0 - medianoche) // paso
+
+def calcular_importes_intervalos(
+    df_guardias: pd.DataFrame,
+    calendario,
+    tarifas,
+    reglas: dict,
+    anio: int,
+    mes: int,
+    irpf_percent: float = 0.0
+):
+    """
+    Precios fijos por grado y tipo de día, sin trocear por bloques:
+    - Cada guardia se corta solo en los cambios de día (medianoche), que es donde pueden
+      cambiar el tipo de día y aplicarse 'tipo_ini'/'tipo_fin'.
+    - Las horas de cada tramo se obtienen en forma cerrada con la resolución de las reglas
+      (`resolucion_horas`, minutos por bloque): nº de bloques alineados al reloj que toca el
+      tramo, contando entero el bloque empezado igual que `fraccionar_por_hora`.
+      importe = round(eur_hora * horas, 4). Coste O(días) por guardia, no O(bloques).
+    - Con resolución de 60 min da el mismo resumen que los motores por horas.
+    - El detalle sale por tramos (columnas de `comprimir_detalle`), compacto como el del
+      motor vectorizado; `detalle_en_formato` lo despliega en bloques cuando se pide el
+      detalle horario.
+    """
+    minutos = minutos_resolucion(reglas)
+    paso = timedelta(minutes=minutos)
+    has_ini = "tipo_ini" in df_guardias.columns
+    has_fin = "tipo_fin" in df_guardias.columns
+    irpf = limitar_irpf(irpf_percent)
+
+    tipos_dia = {}  # (fecha, municipio) -> tipo: una consulta al calendario por día distinto
+    detalle_rows = []
+    resumen_rows = []
+    for row in df_guardias.to_dict("records"):
         inicio = _parse_dt(row["inicio_datetime"])
         fin = _parse_dt(row["fin_datetime"])
         municipio = row.get("municipio", "") or ""
         grado = row["grado"]
         observ = row.get("observaciones", "") or ""
-
-        precios = tarifas.obtener(grado)  # {'normal': x, 'festivo': y, 'especial': z}
-
-        overrides = {}
-        if has_ini and str(row.get("tipo_ini","")).strip():
-            overrides[inicio.date().isoformat()] = str(row["tipo_ini"]).strip()
-        if has_fin and str(row.get("tipo_fin","")).strip():
-            overrides[fin.date().isoformat()] = str(row["tipo_fin"]).strip()
+        precios = tarifas.obtener(grado, row.get("tipo_guardia", "") or "")
+        overrides = tipos_forzados(row, inicio, fin, has_ini, has_fin)
 
         bruto_guardia = 0.0
-        bloques = calendario.fraccionar_por_hora(inicio, fin)
-        for t0, t1 in bloques:
-            fecha_key = t0.date().isoformat()
-            if fecha_key in overrides and overrides[fecha_key] in ("normal", "festivo", "especial"):
-                tipo = overrides[fecha_key]
-            else:
-                tipo = calendario.tipo_en_fecha(t0, municipio)
-
-            horas = 1.0
+        for t0, t1, medianoche in _tramos_por_dia(inicio, fin):
+            fecha = t0.date()
+            tipo = overrides.get(fecha.isoformat())
+            if tipo not in _TIPOS_DIA:
+                clave = (fecha, municipio)
+                if clave not in tipos_dia:
+                    tipos_dia[clave] = calendario.tipo_en_fecha(medianoche, municipio)
+                tipo = tipos_dia[clave]
+
+            n = _bloques_en_tramo(t0, t1, medianoche, paso)
             eur_hora = precios.get(tipo, precios["normal"])
-            importe = round(eur_hora * horas, 4)
+            importe = round(eur_hora * n * minutos / 60, 4)
             bruto_guardia += importe
-
             detalle_rows.append({
-                "inicio_bloque": t0.isoformat(sep=" "),
-                "fin_bloque": t1.isoformat(sep=" "),
+                "inicio_segmento": t0,
+                "fin_segmento": t1,
                 "municipio": municipio,
                 "grado": grado,
                 "tipo_dia": tipo,
-                "horas": horas,
+                "horas": round(n * minutos / 60, 4),
                 "eur_hora": eur_hora,
                 "importe": importe,
-                "observaciones": observ
+                "observaciones": observ,
             })
 
         bruto_guardia = round(bruto_guardia, 4)
-        neto_guardia = round(bruto_guardia * (1.0 - irpf / 100.0), 4)
-
         resumen_rows.append({
             "Rango": grado,
             "Fecha inicial + hora inicial": inicio.isoformat(sep=" "),
             "Fecha final + hora final": fin.isoformat(sep=" "),
             "Resultado": bruto_guardia,
             "% IRPF": irpf,
-            "Total día": neto_guardia,
+            "Total día": round(bruto_guardia * (1.0 - irpf / 100.0), 4),
             "Municipio": municipio,
             "Observaciones": observ,
         })
 
-    detalle = pd.DataFrame(detalle_rows)
-    resumen_guardias = pd.DataFrame(resumen_rows, columns=[
-        "Rango","Fecha inicial + hora inicial","Fecha final + hora final",
-        "Resultado","% IRPF","Total día","Municipio","Observaciones"
-    ])
-
+    detalle = _compactar(pd.DataFrame(detalle_rows))
+    resumen_guardias = pd.DataFrame(resumen_rows, columns=COLUMNAS_RESUMEN)
     return detalle, resumen_guardias
+
+# Motores disponibles (CLI --motor y selector de la GUI)
+MOTORES = {
+    "iterativo": calcular_importes,
+    "vectorizado": calcular_importes_vectorizado,
+    "intervalos": calcular_importes_intervalos,
+}
+
+def calcular_por_bloques(bloques, calendario, tarifas, reglas: dict, anio: int, mes: int,
+                         irpf_percent: float = 0.0, motor: str = "vectorizado"):
+    """
+    Generador: calcula cada DataFrame de guardias de `bloques` por separado y
+    devuelve (detalle, resumen) de ese bloque. Cada guardia se calcula de forma
+    independiente, así que concatenar los bloques da el mismo resultado que
+    calcular todo junto, con memoria acotada por el tamaño de bloque.
+    """
+    fn = MOTORES[motor]
+    for df in bloques:
+        yield fn(df, calendario, tarifas, reglas, anio=anio, mes=mes, irpf_percent=irpf_percent)
+
+# ---- Detalle compacto y formato de salida ----
+COLUMNAS_TIEMPO = ("inicio_bloque", "fin_bloque", "inicio_segmento", "fin_segmento")
+COLUMNAS_CATEGORIA = ("municipio", "grado", "tipo_dia", "observaciones")
+
+def _es_fecha(col: pd.Series) -> bool:
+    return pd.api.types.is_datetime64_dtype(col.dtype)
+
+def _us(col: pd.Series) -> np.ndarray:
+    """Epoch en µs de una columna de fechas (datetime64 o texto ISO)."""
+    if _es_fecha(col):
+        return col.to_numpy().astype("datetime64[us]").astype("int64")
+    return _a_us(col.tolist())
+
+def _compactar(detalle: pd.DataFrame) -> pd.DataFrame:
+    """Textos repetidos como category; las fechas con zona horaria se dejan en texto ISO."""
+    if detalle.empty:
+        return detalle
+    for c in COLUMNAS_TIEMPO:
+        if c in detalle.columns and not _es_fecha(detalle[c]):
+            detalle[c] = [t.isoformat(sep=" ") for t in detalle[c].tolist()]
+    for c in COLUMNAS_CATEGORIA:
+        if c in detalle.columns:
+            detalle[c] = _categoria(detalle[c].tolist())
+    return detalle
+
+def detalle_texto(detalle: pd.DataFrame) -> pd.DataFrame:
+    """
+    Detalle con las fechas en texto ISO y las observaciones como texto, tal cual se escribe.
+    Municipio, grado y tipo de día siguen como category (io_csv.a_columnar las tipa así).
+    """
+    fechas = [c for c in COLUMNAS_TIEMPO if c in detalle.columns and _es_fecha(detalle[c])]
+    observ = "observaciones" in detalle.columns and isinstance(detalle["observaciones"].dtype, pd.CategoricalDtype)
+    if not fechas and not observ:
+        return detalle
+    detalle = detalle.copy(deep=False)
+    for c in fechas:
+        detalle[c] = _como_texto(_us(detalle[c]))
+    if observ:
+        detalle["observaciones"] = detalle["observaciones"].astype(str)
+    return detalle
+
+def unir_detalles(detalles) -> pd.DataFrame:
+    """pd.concat de varios detalles compactos sin perder las category (une sus categorías)."""
+    detalles = [d for d in detalles if len(d.columns)] or list(detalles)[:1]
+    if len(detalles) == 1:
+        return detalles[0]
+    for c in COLUMNAS_CATEGORIA:
+        cols = [d[c] for d in detalles if c in d.columns]
+        if len(cols) == len(detalles) and all(isinstance(x.dtype, pd.CategoricalDtype) for x in cols):
+            cats = union_categoricals(cols).categories
+            detalles = [d.assign(**{c: d[c].cat.set_categories(cats)}) for d in detalles]
+    return pd.concat(detalles, ignore_index=True)
+
+# ---- Detalle por segmentos ----
+COLUMNAS_SEGMENTOS = [
+    "inicio_segmento", "fin_segmento", "municipio", "grado", "tipo_dia",
+    "horas", "eur_hora", "importe", "observaciones",
+]
+
+def comprimir_detalle(detalle: pd.DataFrame) -> pd.DataFrame:
+    """
+    Une bloques horarios (o tramos del motor por intervalos) consecutivos, contiguos en
+    el tiempo, con el mismo municipio, grado, tipo de día, precio y observaciones en una
+    fila de segmento: horas e importe son la suma de los bloques (mismos totales que el
+    detalle horario).
+    """
+    if "inicio_segmento" in detalle.columns:
+        detalle = detalle.rename(columns={"inicio_segmento": "inicio_bloque", "fin_segmento": "fin_bloque"})
+    if detalle.empty or "inicio_bloque" not in detalle.columns:
+        return detalle
+    claves = ["municipio", "grado", "tipo_dia", "eur_hora", "observaciones"]
+    d = detalle.reset_index(drop=True)
+    igual = d["inicio_bloque"].eq(d["fin_bloque"].shift())
+    for c in claves:
+        actual, previo = d[c], d[c].shift()
+        igual &= actual.eq(previo) | (actual.isna() & previo.isna() & (d.index > 0))
+    seg = (~igual).cumsum()
+    g = d.groupby(seg, sort=False)
+    out = g.agg(
+        inicio_segmento=("inicio_bloque", "first"),
+        fin_segmento=("fin_bloque", "last"),
+        municipio=("municipio", "first"),
+        grado=("grado", "first"),
+        tipo_dia=("tipo_dia", "first"),
+        horas=("horas", "sum"),
+        eur_hora=("eur_hora", "first"),
+        importe=("importe", "sum"),
+        observaciones=("observaciones", "first"),
+    ).reset_index(drop=True)
+    out["importe"] = [round(v, 4) for v in out["importe"].tolist()]
+    return detalle_texto(out[COLUMNAS_SEGMENTOS])
+
+def _bloques_con_zona(inicios, fines, minutos: int):
+    """
+    Cortes de `_expandir_bloques` con aritmética de datetime, para fechas con zona horaria:
+    los bloques siguen en la zona del inicio y el último acaba en `min(corte, fin)`, como
+    en `fraccionar_por_hora`. Devuelve (idx, textos de inicio, textos de fin).
+    """
+    paso = timedelta(minutes=minutos)
+    idx, t0s, t1s = [], [], []
+    for i, (t, fin) in enumerate(zip(inicios, fines)):
+        while t < fin:
+            medianoche = t.replace(hour=0, minute=0, second=0, microsecond=0)
+            corte = min(medianoche + ((t - medianoche) // paso + 1) * paso, fin)
+            idx.append(i)
+            t0s.append(t.isoformat(sep=" "))
+            t1s.append(corte.isoformat(sep=" "))
+            t = corte
+    return np.array(idx, dtype="int64"), np.array(t0s, dtype=object), np.array(t1s, dtype=object)
+
+def expandir_segmentos(segmentos: pd.DataFrame, minutos: int = 60) -> pd.DataFrame:
+    """
+    Inversa de `comprimir_detalle`: vuelve a un bloque por hora, o por `minutos`
+    (mismas columnas que el detalle). Las fechas con zona horaria (texto ISO con offset)
+    se conservan en su zona.
+    """
+    if segmentos.empty or "inicio_segmento" not in segmentos.columns:
+        return segmentos
+    horas = minutos / 60
+    ini, fin = segmentos["inicio_segmento"], segmentos["fin_segmento"]
+    inicios = None if _es_fecha(ini) else [_parse_dt(t) for t in ini.tolist()]
+    if inicios is not None and any(d.tzinfo is not None for d in inicios):
+        idx, t0, t1 = _bloques_con_zona(inicios, [_parse_dt(t) for t in fin.tolist()], minutos)
+    else:
+        idx, t0, t1, _, _ = _expandir_bloques(_us(ini), _us(fin), minutos * 60_000_000)
+        t0, t1 = _como_texto(t0), _como_texto(t1)
+    eur_hora = segmentos["eur_hora"].to_numpy(dtype="float64")[idx]
+    precios_uni, inv_p = np.unique(eur_hora, return_inverse=True)
+    importe = np.array([round(p * horas, 4) for p in precios_uni.tolist()], dtype="float64")[inv_p.reshape(-1)]
+    col = lambda c: segmentos[c].to_numpy(dtype=object)[idx]
+    return pd.DataFrame({
+        "inicio_bloque": t0,
+        "fin_bloque": t1,
+        "municipio": col("municipio"),
+        "grado": col("grado"),
+        "tipo_dia": col("tipo_dia"),
+        "horas": np.full(len(idx), horas, dtype="float64"),
+        "eur_hora": eur_hora,
+        "importe": importe,
+        "observaciones": col("observaciones"),
+    })
+
+def detalle_en_formato(detalle: pd.DataFrame, modo: str, reglas: dict = None) -> pd.DataFrame:
+    """
+    Detalle de cualquier motor en el formato de salida pedido: 'segmentos' (comprimido)
+    u 'horario' (un bloque por `resolucion_horas`: despliega los tramos del motor por intervalos).
+    Aquí se pasan a texto las fechas del detalle compacto: se llama justo antes de escribir.
+    """
+    if modo == "segmentos":
+        return comprimir_detalle(detalle)
+    if "inicio_segmento" in detalle.columns:
+        return expandir_segmentos(detalle, minutos_resolucion(reglas))
+    return detalle_texto(detalle)
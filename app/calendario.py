@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
 from pathlib import Path
-import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
-def _cargar_csv_festivos(path: Path) -> pd.DataFrame:
+def _cargar_csv_festivos(path: Path):
+    import pandas as pd
     cols = ["fecha", "ambito", "municipio", "descripcion"]
     if not path.exists():
         return pd.DataFrame({c: pd.Series(dtype="object") for c in cols}).assign(
@@ -24,30 +26,114 @@ def _cargar_csv_festivos(path: Path) -> pd.DataFrame:
     df["descripcion"] = df["descripcion"].astype(str).fillna("")
     return df
 
+def _normalizar_municipio(municipio) -> str:
+    return str(municipio or "").strip().upper()
+
 class CalendarioFestivos:
-    def __init__(self, anio: int, reglas: dict, municipio_default: str = "Sevilla"):
+    """
+    Calendario multi-año: cada año se carga bajo demanda desde `base` la primera vez
+    que se consulta una fecha suya, y se conserva en una LRU de `max_anios` años.
+    `anio` (opcional) solo precarga ese año.
+    `cargador(anio) -> (fechas generales, {municipio normalizado: fechas})` sustituye
+    la carga (p.ej. para compartir los años ya cargados por otro calendario).
+    Sin `cargador`, los años salen del `festivos.bin` de `base` (app/festivos_compilados.py),
+    que se recompila si está desfasado; solo si no se puede escribir se leen los CSV.
+    Se puede compartir entre hilos (servicio HTTP): la LRU está protegida por un lock.
+    """
+    def __init__(self, anio: int = None, reglas: dict = None, municipio_default: str = "Sevilla",
+                 base: Path = Path("data"), max_anios: int = 8, cargador=None):
         self.anio = anio
-        self.reglas = reglas
+        self.reglas = reglas or {}
         self.municipio_default = municipio_default
-        base = Path("data")
-        self.df_es = _cargar_csv_festivos(base / f"festivos_es_andalucia_{anio}.csv")
-        self.df_loc = _cargar_csv_festivos(base / f"festivos_locales_sevilla_{anio}.csv")
+        self.base = Path(base)
+        self.max_anios = max(1, int(max_anios))
+        self.archivos_leidos = 0
+        self._cargador = cargador
+        self._compilados = None  # FestivosCompilados, False si no hay (se mira una vez)
+        self._anios = OrderedDict()  # anio -> (fechas generales, {municipio: fechas locales})
+        self._lock = threading.Lock()  # get/move_to_end/popitem de la LRU no son atómicos entre sí
         self._especiales = set(self.reglas.get("festivos_especiales", []))
+        if anio is not None:
+            self._festivos_anio(anio)
 
-    def tipo_en_fecha(self, dt: datetime, municipio: str) -> str:
-        mmdd = dt.strftime("%m-%d")
-        if mmdd in self._especiales:
+    def __getstate__(self):
+        # Se pasa a los procesos del modo lote: el lock no se serializa, cada copia crea el suyo
+        estado = self.__dict__.copy()
+        del estado["_lock"]
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._lock = threading.Lock()
+
+    def _cargar_anio(self, anio: int):
+        """Índices O(1): fechas festivas generales y {municipio normalizado: fechas locales}."""
+        if self._compilados is None:
+            from app.festivos_compilados import festivos_al_dia
+            self._compilados = festivos_al_dia(self.base) or False
+        if self._compilados and anio in self._compilados.anios:
+            return self._compilados.festivos_anio(anio)
+        df_es = _cargar_csv_festivos(self.base / f"festivos_es_andalucia_{anio}.csv")
+        df_loc = _cargar_csv_festivos(self.base / f"festivos_locales_sevilla_{anio}.csv")
+        self.archivos_leidos += 2
+        fechas_es = {ts.date() for ts in df_es["fecha"].dropna()}
+        fechas_loc = {}
+        loc = df_loc.dropna(subset=["fecha"])
+        for muni, ts in zip(loc["municipio"].tolist(), loc["fecha"].tolist()):
+            fechas_loc.setdefault(_normalizar_municipio(muni), set()).add(ts.date())
+        return fechas_es, fechas_loc
+
+    def _festivos_anio(self, anio: int):
+        with self._lock:
+            datos = self._anios.get(anio)
+            if datos is not None:
+                self._anios.move_to_end(anio)
+                return datos
+            # La carga también va dentro: dos hilos no leen el mismo año a la vez
+            datos = (self._cargador or self._cargar_anio)(anio)
+            self._anios[anio] = datos
+            while len(self._anios) > self.max_anios:
+                self._anios.popitem(last=False)
+            return datos
+
+    def anios_disponibles(self) -> list:
+        anios = set()
+        for f in self.base.glob("festivos_*_*.csv"):
+            sufijo = f.stem.rsplit("_", 1)[-1]
+            if sufijo.isdigit():
+                anios.add(int(sufijo))
+        return sorted(anios)
+
+    def precargar(self, anios):
+        for a in anios:
+            self._festivos_anio(int(a))
+
+    def _tipo_dia(self, d: date, muni: str) -> str:
+        if f"{d.month:02d}-{d.day:02d}" in self._especiales:
             return "especial"
-        if not self.df_es.empty and "fecha" in self.df_es.columns:
-            if (self.df_es["fecha"].dt.date == dt.date()).any():
-                return "festivo"
-        muni = (municipio or self.municipio_default).strip().upper()
-        if not self.df_loc.empty and "fecha" in self.df_loc.columns:
-            mask_loc = (self.df_loc["fecha"].dt.date == dt.date()) & (self.df_loc["municipio"].str.upper() == muni)
-            if mask_loc.any():
-                return "festivo"
+        fechas_es, fechas_loc = self._festivos_anio(d.year)
+        if d in fechas_es:
+            return "festivo"
+        if d in fechas_loc.get(muni, ()):
+            return "festivo"
         return "normal"
 
+    def tipo_en_fecha(self, dt: datetime, municipio: str) -> str:
+        d = dt.date() if isinstance(dt, datetime) else dt
+        return self._tipo_dia(d, _normalizar_municipio(municipio or self.municipio_default))
+
+    def tipos_para_rango(self, inicio: datetime, fin: datetime, municipio: str) -> list:
+        """Tipo de día de cada bloque de `fraccionar_por_hora(inicio, fin)` (una consulta por día)."""
+        muni = _normalizar_municipio(municipio or self.municipio_default)
+        por_dia = {}
+        tipos = []
+        for t0, _ in self.fraccionar_por_hora(inicio, fin):
+            d = t0.date()
+            if d not in por_dia:
+                por_dia[d] = self._tipo_dia(d, muni)
+            tipos.append(por_dia[d])
+        return tipos
+
     def fraccionar_por_hora(self, inicio: datetime, fin: datetime):
         bloques = []
         t = inicio
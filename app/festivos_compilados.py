@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Festivos de todos los años y municipios compilados en un único fichero binario
+(`data/festivos.bin`), que `CalendarioFestivos` abre con mmap en lugar de leer los CSV.
+Es la única copia compilada de los festivos: la usan todos los caminos de cálculo
+(también la vía rápida y los totales en vivo de la GUI).
+- Se genera a partir de `fuentes_festivos` (data/festivos_*_AAAA.csv y
+  data/municipios_sevilla.csv). `festivos_al_dia` lo recompila si falta o está desfasado;
+  `python main.py festivos` lo hace por adelantado.
+- Formato: MAGICO + longitud (u32) + cabecera JSON (años, municipios normalizados y
+  ficheros de origen), y a continuación un bitset de 366 bits por año y fila:
+  fila 0 = festivos generales, fila i = festivos locales del municipio i.
+- Abrirlo no lee ni convierte fechas: consultar un día es comprobar un bit.
+- Si falta, está dañado, cambió el conjunto de CSV o alguno es más reciente que el
+  fichero compilado, `abrir_compilados` devuelve None. Solo si no se puede escribir en
+  data/ lee el calendario los CSV directamente.
+"""
+import argparse
+import csv
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+from app.nucleo import VALORES_NA
+
+NOMBRE_COMPILADO = "festivos.bin"  # dentro de la carpeta de datos
+MAGICO = b"GFEST\x00\x01\x00"
+BYTES_ANIO = 46                     # 366 bits redondeados a bytes
+_LONGITUD = struct.Struct("<I")
+
+def fuentes_festivos(base: Path) -> list:
+    """CSV de origen del fichero compilado (la lista de festivos que vigilan caché, servicio y `vigilar`)."""
+    base = Path(base)
+    return sorted(base.glob("festivos_*_*.csv")) + [base / "municipios_sevilla.csv"]
+
+def _anio_de(path: Path):
+    sufijo = path.stem.rsplit("_", 1)[-1]
+    return int(sufijo) if sufijo.isdigit() else None
+
+def _leer_festivos_csv(path: Path) -> list:
+    """[(fecha ISO, municipio)] de un CSV de festivos; fechas inválidas se ignoran."""
+    if not path.exists():
+        return []
+    out = []
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for r in csv.DictReader(f):
+                try:
+                    fecha = date.fromisoformat(str(r.get("fecha") or "").strip()[:10])
+                except ValueError:
+                    continue
+                muni = r.get("municipio") or ""
+                out.append((fecha.isoformat(), "" if muni in VALORES_NA else muni))
+    except Exception:
+        return []
+    return out
+
+def _poner(bits: bytearray, inicio: int, d: date):
+    i = d.timetuple().tm_yday - 1
+    bits[inicio + (i >> 3)] |= 1 << (i & 7)
+
+def compilar(base: Path = Path("data"), salida: Path = None) -> dict:
+    """Escribe el fichero compilado (de forma atómica) y devuelve su cabecera."""
+    from app.calendario import _normalizar_municipio
+    from app.municipios import cargar_municipios
+
+    base = Path(base)
+    salida = Path(salida) if salida else base / NOMBRE_COMPILADO
+    generales, locales = {}, {}
+    for p in fuentes_festivos(base)[:-1]:
+        anio = _anio_de(p)
+        if anio is None:
+            continue
+        generales.setdefault(anio, [])
+        locales.setdefault(anio, [])
+        for f, muni in _leer_festivos_csv(p):
+            d = date.fromisoformat(f)
+            if p.name.startswith("festivos_es_andalucia_"):
+                generales[anio].append(d)
+            elif p.name.startswith("festivos_locales_sevilla_"):
+                locales[anio].append((_normalizar_municipio(muni), d))
+
+    # Filas: municipios del listado y, detrás, los que solo aparecen en los CSV de festivos
+    municipios = [_normalizar_municipio(m) for m in cargar_municipios(base / "municipios_sevilla.csv")]
+    municipios += [m for a in sorted(locales) for m, _ in locales[a]]
+    municipios = list(dict.fromkeys(municipios))
+    fila = {m: i + 1 for i, m in enumerate(municipios)}
+
+    anios = sorted(generales)
+    n_filas = len(municipios) + 1
+    bits = bytearray(len(anios) * n_filas * BYTES_ANIO)
+    for k, anio in enumerate(anios):
+        off = k * n_filas * BYTES_ANIO
+        for d in generales[anio]:
+            if d.year == anio:
+                _poner(bits, off, d)
+        for muni, d in locales[anio]:
+            if d.year == anio:
+                _poner(bits, off + fila[muni] * BYTES_ANIO, d)
+
+    cabecera = {"anios": anios, "municipios": municipios,
+                "fuentes": [p.name for p in fuentes_festivos(base) if p.exists()]}
+    datos = json.dumps(cabecera, ensure_ascii=False).encode("utf-8")
+    relleno = b" " * (-(len(MAGICO) + _LONGITUD.size + len(datos)) % 8)
+    # Nombre temporal propio: otro proceso o hilo puede estar compilando a la vez
+    tmp = salida.with_name(f"{salida.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGICO + _LONGITUD.pack(len(datos) + len(relleno)) + datos + relleno + bytes(bits))
+    os.replace(tmp, salida)
+    # Nunca más antiguo que sus orígenes (un CSV con fecha futura): si no, se recompilaría en cada uso
+    mtime = max((p.stat().st_mtime_ns for p in fuentes_festivos(base) if p.exists()), default=0)
+    if mtime > salida.stat().st_mtime_ns:
+        os.utime(salida, ns=(mtime, mtime))
+    return cabecera
+
+class _DiasFestivos:
+    """Conjunto (solo `in`) de las fechas de un año marcadas en un bitset del fichero."""
+    __slots__ = ("_comp", "_inicio", "_anio")
+
+    def __init__(self, comp, inicio: int, anio: int):
+        self._comp, self._inicio, self._anio = comp, inicio, anio
+
+    def __contains__(self, d) -> bool:
+        if d.year != self._anio:
+            return False
+        i = d.timetuple().tm_yday - 1
+        return bool(self._comp._mm[self._inicio + (i >> 3)] >> (i & 7) & 1)
+
+class _LocalesAnio:
+    """{municipio normalizado: fechas} de un año, resuelto bajo demanda (solo `.get`)."""
+    __slots__ = ("_comp", "_inicio", "_anio")
+
+    def __init__(self, comp, inicio: int, anio: int):
+        self._comp, self._inicio, self._anio = comp, inicio, anio
+
+    def get(self, muni: str, defecto=None):
+        i = self._comp._filas.get(muni)
+        if i is None:
+            return defecto
+        return _DiasFestivos(self._comp, self._inicio + i * BYTES_ANIO, self._anio)
+
+class FestivosCompilados:
+    """Fichero compilado abierto con mmap. Se serializa (procesos del modo lote) como su ruta."""
+    def __init__(self, ruta: Path):
+        self.ruta = Path(ruta)
+        with open(self.ruta, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGICO)] != MAGICO:
+            self._mm.close()
+            raise ValueError(f"{self.ruta}: no es un fichero de festivos compilado")
+        n = _LONGITUD.unpack_from(self._mm, len(MAGICO))[0]
+        self._datos = len(MAGICO) + _LONGITUD.size + n
+        cab = json.loads(self._mm[len(MAGICO) + _LONGITUD.size:self._datos].decode("utf-8"))
+        self.anios = {int(a): k for k, a in enumerate(cab["anios"])}
+        self.municipios = cab["municipios"]
+        self.fuentes = cab["fuentes"]
+        self._filas = {m: i + 1 for i, m in enumerate(self.municipios)}
+        self._bytes_anio = (len(self.municipios) + 1) * BYTES_ANIO
+        if len(self._mm) < self._datos + len(self.anios) * self._bytes_anio:
+            self._mm.close()
+            raise ValueError(f"{self.ruta}: fichero de festivos compilado incompleto")
+
+    def __reduce__(self):
+        return (FestivosCompilados, (self.ruta,))
+
+    def festivos_anio(self, anio: int):
+        """(fechas generales, {municipio: fechas locales}) con la forma de `CalendarioFestivos._cargar_anio`."""
+        inicio = self._datos + self.anios[anio] * self._bytes_anio
+        return _DiasFestivos(self, inicio, anio), _LocalesAnio(self, inicio, anio)
+
+def abrir_compilados(base: Path = Path("data")):
+    """Fichero compilado de `base` si existe y está al día con sus CSV; si no, None."""
+    ruta = Path(base) / NOMBRE_COMPILADO
+    try:
+        mtime = ruta.stat().st_mtime_ns
+        comp = FestivosCompilados(ruta)
+    except (OSError, ValueError, KeyError):
+        return None
+    fuentes = [p for p in fuentes_festivos(base) if p.exists()]
+    if [p.name for p in fuentes] != comp.fuentes or any(p.stat().st_mtime_ns > mtime for p in fuentes):
+        return None
+    return comp
+
+def festivos_al_dia(base: Path = Path("data")):
+    """Como `abrir_compilados`, recompilando antes si hace falta; None si no se puede escribir."""
+    comp = abrir_compilados(base)
+    if comp is None:
+        try:
+            compilar(base)
+        except OSError:
+            return None
+        comp = abrir_compilados(base)
+    return comp
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(prog="main.py festivos",
+                                description="Compila los CSV de festivos en un fichero binario (mmap)")
+    p.add_argument("--base", type=Path, default=Path("data"), help="Carpeta de los CSV de festivos")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    t0 = time.perf_counter()
+    cab = compilar(args.base)
+    salida = args.base / NOMBRE_COMPILADO
+    print(f"OK {salida}: {len(cab['anios'])} años, {len(cab['municipios'])} municipios, "
+          f"{salida.stat().st_size} bytes en {time.perf_counter() - t0:.2f} s")
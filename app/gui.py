@@ -3,20 +3,124 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from tkinter import font as tkfont
 from pathlib import Path
-import pandas as pd
 from datetime import datetime
 import calendar as _cal
 import re
 
-from app.io_csv import escribir_detalle, escribir_resumen
-from app.reglas import cargar_reglas
-from app.tarifas import CargadorTarifas
-from app.calendario import CalendarioFestivos
-from app.calculo import calcular_importes
+from app.municipios import cargar_municipios as _load_municipios
 
-MAX_ROWS = 24
+# pandas, NumPy y el motor de cálculo se importan al calcular o cargar/guardar CSV,
+# para que la ventana aparezca cuanto antes.
+MOTORES_GUI = ["iterativo", "vectorizado", "intervalos"]
+FORMATOS_GUI = ["csv", "parquet"]
+
+ALTO_FILA = 30              # píxeles por fila de la tabla: fija cuántos huecos caben
+FILAS_RUEDA = 3             # filas por paso de la rueda del ratón
+ETIQUETA_TABLA = "TablaGuardias"  # bindtag de los widgets de la tabla (rueda del ratón)
+LOTE_GUI = 500              # guardias por trozo: entre trozos se informa del progreso y se atiende "Cancelar"
+INTERVALO_SONDEO_MS = 50    # cada cuánto se lee la cola de la tarea en segundo plano
+RETARDO_TOTALES_MS = 300    # espera tras la última edición antes de recalcular los totales en vivo
+LOTE_TOTALES = 200          # filas recalculadas por tanda (entre tandas la ventana sigue respondiendo)
 GRADOS = ["R1", "R2", "R3", "R4", "R5"]
 
+# ---- Modelo de la tabla: una fila = dict con estos campos (texto tal cual en la celda) ----
+CAMPOS_FILA = ["dia_ini", "hora_ini", "tipo_ini", "dia_fin", "hora_fin", "tipo_fin",
+               "municipio", "grado", "observaciones"]
+
+def fila_vacia(preset=None) -> dict:
+    preset = preset or {}
+    return {c: str(preset.get(c, "") or "") for c in CAMPOS_FILA}
+
+def filas_desde_df(df) -> list:
+    """Filas del modelo a partir de un DataFrame de guardias (sin crear widgets)."""
+    filas = []
+    for row in df.to_dict("records"):
+        try:
+            ini = datetime.fromisoformat(str(row["inicio_datetime"]).strip())
+            fin = datetime.fromisoformat(str(row["fin_datetime"]).strip())
+            preset = {
+                "dia_ini": f"{ini.day:02d}", "hora_ini": f"{ini.hour:02d}",
+                "tipo_ini": row.get("tipo_ini",""),
+                "dia_fin": f"{fin.day:02d}", "hora_fin": f"{fin.hour:02d}",
+                "tipo_fin": row.get("tipo_fin",""),
+                "municipio": row.get("municipio",""),
+                "grado": row.get("grado",""),
+                "observaciones": row.get("observaciones",""),
+            }
+        except Exception:
+            preset = {}
+        filas.append(fila_vacia(preset))
+    return filas
+
+def fila_en_blanco(fila) -> bool:
+    return not any(fila[c].strip() for c in CAMPOS_FILA)
+
+def guardia_de_fila(fila, anio: int, mes: int, municipio_default: str):
+    """Guardia (dict con las columnas del CSV de entrada) de una fila del modelo, o None si está incompleta."""
+    dia_ini  = fila["dia_ini"].strip()
+    hora_ini = fila["hora_ini"].strip()
+    tipo_ini = fila["tipo_ini"].strip()
+    dia_fin  = fila["dia_fin"].strip()
+    hora_fin = fila["hora_fin"].strip()
+    tipo_fin = fila["tipo_fin"].strip()
+    municipio = fila["municipio"].strip()
+    grado = fila["grado"].strip()
+    observ = fila["observaciones"].strip()
+
+    if fila_en_blanco(fila):
+        return None
+    if not municipio:
+        municipio = municipio_default
+    if not (dia_ini and hora_ini and dia_fin and hora_fin and grado):
+        return None
+
+    try:
+        d1 = int(dia_ini); h1 = int(hora_ini)
+        d2 = int(dia_fin); h2 = int(hora_fin)
+        inicio = datetime(anio, mes, d1, h1, 0)
+        fin = datetime(anio, mes, d2, h2, 0)
+        if fin <= inicio:
+            return None
+    except Exception:
+        return None
+
+    return {
+        "inicio_datetime": inicio.strftime("%Y-%m-%d %H:%M"),
+        "fin_datetime": fin.strftime("%Y-%m-%d %H:%M"),
+        "municipio": municipio,
+        "grado": grado,
+        "observaciones": observ,
+        "tipo_ini": tipo_ini,
+        "tipo_fin": tipo_fin,
+    }
+
+def validar_filas(filas, anio: int, mes: int, municipio_default: str, grados=None, municipios=None) -> list:
+    """Incidencias de la tabla: filas que `rows_to_df` descartaría y las de app.validacion."""
+    from app.validacion import incidencia, validar_guardias
+    guardias, numeros, out = [], [], []
+    for i, fila in enumerate(filas, 1):
+        guardia = guardia_de_fila(fila, anio, mes, municipio_default)
+        if guardia is not None:
+            guardias.append(guardia)
+            numeros.append(i)
+        elif not fila_en_blanco(fila):
+            out.append(incidencia(i, "fila_descartada",
+                                  "incompleta, con día/hora no válidos o con fin <= inicio: no se calculará"))
+    out += validar_guardias(guardias, anio, mes, grados, municipios, municipio_default, numeros=numeros)
+    out.sort(key=lambda x: x["fila"])
+    return out
+
+def _cargar_vivo(tarea, municipio_default: str):
+    """Contexto de los totales en vivo (`GuardiaGUI._vivo`); corre en una TareaFondo."""
+    from app.instantanea import cargar_instantanea, huella_vigente
+    inst = cargar_instantanea()
+    # Tras reconstruirla cambia su mtime: la clave se toma después de cargarla
+    return (huella_vigente(), municipio_default), inst.calendario(municipio_default), inst.tarifas()
+
+def _neto(bruto: float, irpf: float) -> float:
+    # Mismo redondeo que app.nucleo.calcular_guardia
+    return round(bruto * (1.0 - irpf / 100.0), 4)
+
 # ---- Definición de columnas (anchos base en caracteres; la 1ª fila se mide y se fija en píxeles) ----
 COLS = [
     {"key": "_idx",       "title": "#",            "width_chars": 3},
@@ -28,47 +132,13 @@ COLS = [
     {"key": "tipo_fin",   "title": "Pago fin",     "width_chars": 18},  # Radios N/F/E
     {"key": "municipio",  "title": "Municipio",    "width_chars": 28},
     {"key": "grado",      "title": "Grado",        "width_chars": 8},
-    {"key": "observ",     "title": "Observ.",      "width_chars": 36},
+    {"key": "observ",     "title": "Observ.",      "width_chars": 26},
+    {"key": "_bruto",     "title": "Bruto €",      "width_chars": 9},   # totales en vivo
+    {"key": "_neto",      "title": "Neto €",       "width_chars": 9},
     {"key": "_del",       "title": "",             "width_chars": 8},
 ]
 SPACER_COL = len(COLS)  # columna espaciadora
 
-# ---- Fallback de municipios ----
-_MUN_FALLBACK = [
-    "Aguadulce","Alanís","Albaida del Aljarafe","Alcalá de Guadaíra","Alcalá del Río",
-    "Alcolea del Río","Algámitas","La Algaba","Almadén de la Plata","Almensilla","Arahal",
-    "Aznalcázar","Aznalcóllar","Badolatosa","Benacazón","Bollullos de la Mitación","Bormujos",
-    "Brenes","Burguillos","Las Cabezas de San Juan","Camas","La Campana","Cantillana",
-    "Cañada Rosal","Carmona","Carrión de los Céspedes","Casariche","Castilblanco de los Arroyos",
-    "Castilleja de Guzmán","Castilleja de la Cuesta","Castilleja del Campo","El Castillo de las Guardas",
-    "Cazalla de la Sierra","Constantina","Coria del Río","Coripe","El Cuervo de Sevilla","Dos Hermanas",
-    "Écija","El Garrobo","Gelves","Gerena","Gilena","Gines","Guadalcanal","Guillena","Herrera",
-    "Huévar del Aljarafe","Isla Mayor","La Lantejuela","Lebrija","Lora de Estepa","Lora del Río",
-    "La Luisiana","El Madroño","Mairena del Alcor","Mairena del Aljarafe","Marchena","Marinaleda",
-    "Martín de la Jara","Los Molares","Montellano","Morón de la Frontera","Las Navas de la Concepción",
-    "Olivares","Osuna","Los Palacios y Villafranca","Palomares del Río","Paradas","Pedrera","El Pedroso",
-    "Peñaflor","Pilas","Pruna","La Puebla de Cazalla","La Puebla de los Infantes","La Puebla del Río",
-    "El Real de la Jara","La Rinconada","La Roda de Andalucía","El Ronquillo","El Rubio","Salteras",
-    "San Juan de Aznalfarache","San Nicolás del Puerto","Sanlúcar la Mayor","Santiponce","El Saucejo",
-    "Sevilla","Tocina","Tomares","Umbrete","Utrera","Valencina de la Concepción","Villamanrique de la Condesa",
-    "Villanueva de San Juan","Villanueva del Ariscal","Villanueva del Río y Minas","Villaverde del Río",
-    "El Viso del Alcor","El Coronil","El Palmar de Troya"
-]
-
-def _load_municipios() -> list[str]:
-    path = Path("data/municipios_sevilla.csv")
-    if not path.exists():
-        return _MUN_FALLBACK[:]
-    try:
-        df = pd.read_csv(path, dtype=str).fillna("")
-        if "municipio" not in df.columns:
-            return _MUN_FALLBACK[:]
-        vals = [str(m).strip() for m in df["municipio"].tolist() if str(m).strip()]
-        vals = list(dict.fromkeys(vals))
-        return vals if vals else _MUN_FALLBACK[:]
-    except Exception:
-        return _MUN_FALLBACK[:]
-
 # ---- Combobox con autocompletado ----
 class AutoCompleteCombobox(ttk.Combobox):
     def __init__(self, master=None, **kw):
@@ -119,15 +189,39 @@ class GuardiaGUI(tk.Tk):
         self.mes_var = tk.StringVar(value="9")
         self.municipio_default_var = tk.StringVar(value=(self.municipios[0] if self.municipios else "Sevilla"))
         self.salida_dir = tk.StringVar(value=str(Path("output").resolve()))
+        self.motor_var = tk.StringVar(value="iterativo")
+        self.segmentos_var = tk.BooleanVar(value=False)
+        self.formato_var = tk.StringVar(value="csv")
+        self.perfil_var = tk.BooleanVar(value=False)  # informe de tiempos/memoria junto a las salidas
+        self.historial_var = tk.BooleanVar(value=False)  # guardar el resumen en <salida>/historial.sqlite
+        self.agregados_var = tk.BooleanVar(value=False)  # totales del mes en <salida>/agregados/
+        self.excel_var = tk.BooleanVar(value=False)      # además, nomina_<mes>.xlsx
 
         # Almacena las referencias de frames del header y ancho fijo por columna (en píxeles)
         self.header_cells = []
         self.fixed_col_widths = None  # se fija tras medir la primera fila
 
+        # Entre cálculos se conservan la configuración cargada y los resultados por guardia
+        self._ctx = None    # ((huella, municipio por defecto), reglas, tarifas, calendario)
+        self._cache = None  # app.cache.CacheResultados en memoria
+        self._tarea = None  # app.tareas.TareaFondo en curso (cálculo o carga de CSV)
+        self._al_terminar = None
+        self.estado_var = tk.StringVar(value="Listo")
+        self.total_var = tk.StringVar(value="Total mes: —")
+        self._pendientes = {}   # id(fila) -> fila pendiente de recalcular (totales en vivo)
+        self._id_totales = None
+        self._vivo = None       # ((huella_vigente, municipio por defecto), calendario, tarifas) de la instantánea
+        self._tarea_vivo = None  # TareaFondo que reconstruye self._vivo
+
         self._build_header()
         self._build_table()
         self._build_buttons()
 
+        # Cambios que afectan a todas las filas (el IRPF solo al neto)
+        for var in (self.anio_var, self.mes_var, self.municipio_default_var):
+            var.trace_add("write", self._marcar_todas)
+        self.irpf_var.trace_add("write", self._programar_totales)
+
     # ---- Barra superior ----
     def _build_header(self):
         frm = ttk.Frame(self, padding=8)
@@ -168,15 +262,15 @@ class GuardiaGUI(tk.Tk):
             except Exception:
                 mdays = 31
             self.dias_mes = [f"{d:02d}" for d in range(1, mdays+1)]
-            for rw in getattr(self, "rows", []):
-                if "dia_ini" in rw: rw["dia_ini"]["cb"].set_completion_list(self.dias_mes)
-                if "dia_fin" in rw: rw["dia_fin"]["cb"].set_completion_list(self.dias_mes)
+            for hueco in getattr(self, "_huecos", []):
+                for cb in hueco["cb_dias"]:
+                    cb.set_completion_list(self.dias_mes)
 
         anio_entry.bind("<FocusOut>", _refresh_days)
         mes_entry.bind("<FocusOut>", _refresh_days)
         _refresh_days()
 
-    # ---- Tabla tipo Excel ----
+    # ---- Tabla tipo Excel (virtualizada) ----
     def _build_table(self):
         wrap = ttk.Frame(self, padding=(8,0,8,8))
         wrap.pack(fill=tk.BOTH, expand=True)
@@ -196,32 +290,64 @@ class GuardiaGUI(tk.Tk):
         tk.Frame(self.header, bd=0).grid(row=0, column=SPACER_COL, sticky="ew")
         self.header.grid_columnconfigure(SPACER_COL, weight=1)
 
-        # Cuerpo con scroll
-        self.canvas = tk.Canvas(wrap, borderwidth=0, highlightthickness=0)
-        self.scroll_y = ttk.Scrollbar(wrap, orient="vertical", command=self.canvas.yview)
-        self.rows_frame = ttk.Frame(self.canvas)
-        self.rows_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.create_window((0, 0), window=self.rows_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scroll_y.set)
-        self.canvas.pack(side="left", fill="both", expand=True)
+        # Cuerpo: los datos viven en self.filas (lista de dicts) y solo existen widgets
+        # para las filas visibles ("huecos"), que se reutilizan al desplazarse.
+        body = ttk.Frame(wrap)
+        body.pack(fill="both", expand=True)
+        self.rows_frame = ttk.Frame(body)
+        self.rows_frame.grid_propagate(False)  # su alto lo decide la ventana, no los huecos
+        self.scroll_y = ttk.Scrollbar(body, orient="vertical", command=self._on_scroll)
+        self.rows_frame.pack(side="left", fill="both", expand=True)
         self.scroll_y.pack(side="right", fill="y")
 
         for c, _ in enumerate(COLS):
             self.rows_frame.grid_columnconfigure(c, weight=0)
         self.rows_frame.grid_columnconfigure(SPACER_COL, weight=1)
 
-        self.rows = []
-        # IMPORTANTE: la 1ª fila se crea y luego se miden sus anchos
-        self.add_row()
+        self.filas = [fila_vacia()]
+        self._huecos = []
+        self._primera = 0       # índice en self.filas de la fila mostrada en el 1er hueco
+        self._n_visibles = 1
+        self._pintando = False  # evita que _pintar escriba de vuelta en el modelo
+        # IMPORTANTE: el 1er hueco se crea y luego se miden sus anchos
+        self._crear_hueco()
+        self._pintar()
+        self.rows_frame.bind("<Configure>", self._ajustar_huecos)
+        self.rows_frame.bindtags((ETIQUETA_TABLA,) + self.rows_frame.bindtags())
+        for ev in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind_class(ETIQUETA_TABLA, ev, self._on_wheel)
         self.after(0, self._sync_header_to_first_row)
 
     def _build_buttons(self):
         frm = ttk.Frame(self, padding=8)
         frm.pack(fill=tk.X)
         ttk.Button(frm, text="Añadir fila", command=self.add_row).pack(side=tk.LEFT)
-        ttk.Button(frm, text="Cargar CSV...", command=self.load_csv).pack(side=tk.LEFT, padx=(8,0))
+        self._btn_cargar = ttk.Button(frm, text="Cargar CSV...", command=self.load_csv)
+        self._btn_cargar.pack(side=tk.LEFT, padx=(8,0))
         ttk.Button(frm, text="Guardar CSV...", command=self.save_csv).pack(side=tk.LEFT, padx=(8,0))
-        ttk.Button(frm, text="Calcular", command=self.run_calc).pack(side=tk.RIGHT)
+        self._btn_calc = ttk.Button(frm, text="Calcular", command=self.run_calc)
+        self._btn_calc.pack(side=tk.RIGHT)
+        ttk.Combobox(frm, textvariable=self.formato_var, values=FORMATOS_GUI,
+                     width=8, state="readonly").pack(side=tk.RIGHT, padx=(0,12))
+        ttk.Label(frm, text="Formato:").pack(side=tk.RIGHT, padx=(0,4))
+        ttk.Checkbutton(frm, text="Perfilar", variable=self.perfil_var).pack(side=tk.RIGHT, padx=(0,12))
+        ttk.Checkbutton(frm, text="Guardar en historial", variable=self.historial_var).pack(side=tk.RIGHT, padx=(0,12))
+        ttk.Checkbutton(frm, text="Agregados mensuales", variable=self.agregados_var).pack(side=tk.RIGHT, padx=(0,12))
+        ttk.Checkbutton(frm, text="Excel", variable=self.excel_var).pack(side=tk.RIGHT, padx=(0,12))
+        ttk.Checkbutton(frm, text="Detalle por segmentos", variable=self.segmentos_var).pack(side=tk.RIGHT, padx=(0,12))
+        ttk.Combobox(frm, textvariable=self.motor_var, values=MOTORES_GUI,
+                     width=12, state="readonly").pack(side=tk.RIGHT, padx=(0,8))
+        ttk.Label(frm, text="Motor:").pack(side=tk.RIGHT, padx=(0,4))
+
+        # Barra de estado: progreso del cálculo/carga en segundo plano y cancelación
+        est = ttk.Frame(self, padding=(8,0,8,8))
+        est.pack(fill=tk.X)
+        self._btn_cancelar = ttk.Button(est, text="Cancelar", command=self.cancelar_tarea, state="disabled")
+        self._btn_cancelar.pack(side=tk.RIGHT)
+        self._progreso = ttk.Progressbar(est, length=240, mode="determinate")
+        self._progreso.pack(side=tk.RIGHT, padx=(0,8))
+        ttk.Label(est, textvariable=self.estado_var).pack(side=tk.LEFT)
+        ttk.Label(est, textvariable=self.total_var).pack(side=tk.LEFT, padx=(24,0))
 
     def _select_output_dir(self):
         d = filedialog.askdirectory(title="Seleccionar carpeta de salida")
@@ -229,7 +355,7 @@ class GuardiaGUI(tk.Tk):
             self.salida_dir.set(d)
 
     # ---- Crear una celda (marco) con ancho fijo si ya lo conocemos ----
-    def _make_cell_frame(self, parent, row_index, col_index, height=30):
+    def _make_cell_frame(self, parent, row_index, col_index, height=ALTO_FILA):
         f = tk.Frame(parent, bd=1, relief="solid")
         f.grid(row=row_index, column=col_index, sticky="w")
         if self.fixed_col_widths:
@@ -237,11 +363,11 @@ class GuardiaGUI(tk.Tk):
             f.grid_propagate(False)
         return f
 
-    # ---- Medir 1ª fila y fijar anchos del encabezado + futuras filas ----
+    # ---- Medir 1er hueco y fijar anchos del encabezado + todos los huecos ----
     def _sync_header_to_first_row(self):
-        if not self.rows:
+        if not self._huecos:
             return
-        first = self.rows[0]
+        first = self._huecos[0]
         widths = []
         for col_index in range(len(COLS)):
             cell_frame = first["cell_frames"][col_index]
@@ -257,44 +383,42 @@ class GuardiaGUI(tk.Tk):
             hcell.configure(width=w, height=28)
             hcell.grid_propagate(False)
 
-        # Reaplicar a la fila 0 (para que se ajuste exactamente)
-        for col_index, w in enumerate(self.fixed_col_widths):
-            fr = first["cell_frames"][col_index]
-            fr.configure(width=w, height=30)
-            fr.grid_propagate(False)
+        # Reaplicar a los huecos ya creados (para que se ajusten exactamente)
+        for hueco in self._huecos:
+            for col_index, w in enumerate(self.fixed_col_widths):
+                fr = hueco["cell_frames"][col_index]
+                fr.configure(width=w, height=ALTO_FILA)
+                fr.grid_propagate(False)
 
-    # ---- Filas ----
-    def add_row(self, preset=None):
-        if len(self.rows) >= MAX_ROWS:
-            messagebox.showwarning("Límite", f"Máximo {MAX_ROWS} guardias.")
-            return
-        r = len(self.rows)
-        row_widgets = {"cell_frames": []}
+    # ---- Huecos: widgets de una fila visible, reutilizables ----
+    def _crear_hueco(self):
+        r = len(self._huecos)
+        hueco = {"fila": None, "visible": True, "cell_frames": [], "vars": {}, "cb_dias": []}
 
         # helpers de widgets
-        def add_ac_combo(parent, width_chars, values, value=""):
-            var = tk.StringVar(value=value)
+        def add_ac_combo(parent, width_chars, values):
+            var = tk.StringVar(value="")
             cb = AutoCompleteCombobox(parent, textvariable=var, values=values,
                                       width=width_chars, state="normal")
             cb.set_completion_list(values)
             cb.pack(padx=4, pady=2, anchor="w")
-            return {"var": var, "cb": cb}
+            return var, cb
 
-        def add_entry(parent, width_chars, value=""):
-            var = tk.StringVar(value=value)
+        def add_entry(parent, width_chars):
+            var = tk.StringVar(value="")
             ent = ttk.Entry(parent, textvariable=var, width=width_chars)
             ent.pack(padx=4, pady=2, anchor="w")
             return var
 
-        def add_combo(parent, width_chars, values, value=""):
-            var = tk.StringVar(value=value)
+        def add_combo(parent, width_chars, values):
+            var = tk.StringVar(value="")
             cb = ttk.Combobox(parent, textvariable=var, values=values,
                               width=width_chars, state="readonly")
             cb.pack(padx=4, pady=2, anchor="w")
             return var
 
-        def add_tipo_radios(parent, value=""):
-            var = tk.StringVar(value=value)  # "", "normal", "festivo", "especial"
+        def add_tipo_radios(parent):
+            var = tk.StringVar(value="")  # "", "normal", "festivo", "especial"
             inner = ttk.Frame(parent)
             inner.pack(padx=2, pady=2, anchor="w")
             ttk.Radiobutton(inner, text="N", value="normal",   variable=var).pack(side=tk.LEFT, padx=2)
@@ -307,61 +431,243 @@ class GuardiaGUI(tk.Tk):
         # celdas: crear frames (si ya tenemos fixed_col_widths, se aplican ahora)
         for col_index in range(len(COLS)):
             fr = self._make_cell_frame(self.rows_frame, r, col_index)
-            row_widgets["cell_frames"].append(fr)
+            hueco["cell_frames"].append(fr)
+        cf = hueco["cell_frames"]
+        v = hueco["vars"]
 
-        # Col 0 índice
-        ttk.Label(row_widgets["cell_frames"][0], text=str(r+1)).pack(padx=4, pady=2, anchor="w")
+        # Col 0 índice (de la fila del modelo que muestra el hueco)
+        hueco["idx_var"] = tk.StringVar(value="")
+        ttk.Label(cf[0], textvariable=hueco["idx_var"]).pack(padx=4, pady=2, anchor="w")
 
         dias_vals = getattr(self, "dias_mes", [f"{d:02d}" for d in range(1,32)])
         horas_vals = [f"{h:02d}" for h in range(24)]
 
         # Widgets en sus celdas
-        row_widgets["dia_ini"]  = add_ac_combo(row_widgets["cell_frames"][1], COLS[1]["width_chars"], dias_vals, (preset.get("dia_ini","") if preset else ""))
-        row_widgets["hora_ini"] = add_ac_combo(row_widgets["cell_frames"][2], COLS[2]["width_chars"], horas_vals, (preset.get("hora_ini","") if preset else ""))
-        row_widgets["tipo_ini"] = add_tipo_radios(row_widgets["cell_frames"][3], (preset.get("tipo_ini","") if preset else ""))
+        v["dia_ini"], cb_ini = add_ac_combo(cf[1], COLS[1]["width_chars"], dias_vals)
+        v["hora_ini"], _ = add_ac_combo(cf[2], COLS[2]["width_chars"], horas_vals)
+        v["tipo_ini"] = add_tipo_radios(cf[3])
+
+        v["dia_fin"], cb_fin = add_ac_combo(cf[4], COLS[4]["width_chars"], dias_vals)
+        v["hora_fin"], _ = add_ac_combo(cf[5], COLS[5]["width_chars"], horas_vals)
+        v["tipo_fin"] = add_tipo_radios(cf[6])
 
-        row_widgets["dia_fin"]  = add_ac_combo(row_widgets["cell_frames"][4], COLS[4]["width_chars"], dias_vals, (preset.get("dia_fin","") if preset else ""))
-        row_widgets["hora_fin"] = add_ac_combo(row_widgets["cell_frames"][5], COLS[5]["width_chars"], horas_vals, (preset.get("hora_fin","") if preset else ""))
-        row_widgets["tipo_fin"] = add_tipo_radios(row_widgets["cell_frames"][6], (preset.get("tipo_fin","") if preset else ""))
+        v["municipio"], _ = add_ac_combo(cf[7], COLS[7]["width_chars"], self.municipios)
+        v["grado"] = add_combo(cf[8], COLS[8]["width_chars"], GRADOS)
+        v["observaciones"] = add_entry(cf[9], COLS[9]["width_chars"])
+        hueco["cb_dias"] = [cb_ini, cb_fin]
 
-        row_widgets["municipio"] = add_ac_combo(row_widgets["cell_frames"][7], COLS[7]["width_chars"], self.municipios, (preset.get("municipio","") if preset else ""))
-        row_widgets["grado"] = add_combo(row_widgets["cell_frames"][8], COLS[8]["width_chars"], GRADOS, (preset.get("grado","") if preset else ""))
-        row_widgets["observaciones"] = add_entry(row_widgets["cell_frames"][9], COLS[9]["width_chars"], (preset.get("observaciones","") if preset else ""))
+        hueco["bruto_var"] = tk.StringVar(value="")
+        hueco["neto_var"] = tk.StringVar(value="")
+        ttk.Label(cf[10], textvariable=hueco["bruto_var"], width=COLS[10]["width_chars"],
+                  anchor="e").pack(padx=4, pady=2, anchor="e")
+        ttk.Label(cf[11], textvariable=hueco["neto_var"], width=COLS[11]["width_chars"],
+                  anchor="e").pack(padx=4, pady=2, anchor="e")
 
-        btn = ttk.Button(row_widgets["cell_frames"][10], text="Borrar", width=COLS[10]["width_chars"], command=lambda i=r: self.delete_row(i))
-        btn.pack(padx=4, pady=2, anchor="w")
-        row_widgets["_btn"] = btn
+        ttk.Button(cf[12], text="Borrar", width=COLS[12]["width_chars"],
+                   command=lambda h=hueco: self._borrar_hueco(h)).pack(padx=4, pady=2, anchor="w")
 
         # Espaciadora
-        tk.Frame(self.rows_frame).grid(row=r, column=SPACER_COL, sticky="ew")
+        spacer = tk.Frame(self.rows_frame)
+        spacer.grid(row=r, column=SPACER_COL, sticky="ew")
+        hueco["grid"] = cf + [spacer]
+
+        # La rueda sobre cualquier widget del hueco desplaza la tabla (y no cambia el combobox)
+        pendientes = list(hueco["grid"])
+        while pendientes:
+            w = pendientes.pop()
+            w.bindtags((ETIQUETA_TABLA,) + w.bindtags())
+            pendientes.extend(w.winfo_children())
+
+        # Lo que se edita en el hueco se escribe en la fila del modelo que muestra
+        for campo, var in v.items():
+            var.trace_add("write", lambda *_a, h=hueco, c=campo: self._al_editar(h, c))
+
+        self._huecos.append(hueco)
+        return hueco
+
+    def _al_editar(self, hueco, campo):
+        if self._pintando or hueco["fila"] is None:
+            return
+        fila = self.filas[hueco["fila"]]
+        fila[campo] = hueco["vars"][campo].get()
+        self._marcar(fila)
+
+    def _ajustar_huecos(self, event=None):
+        """Crea los huecos que quepan en el alto disponible (nunca se destruyen)."""
+        alto = event.height if event is not None else self.rows_frame.winfo_height()
+        self._n_visibles = max(1, alto // ALTO_FILA)
+        while len(self._huecos) < self._n_visibles:
+            self._crear_hueco()
+        self._pintar()
+
+    def _pintar(self):
+        """Vuelca en los huecos las filas del modelo a partir de self._primera: O(huecos visibles)."""
+        total = len(self.filas)
+        n_vis = self._n_visibles
+        irpf = self._irpf_vivo()
+        self._primera = max(0, min(self._primera, total - n_vis))
+        self._pintando = True
+        try:
+            for k, hueco in enumerate(self._huecos):
+                i = self._primera + k
+                mostrar = k < n_vis and i < total
+                if mostrar:
+                    hueco["fila"] = i
+                    hueco["idx_var"].set(str(i + 1))
+                    fila = self.filas[i]
+                    for campo, var in hueco["vars"].items():
+                        if var.get() != fila[campo]:
+                            var.set(fila[campo])
+                    bruto = fila.get("_bruto")
+                    hueco["bruto_var"].set("" if bruto is None else f"{bruto:.2f}")
+                    hueco["neto_var"].set("" if bruto is None else f"{_neto(bruto, irpf):.2f}")
+                else:
+                    hueco["fila"] = None
+                if mostrar != hueco["visible"]:
+                    for w in hueco["grid"]:
+                        (w.grid if mostrar else w.grid_remove)()
+                    hueco["visible"] = mostrar
+        finally:
+            self._pintando = False
+        if total > n_vis:
+            self.scroll_y.set(self._primera / total, (self._primera + n_vis) / total)
+        else:
+            self.scroll_y.set(0.0, 1.0)
+
+    def _on_scroll(self, *args):
+        if args[0] == "moveto":
+            self._primera = int(round(float(args[1]) * len(self.filas)))
+        elif args[0] == "scroll":
+            self._primera += int(args[1]) * (self._n_visibles if args[2] == "pages" else 1)
+        self._pintar()
+
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self._primera -= FILAS_RUEDA
+        else:
+            self._primera += FILAS_RUEDA
+        self._pintar()
+        return "break"
+
+    # ---- Filas (operaciones sobre el modelo; solo se repintan los huecos) ----
+    def add_row(self, preset=None):
+        self.filas.append(fila_vacia(preset))
+        self._primera = len(self.filas) - self._n_visibles  # mostrar la fila nueva
+        self._pintar()
 
-        self.rows.append(row_widgets)
+    def _borrar_hueco(self, hueco):
+        if hueco["fila"] is not None:
+            self.delete_row(hueco["fila"])
 
     def delete_row(self, idx):
-        if idx < 0 or idx >= len(self.rows):
+        """
+        Quita la fila `idx` del modelo. `del` en la lista es O(n) (desplaza las referencias
+        posteriores; con decenas de miles de filas sigue por debajo del milisegundo) y el
+        repintado es O(huecos visibles). Se mantiene la lista porque el scroll y `_pintar`
+        direccionan las filas por posición.
+        """
+        if idx < 0 or idx >= len(self.filas):
             return
-        for child in list(self.rows_frame.children.values()):
-            child.destroy()
-        del self.rows[idx]
-        tmp = self.rows[:]
-        self.rows = []
-        for preset in tmp:
-            vals = {}
-            for k, v in preset.items():
-                if k.startswith("_"):
-                    continue
-                if isinstance(v, dict) and "var" in v:
-                    vals[k] = v["var"].get()
-                elif hasattr(v, "get"):
-                    vals[k] = v.get()
-                else:
-                    vals[k] = ""
-            self.add_row(preset=vals)
-        # tras reconstruir, asegurar que header sigue alineado
-        self.after(0, self._sync_header_to_first_row)
+        del self.filas[idx]
+        if not self.filas:
+            self.filas.append(fila_vacia())
+        self._pintar()
+        self._programar_totales()
+
+    # ---- Totales en vivo ----
+    # Cada edición marca su fila; tras RETARDO_TOTALES_MS sin cambios se recalculan solo las
+    # filas marcadas (app.nucleo sobre la instantánea en memoria) y se suman los brutos guardados.
+    # El IRPF solo afecta al neto, que se deriva del bruto sin recalcular horas.
+    def _irpf_vivo(self) -> float:
+        try:
+            return max(0.0, min(float(self.irpf_var.get().replace(",", ".").strip() or "0"), 100.0))
+        except ValueError:
+            return 0.0
+
+    def _marcar(self, fila):
+        fila.pop("_bruto", None)
+        self._pendientes[id(fila)] = fila
+        self._programar_totales()
+
+    def _marcar_todas(self, *_args):
+        for fila in self.filas:
+            fila.pop("_bruto", None)
+            self._pendientes[id(fila)] = fila
+        self._programar_totales()
+
+    def _programar_totales(self, *_args):
+        if self._id_totales is not None:
+            self.after_cancel(self._id_totales)
+        self._id_totales = self.after(RETARDO_TOTALES_MS, self._evaluar_pendientes)
+
+    def _contexto_vivo(self, municipio_default: str):
+        """
+        (calendario, tarifas) de la instantánea; se rehacen solo si cambia config/, data/, la
+        instantánea o el municipio. En cada pulsación solo se hace stat de esos ficheros.
+        Si hay que rehacerlos (puede tocar releer tarifas.xlsx) se hace en una TareaFondo y
+        devuelve None; al terminar se vuelven a programar los totales.
+        """
+        from app.instantanea import huella_vigente
+        clave = (huella_vigente(), municipio_default)
+        if self._vivo is not None and self._vivo[0] == clave:
+            return self._vivo[1:]
+        if self._tarea_vivo is None:
+            from app.tareas import TareaFondo
+            self._tarea_vivo = TareaFondo(_cargar_vivo, municipio_default).iniciar()
+            self.after(INTERVALO_SONDEO_MS, self._sondear_vivo)
+        return None
+
+    def _sondear_vivo(self):
+        for estado, valor in self._tarea_vivo.mensajes():
+            self._tarea_vivo = None
+            if estado == "ok":
+                self._vivo = valor
+                self._programar_totales()
+            else:
+                self.total_var.set("Total mes: —")
+            return
+        self.after(INTERVALO_SONDEO_MS, self._sondear_vivo)
+
+    def _evaluar_pendientes(self):
+        from app.nucleo import calcular_guardia
+        self._id_totales = None
+        try:
+            anio = int(self.anio_var.get()); mes = int(self.mes_var.get())
+            muni_default = self.municipio_default_var.get().strip()
+            contexto = self._contexto_vivo(muni_default)
+        except Exception:
+            self.total_var.set("Total mes: —")
+            return
+        if contexto is None:
+            self.total_var.set("Total mes: cargando configuración...")
+            return
+        cal, tarifas = contexto
+
+        # Por tandas, para no bloquear la ventana si hay miles de filas marcadas
+        for _ in range(min(LOTE_TOTALES, len(self._pendientes))):
+            _, fila = self._pendientes.popitem()
+            guardia = guardia_de_fila(fila, anio, mes, muni_default)
+            if guardia is None:
+                continue
+            try:
+                _, res = calcular_guardia(guardia, cal, tarifas, 0.0, True, True)
+            except Exception:
+                continue  # p.ej. grado sin tarifa: la fila queda sin importe
+            fila["_bruto"] = res["Resultado"]
+        if self._pendientes:
+            self._id_totales = self.after(1, self._evaluar_pendientes)
+
+        self._pintar()
+        irpf = self._irpf_vivo()
+        brutos = [f["_bruto"] for f in self.filas if f.get("_bruto") is not None]
+        bruto = sum(brutos)
+        neto = sum(_neto(b, irpf) for b in brutos)
+        sufijo = " (calculando...)" if self._pendientes else ""
+        self.total_var.set(f"Total mes: bruto {bruto:.2f} € · neto {neto:.2f} € · {len(brutos)} guardias{sufijo}")
 
     # ---- CSV <-> DF ----
     def rows_to_df(self):
+        import pandas as pd
         rows = []
         try:
             y = int(self.anio_var.get()); m = int(self.mes_var.get())
@@ -371,83 +677,38 @@ class GuardiaGUI(tk.Tk):
                 "inicio_datetime","fin_datetime","municipio","grado","observaciones","tipo_ini","tipo_fin"
             ])
 
-        for rw in self.rows:
-            dia_ini  = rw["dia_ini"]["var"].get().strip()
-            hora_ini = rw["hora_ini"]["var"].get().strip()
-            tipo_ini = (rw["tipo_ini"].get().strip() if hasattr(rw["tipo_ini"], "get") else "")
-            dia_fin  = rw["dia_fin"]["var"].get().strip()
-            hora_fin = rw["hora_fin"]["var"].get().strip()
-            tipo_fin = (rw["tipo_fin"].get().strip() if hasattr(rw["tipo_fin"], "get") else "")
-            municipio = rw["municipio"]["var"].get().strip() if isinstance(rw["municipio"], dict) else ""
-            grado = (rw["grado"].get().strip() if hasattr(rw["grado"], "get") else "")
-            observ = (rw["observaciones"].get().strip() if hasattr(rw["observaciones"], "get") else "")
-
-            if not any([dia_ini, hora_ini, dia_fin, hora_fin, municipio, grado, observ, tipo_ini, tipo_fin]):
-                continue
-            if not municipio:
-                municipio = self.municipio_default_var.get().strip()
-            if not (dia_ini and hora_ini and dia_fin and hora_fin and grado):
-                continue
-
-            try:
-                d1 = int(dia_ini); h1 = int(hora_ini)
-                d2 = int(dia_fin); h2 = int(hora_fin)
-                inicio = datetime(y, m, d1, h1, 0)
-                fin = datetime(y, m, d2, h2, 0)
-                if fin <= inicio:
-                    continue
-            except Exception:
-                continue
-
-            rows.append({
-                "inicio_datetime": inicio.strftime("%Y-%m-%d %H:%M"),
-                "fin_datetime": fin.strftime("%Y-%m-%d %H:%M"),
-                "municipio": municipio,
-                "grado": grado,
-                "observaciones": observ,
-                "tipo_ini": tipo_ini,
-                "tipo_fin": tipo_fin,
-            })
+        municipio_default = self.municipio_default_var.get().strip()
+        for rw in self.filas:
+            guardia = guardia_de_fila(rw, y, m, municipio_default)
+            if guardia is not None:
+                rows.append(guardia)
 
         return pd.DataFrame(rows, columns=[
             "inicio_datetime","fin_datetime","municipio","grado","observaciones","tipo_ini","tipo_fin"
         ])
 
     def load_csv(self):
+        if self._tarea is not None:
+            return
         path = filedialog.askopenfilename(title="Cargar guardias CSV", filetypes=[("CSV","*.csv")])
         if not path:
             return
-        try:
-            df = pd.read_csv(path, dtype=str).fillna("")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo leer el CSV:\n{e}")
-            return
 
-        for child in list(self.rows_frame.children.values()):
-            child.destroy()
-        self.rows = []
-        for _, row in df.iterrows():
-            try:
-                ini = datetime.fromisoformat(str(row["inicio_datetime"]).strip())
-                fin = datetime.fromisoformat(str(row["fin_datetime"]).strip())
-                preset = {
-                    "dia_ini": f"{ini.day:02d}", "hora_ini": f"{ini.hour:02d}",
-                    "tipo_ini": str(row.get("tipo_ini","")),
-                    "dia_fin": f"{fin.day:02d}", "hora_fin": f"{fin.hour:02d}",
-                    "tipo_fin": str(row.get("tipo_fin","")),
-                    "municipio": str(row.get("municipio","")),
-                    "grado": str(row.get("grado","")),
-                    "observaciones": str(row.get("observaciones","")),
-                }
-            except Exception:
-                preset = {}
-            self.add_row(preset=preset)
+        def _leer(tarea, path):
+            from app.io_csv import leer_guardias
+            tarea.progreso(0, 0, f"Leyendo {Path(path).name}...")
+            df = leer_guardias(path)
+            tarea.progreso(0, 0, f"Preparando {len(df)} guardias...")
+            return filas_desde_df(df)
 
-        if len(self.rows) == 0:
-            self.add_row()
+        from app.tareas import TareaFondo
+        self._lanzar(TareaFondo(_leer, path), "Leyendo CSV...", self._mostrar_filas)
 
-        # Ajustar encabezados a la nueva primera fila
-        self.after(0, self._sync_header_to_first_row)
+    def _mostrar_filas(self, filas):
+        self.filas = filas or [fila_vacia()]
+        self._primera = 0
+        self._pintar()
+        self._marcar_todas()
 
     def save_csv(self):
         df = self.rows_to_df()
@@ -467,9 +728,192 @@ class GuardiaGUI(tk.Tk):
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo guardar:\n{e}")
 
+    # ---- Tareas en segundo plano ----
+    def _lanzar(self, tarea, texto, al_terminar):
+        """Arranca `tarea` en un hilo; la barra de estado se actualiza sondeando su cola."""
+        self._tarea = tarea
+        self._al_terminar = al_terminar
+        self._btn_calc.state(["disabled"])
+        self._btn_cargar.state(["disabled"])
+        self._btn_cancelar.state(["!disabled"])
+        self.estado_var.set(texto)
+        self._progreso.configure(mode="indeterminate", value=0)
+        self._progreso.start(15)
+        tarea.iniciar()
+        self.after(INTERVALO_SONDEO_MS, self._sondear)
+
+    def _sondear(self):
+        tarea = self._tarea
+        if tarea is None:
+            return
+        for msg in tarea.mensajes():
+            if msg[0] == "progreso":
+                _, hechas, total, texto = msg
+                if total:
+                    self._progreso.stop()
+                    self._progreso.configure(mode="determinate", maximum=total, value=hechas)
+                if texto:
+                    self.estado_var.set(texto)
+            else:
+                self._fin_tarea(msg[0], msg[1])
+                return
+        self.after(INTERVALO_SONDEO_MS, self._sondear)
+
+    def _fin_tarea(self, estado, valor):
+        al_terminar = self._al_terminar
+        self._tarea = self._al_terminar = None
+        self._progreso.stop()
+        self._progreso.configure(mode="determinate", value=0)
+        self._btn_calc.state(["!disabled"])
+        self._btn_cargar.state(["!disabled"])
+        self._btn_cancelar.state(["disabled"])
+        if estado == "ok":
+            self.estado_var.set("Listo")
+            al_terminar(valor)
+        elif estado == "cancelado":
+            self.estado_var.set("Cancelado")
+        else:
+            self.estado_var.set("Error")
+            messagebox.showerror("Error", f"Ocurrió un error:\n{valor}")
+
+    def cancelar_tarea(self):
+        if self._tarea is not None:
+            self._tarea.cancelar()
+            self.estado_var.set("Cancelando...")
+
     # ---- Calcular ----
+    def _contexto(self, huella: str, municipio_default: str, anio: int, perfil=None):
+        """(reglas, tarifas, calendario) reutilizados mientras no cambien config/ ni data/."""
+        from app.perfil import Perfil
+        perfil = perfil or Perfil(activo=False)
+        clave = (huella, municipio_default)
+        perfil.datos["config_reutilizada"] = self._ctx is not None and self._ctx[0] == clave
+        if not perfil.datos["config_reutilizada"]:
+            from app.reglas import cargar_reglas
+            from app.tarifas import CargadorTarifas
+            from app.calendario import CalendarioFestivos
+            with perfil.etapa("reglas"):
+                reglas = cargar_reglas(Path("config/reglas.yml"))
+            with perfil.etapa("tarifas"):
+                tarifas = CargadorTarifas(Path("config/tarifas.xlsx"))
+            with perfil.etapa("festivos"):
+                cal = CalendarioFestivos(anio=anio, reglas=reglas, municipio_default=municipio_default)
+            self._ctx = (clave, reglas, tarifas, cal)
+        return self._ctx[1:]
+
+    def _calcular_en_fondo(self, tarea, df, p):
+        """Se ejecuta en el hilo de trabajo: solo usa `df` y los parámetros `p`, no widgets."""
+        from app.perfil import Perfil
+
+        base = f"{p['anio']:04d}-{p['mes']:02d}_{p['nombre']}"
+        out_dir = p["salida_dir"]
+        perfil = Perfil(activo=p["perfil"], pstats_path=out_dir / f"perfil_{base}.pstats")
+        perfil.datos.update({"motor": p["motor"], "guardias": len(df), "segmentos": p["segmentos"],
+                             "formato": p["formato"]})
+        try:
+            return self._calcular_y_escribir(tarea, df, p, perfil, base)
+        finally:
+            perfil.cerrar()
+
+    def _calcular_y_escribir(self, tarea, df, p, perfil, base):
+        import pandas as pd
+        from app.io_csv import FORMATOS, escribir_salidas
+        from app.calculo import detalle_en_formato, unir_detalles
+        from app.cache import huella_cache
+
+        tarea.progreso(0, 0, "Cargando reglas, tarifas y festivos...")
+        with perfil.etapa("huella_config"):
+            huella = huella_cache()
+        reglas, tarifas, cal = self._contexto(huella, p["municipio_default"], p["anio"], perfil)
+
+        total = len(df)
+        detalles, resumenes = [], []
+        with perfil.contando(cal):
+            for ini in range(0, total, LOTE_GUI):
+                tarea.progreso(ini, total, f"Calculando guardias {ini + 1}-{min(ini + LOTE_GUI, total)} de {total}...")
+                with perfil.etapa("calculo", perfilar=True):
+                    det, res = self._calcular_trozo(df.iloc[ini:ini + LOTE_GUI], list(df.columns),
+                                                    p, reglas, tarifas, cal, huella)
+                detalles.append(det)
+                resumenes.append(res)
+        tarea.progreso(total, total, "Escribiendo resultados...")
+        detalle = unir_detalles(detalles)
+        resumen = pd.concat(resumenes, ignore_index=True) if len(resumenes) > 1 else resumenes[0]
+        acum = None
+        if p.get("agregados"):
+            from app.agregados import acumular
+            with perfil.etapa("agregados"):
+                acum = acumular({}, detalle)
+        with perfil.etapa("segmentos" if p["segmentos"] else "formato"):
+            detalle = detalle_en_formato(detalle, "segmentos" if p["segmentos"] else "horario", reglas)
+
+        out_dir = p["salida_dir"]; out_dir.mkdir(parents=True, exist_ok=True)
+        formato = p["formato"] if p["formato"] in FORMATOS else "csv"
+        ext = FORMATOS[formato]
+        det_p = out_dir / f"detalle_{base}{ext}"
+        res_p = out_dir / f"resumen_{base}{ext}"
+        tarea.comprobar()  # una cancelación tardía no deja ficheros a medias
+        with perfil.etapa("escritura"):
+            rutas = escribir_salidas(detalle, resumen, det_p, res_p, formato=formato,
+                                     xlsx_path=out_dir / f"nomina_{base}.xlsx" if p.get("excel") else None)
+        if acum is not None:
+            from app.agregados import escribir_agregado
+            rutas.append(escribir_agregado(acum, out_dir, p["nombre"], p["anio"], p["mes"], p["irpf"]))
+        if p.get("historial"):
+            from app.historial import NOMBRE_DB, Historial
+            with perfil.etapa("historial"), Historial(out_dir / NOMBRE_DB) as h:
+                h.guardar(resumen, p["nombre"], p["anio"], p["mes"], motor=p["motor"])
+            rutas.append(out_dir / NOMBRE_DB)
+        if perfil.activo:
+            perfil_p = out_dir / f"perfil_{base}.json"
+            perfil.guardar(perfil_p)
+            rutas.append(perfil_p)
+            if perfil.pstats_path.exists():
+                rutas.append(perfil.pstats_path)
+        return rutas
+
+    def _calcular_trozo(self, trozo, columnas, p, reglas, tarifas, cal, huella):
+        import pandas as pd
+        from app.calculo import MOTORES
+        from app.cache import CacheResultados
+        from app.nucleo import COLUMNAS_RESUMEN
+        if p["motor"] == "iterativo":
+            # Solo se recalculan las guardias añadidas o modificadas desde el último cálculo
+            if self._cache is None:
+                self._cache = CacheResultados()
+            det_filas, res_filas = self._cache.calcular(
+                trozo.to_dict("records"), columnas, cal, tarifas, huella,
+                irpf_percent=p["irpf"], municipio_default=p["municipio_default"])
+            return pd.DataFrame(det_filas), pd.DataFrame(res_filas, columns=COLUMNAS_RESUMEN)
+        motor = MOTORES.get(p["motor"], MOTORES["iterativo"])
+        return motor(trozo, cal, tarifas, reglas, anio=p["anio"], mes=p["mes"], irpf_percent=p["irpf"])
+
+    def _confirmar_validacion(self) -> bool:
+        """Muestra solapes, duplicados, filas descartadas... y pregunta si calcular igualmente."""
+        from app.validacion import contar, formatear
+        try:
+            anio = int(self.anio_var.get()); mes = int(self.mes_var.get())
+        except ValueError:
+            return True  # rows_to_df ya lo ha avisado
+        muni_default = self.municipio_default_var.get().strip()
+        try:
+            grados = self._contexto_vivo(muni_default)[1].grados
+        except Exception:
+            grados = None  # sin tarifas legibles: el cálculo dará el error
+        incidencias = validar_filas(self.filas, anio, mes, muni_default, grados, self.municipios)
+        if not incidencias:
+            return True
+        n = contar(incidencias)
+        self.estado_var.set(f"Validación: {n['error']} errores, {n['aviso']} avisos")
+        return messagebox.askyesno("Validación", formatear(incidencias, limite=15) + "\n\n¿Calcular igualmente?",
+                                   icon="warning" if n["error"] else "info")
+
     def run_calc(self):
+        if self._tarea is not None:
+            return
         df = self.rows_to_df()
+        if not self._confirmar_validacion():
+            return
         if df.empty:
             messagebox.showwarning("Aviso", "No hay guardias válidas para calcular.")
             return
@@ -489,24 +933,21 @@ class GuardiaGUI(tk.Tk):
         nombre = self.nombre_var.get().strip()
         nombre_sanit = re.sub(r"[^A-Za-z0-9_-]+", "_", nombre) if nombre else "sin_nombre"
 
-        try:
-            reglas = cargar_reglas(Path("config/reglas.yml"))
-            tarifas = CargadorTarifas(Path("config/tarifas.xlsx"))
-            cal = CalendarioFestivos(anio=anio, reglas=reglas, municipio_default=self.municipio_default_var.get().strip())
-
-            detalle, resumen = calcular_importes(
-                df, cal, tarifas, reglas, anio=anio, mes=mes, irpf_percent=irpf
-            )
-
-            out_dir = Path(self.salida_dir.get().strip()); out_dir.mkdir(parents=True, exist_ok=True)
-            det_p = out_dir / f"detalle_{anio:04d}-{mes:02d}_{nombre_sanit}.csv"
-            res_p = out_dir / f"resumen_{anio:04d}-{mes:02d}_{nombre_sanit}.csv"
-
-            escribir_detalle(detalle, det_p)
-            escribir_resumen(resumen, res_p)
-            messagebox.showinfo("Cálculo completado", f"Se generaron:\n- {det_p}\n- {res_p}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Ocurrió un error durante el cálculo:\n{e}")
+        # Las variables de Tk se leen aquí: el hilo de trabajo no toca la interfaz
+        params = {
+            "anio": anio, "mes": mes, "irpf": irpf, "nombre": nombre_sanit,
+            "municipio_default": self.municipio_default_var.get().strip(),
+            "motor": self.motor_var.get(), "segmentos": self.segmentos_var.get(),
+            "formato": self.formato_var.get(), "salida_dir": Path(self.salida_dir.get().strip()),
+            "perfil": self.perfil_var.get(), "historial": self.historial_var.get(),
+            "agregados": self.agregados_var.get(), "excel": self.excel_var.get(),
+        }
+
+        def _hecho(rutas):
+            messagebox.showinfo("Cálculo completado", "Se generaron:\n" + "\n".join(f"- {r}" for r in rutas))
+
+        from app.tareas import TareaFondo
+        self._lanzar(TareaFondo(self._calcular_en_fondo, df, params), "Calculando...", _hecho)
 
 def launch():
     app = GuardiaGUI()
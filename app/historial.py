@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Historial opcional de resultados en SQLite (CLI/lote --historial, casilla de la GUI).
+- Por cada ejecución se guardan sus guardias (una fila del resumen cada una) bajo
+  (residente, periodo AAAAMM). Volver a calcular el mismo residente y mes sustituye
+  sus filas (upsert por posición y borrado de las sobrantes): repetir es idempotente.
+- Índices por residente, grado, municipio y periodo para agregar sin releer CSV.
+- Una guardia sin importe (grado con la tarifa vacía) se guarda con bruto/irpf/neto NULL:
+  cuenta como guardia y en horas, pero no en los totales de importe.
+- Consultas: `python main.py historial --anio 2025 --por residente --grado R3`
+"""
+import argparse
+import csv
+import json
+import math
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+NOMBRE_DB = "historial.sqlite"  # por defecto, dentro de la carpeta de salida
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS ejecuciones (
+    residente TEXT NOT NULL,
+    periodo   INTEGER NOT NULL,
+    fecha     TEXT NOT NULL,
+    entrada   TEXT,
+    motor     TEXT,
+    guardias  INTEGER NOT NULL,
+    horas     REAL NOT NULL,
+    bruto     REAL NOT NULL,
+    neto      REAL NOT NULL,
+    PRIMARY KEY (residente, periodo)
+);
+CREATE TABLE IF NOT EXISTS guardias (
+    residente     TEXT NOT NULL,
+    periodo       INTEGER NOT NULL,
+    orden         INTEGER NOT NULL,
+    inicio        TEXT NOT NULL,
+    fin           TEXT NOT NULL,
+    grado         TEXT NOT NULL,
+    municipio     TEXT NOT NULL,
+    observaciones TEXT NOT NULL,
+    horas         REAL NOT NULL,
+    bruto         REAL,
+    irpf          REAL,
+    neto          REAL,
+    PRIMARY KEY (residente, periodo, orden)
+);
+-- (residente, periodo) ya está indexado por la clave primaria
+CREATE INDEX IF NOT EXISTS ix_guardias_periodo   ON guardias (periodo);
+CREATE INDEX IF NOT EXISTS ix_guardias_grado     ON guardias (grado, periodo);
+CREATE INDEX IF NOT EXISTS ix_guardias_municipio ON guardias (municipio, periodo);
+"""
+
+# Claves de agrupación admitidas en las consultas -> expresión SQL
+AGRUPACIONES = {
+    "residente": "residente",
+    "grado": "grado",
+    "municipio": "municipio",
+    "mes": "periodo",
+    "anio": "periodo / 100",
+}
+
+def _horas(inicio: str, fin: str) -> float:
+    """Duración real de la guardia en horas."""
+    try:
+        d = datetime.fromisoformat(str(fin).strip()) - datetime.fromisoformat(str(inicio).strip())
+    except ValueError:
+        return 0.0
+    return round(max(d.total_seconds(), 0.0) / 3600.0, 4)
+
+def _texto(v) -> str:
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return ""
+    return str(v)
+
+def _numero(v):
+    """Importe del resumen; None (NULL) si la celda está vacía o es NaN (tarifa vacía)."""
+    if v is None or (isinstance(v, str) and not v.strip()):
+        return None
+    v = float(v)
+    return None if math.isnan(v) else v
+
+def _suma(valores) -> float:
+    return round(sum(v for v in valores if v is not None), 4)
+
+def leer_resumen(path: Path) -> list:
+    """Filas (dicts) de un resumen ya escrito, CSV (sin pandas) o parquet."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pandas as pd
+        return pd.read_parquet(path).to_dict("records")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+def periodo(anio: int, mes: int) -> int:
+    return int(anio) * 100 + int(mes)
+
+def _periodo_texto(s: str) -> int:
+    """'2025-03' -> 202503."""
+    anio, mes = str(s).split("-")
+    return periodo(int(anio), int(mes))
+
+class Historial:
+    def __init__(self, ruta: Path):
+        self.ruta = Path(ruta)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(str(self.ruta), timeout=30)
+        self.con.executescript(_ESQUEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        self.con.close()
+
+    def guardar(self, resumen, residente: str, anio: int, mes: int, entrada: str = "", motor: str = "") -> int:
+        """Sustituye las guardias de (residente, anio, mes) por las filas de `resumen` (DataFrame o dicts)."""
+        filas = resumen.to_dict("records") if hasattr(resumen, "to_dict") else list(resumen)
+        per = periodo(anio, mes)
+        datos = []
+        for i, r in enumerate(filas):
+            ini, fin = str(r["Fecha inicial + hora inicial"]), str(r["Fecha final + hora final"])
+            datos.append((residente, per, i, ini, fin, _texto(r["Rango"]), _texto(r["Municipio"]),
+                          _texto(r["Observaciones"]), _horas(ini, fin), _numero(r["Resultado"]),
+                          _numero(r["% IRPF"]), _numero(r["Total día"])))
+        with self.con:  # una transacción: o todo o nada
+            self.con.executemany("""
+                INSERT INTO guardias (residente, periodo, orden, inicio, fin, grado, municipio,
+                                      observaciones, horas, bruto, irpf, neto)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (residente, periodo, orden) DO UPDATE SET
+                    inicio = excluded.inicio, fin = excluded.fin, grado = excluded.grado,
+                    municipio = excluded.municipio, observaciones = excluded.observaciones,
+                    horas = excluded.horas, bruto = excluded.bruto, irpf = excluded.irpf,
+                    neto = excluded.neto
+            """, datos)
+            self.con.execute("DELETE FROM guardias WHERE residente = ? AND periodo = ? AND orden >= ?",
+                             (residente, per, len(datos)))
+            self.con.execute("""
+                INSERT INTO ejecuciones (residente, periodo, fecha, entrada, motor, guardias, horas, bruto, neto)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (residente, periodo) DO UPDATE SET
+                    fecha = excluded.fecha, entrada = excluded.entrada, motor = excluded.motor,
+                    guardias = excluded.guardias, horas = excluded.horas, bruto = excluded.bruto,
+                    neto = excluded.neto
+            """, (residente, per, datetime.now().isoformat(timespec="seconds"), str(entrada), motor,
+                  len(datos), _suma(d[8] for d in datos), _suma(d[9] for d in datos),
+                  _suma(d[11] for d in datos)))
+        return len(datos)
+
+    def agregados(self, por=("residente",), anio: int = None, desde: str = None, hasta: str = None,
+                  residente: str = None, grado: str = None, municipio: str = None) -> list:
+        """Guardias, horas, bruto y neto agrupados por `por` (claves de AGRUPACIONES)."""
+        por = list(por or [])
+        for k in por:
+            if k not in AGRUPACIONES:
+                raise ValueError(f"agrupación desconocida: {k} (use {', '.join(AGRUPACIONES)})")
+        donde, params = [], []
+        if anio is not None:
+            donde.append("periodo BETWEEN ? AND ?"); params += [periodo(anio, 1), periodo(anio, 12)]
+        if desde:
+            donde.append("periodo >= ?"); params.append(_periodo_texto(desde))
+        if hasta:
+            donde.append("periodo <= ?"); params.append(_periodo_texto(hasta))
+        for col, valor in (("residente", residente), ("grado", grado), ("municipio", municipio)):
+            if valor is not None:
+                donde.append(f"{col} = ?"); params.append(valor)
+        claves = [f"{AGRUPACIONES[k]} AS {k}" for k in por]
+        sql = ("SELECT " + ", ".join(claves + ["COUNT(*)", "SUM(horas)", "SUM(bruto)", "SUM(neto)"]) +
+               " FROM guardias" + (" WHERE " + " AND ".join(donde) if donde else "") +
+               (" GROUP BY " + ", ".join(por) + " ORDER BY " + ", ".join(por) if por else ""))
+        out = []
+        for fila in self.con.execute(sql, params):
+            d = dict(zip(por, fila[:len(por)]))
+            if "mes" in d:
+                d["mes"] = f"{d['mes'] // 100:04d}-{d['mes'] % 100:02d}"
+            n, horas, bruto, neto = fila[len(por):]
+            d.update(guardias=n, horas=round(horas or 0.0, 4), bruto=round(bruto or 0.0, 4),
+                     neto=round(neto or 0.0, 4))
+            out.append(d)
+        return out
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(prog="main.py historial", description="Consultas sobre el historial SQLite")
+    p.add_argument("--db", type=Path, default=Path("output") / NOMBRE_DB)
+    p.add_argument("--por", nargs="*", default=["residente"], choices=list(AGRUPACIONES),
+                   help="Agrupar por estas claves (sin valores: total global)")
+    p.add_argument("--anio", type=int)
+    p.add_argument("--desde", help="Primer mes incluido (AAAA-MM)")
+    p.add_argument("--hasta", help="Último mes incluido (AAAA-MM)")
+    p.add_argument("--residente")
+    p.add_argument("--grado")
+    p.add_argument("--municipio")
+    p.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.db.exists():
+        raise SystemExit(f"Error: no existe el historial {args.db}")
+    t0 = time.perf_counter()
+    with Historial(args.db) as h:
+        filas = h.agregados(args.por, anio=args.anio, desde=args.desde, hasta=args.hasta,
+                            residente=args.residente, grado=args.grado, municipio=args.municipio)
+    ms = (time.perf_counter() - t0) * 1000
+    if args.json:
+        print(json.dumps(filas, ensure_ascii=False, indent=2))
+        return
+    columnas = list(args.por) + ["guardias", "horas", "bruto", "neto"]
+    anchos = [max([len(c)] + [len(str(f[c])) for f in filas]) for c in columnas]
+    print("  ".join(c.ljust(a) for c, a in zip(columnas, anchos)))
+    for f in filas:
+        print("  ".join(str(f[c]).ljust(a) for c, a in zip(columnas, anchos)))
+    print(f"({len(filas)} filas, {ms:.1f} ms)")
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Instantánea precompilada (JSON) de reglas y tarifas.
+- Permite calcular sin importar pandas, openpyxl ni PyYAML (vía rápida del CLI).
+- Se regenera sola cuando cambia reglas.yml o tarifas.xlsx (mtime y tamaño).
+- Festivos: no guarda copia propia; su calendario usa data/festivos.bin
+  (app/festivos_compilados.py), igual que la vía completa.
+"""
+import json
+import os
+from pathlib import Path
+
+from app.tarifas import TIPOS_DIA, CargadorTarifas
+from app.calendario import CalendarioFestivos
+from app.festivos_compilados import NOMBRE_COMPILADO, fuentes_festivos, festivos_al_dia
+
+RUTA_INSTANTANEA = Path(".cache/instantanea.json")
+VERSION = 2
+
+def _fuentes(reglas_path: Path, tarifas_path: Path) -> list:
+    return [Path(reglas_path), Path(tarifas_path)]
+
+def _huella(rutas) -> dict:
+    out = {}
+    for p in rutas:
+        try:
+            st = p.stat()
+            out[str(p)] = [st.st_mtime_ns, st.st_size]
+        except OSError:
+            out[str(p)] = None
+    return out
+
+def _leer_tarifas_xlsx(path: Path) -> list:
+    """Mismas filas que CargadorTarifas, leyendo la hoja con openpyxl directamente."""
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        filas = wb["tarifas"].iter_rows(values_only=True)
+        cab = [str(c).strip() if c is not None else "" for c in next(filas, ())]
+        datos = [dict(zip(cab, f)) for f in filas if any(v is not None for v in f)]
+    finally:
+        wb.close()
+    esperadas = {"grado", "eur_hora_normal", "eur_hora_festivo", "eur_hora_especial"}
+    faltan = esperadas - set(cab)
+    if faltan:
+        raise ValueError(f"Faltan columnas en tarifas: {faltan}")
+    return [[d["grado"], d.get("tipo_guardia") or ""] + [d[f"eur_hora_{t}"] for t in TIPOS_DIA]
+            for d in datos]
+
+def construir_instantanea(reglas_path: Path, tarifas_path: Path) -> dict:
+    from app.reglas import cargar_reglas
+    return {
+        "version": VERSION,
+        "huella": _huella(_fuentes(reglas_path, tarifas_path)),
+        "reglas": cargar_reglas(reglas_path) or {},
+        "tarifas": _leer_tarifas_xlsx(tarifas_path),
+    }
+
+class Instantanea:
+    def __init__(self, datos: dict, base: Path = Path("data")):
+        self.datos = datos
+        self.base = Path(base)
+
+    @property
+    def reglas(self) -> dict:
+        return self.datos["reglas"]
+
+    def tarifas(self) -> CargadorTarifas:
+        return CargadorTarifas.desde_filas(self.datos["tarifas"])
+
+    def calendario(self, municipio_default: str = "Sevilla") -> CalendarioFestivos:
+        return CalendarioFestivos(reglas=self.reglas, municipio_default=municipio_default, base=self.base)
+
+def huella_vigente(reglas_path: Path = Path("config/reglas.yml"),
+                   tarifas_path: Path = Path("config/tarifas.xlsx"),
+                   base: Path = Path("data"), ruta: Path = RUTA_INSTANTANEA) -> dict:
+    """
+    mtime/tamaño de la instantánea, de sus orígenes y de los festivos (solo stat): cambia si
+    hay que recargar la instantánea o rehacer su calendario.
+    """
+    base = Path(base)
+    return _huella(_fuentes(reglas_path, tarifas_path) + fuentes_festivos(base) +
+                   [base / NOMBRE_COMPILADO, Path(ruta)])
+
+def cargar_instantanea(reglas_path: Path = Path("config/reglas.yml"),
+                       tarifas_path: Path = Path("config/tarifas.xlsx"),
+                       base: Path = Path("data"), ruta: Path = RUTA_INSTANTANEA) -> Instantanea:
+    """
+    Instantánea vigente; si falta o sus orígenes cambiaron, se reconstruye y se guarda.
+    Deja también al día data/festivos.bin, para que su huella no cambie a mitad de cálculo.
+    """
+    festivos_al_dia(base)
+    huella = _huella(_fuentes(reglas_path, tarifas_path))
+    try:
+        datos = json.loads(Path(ruta).read_text(encoding="utf-8"))
+        if datos.get("version") == VERSION and datos.get("huella") == huella:
+            return Instantanea(datos, base)
+    except (OSError, ValueError):
+        pass
+    datos = construir_instantanea(reglas_path, tarifas_path)
+    try:
+        Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(ruta).with_suffix(".tmp")
+        tmp.write_text(json.dumps(datos, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, ruta)
+    except OSError:
+        pass  # sin permisos de escritura: se usa sin guardar
+    return Instantanea(datos, base)
@@ -1,12 +1,299 @@
 # -*- coding: utf-8 -*-
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pandas as pd
 
+# Formatos de salida (extensión de fichero). 'parquet' requiere pyarrow.
+FORMATOS = {"csv": ".csv", "parquet": ".parquet"}
+
+# Tipado columnar de detalle/resumen
+_COLS_FECHA = ("inicio_bloque", "fin_bloque", "inicio_segmento", "fin_segmento",
+               "Fecha inicial + hora inicial", "Fecha final + hora final")
+_COLS_CATEGORIA = ("municipio", "grado", "tipo_dia", "Rango", "Municipio")
+_COLS_IMPORTE = ("horas", "eur_hora", "importe", "Resultado", "% IRPF", "Total día")
+
 def leer_guardias(path: Path) -> pd.DataFrame:
     return pd.read_csv(path, dtype=str).fillna("")
 
-def escribir_detalle(df, path: Path):
-    df.to_csv(path, index=False, encoding="utf-8")
+def leer_guardias_por_bloques(path: Path, filas: int = 5000):
+    """Igual que leer_guardias, pero en DataFrames de como mucho `filas` guardias."""
+    for bloque in pd.read_csv(path, dtype=str, chunksize=filas):
+        yield bloque.fillna("")
+
+def leer_detalle(path: Path, expandir: bool = True, minutos: int = 60) -> pd.DataFrame:
+    """
+    Lee un detalle horario o por segmentos. Con `expandir`, un detalle por segmentos
+    se devuelve ya desplegado en bloques de `minutos` (horarios por defecto).
+    """
+    df = pd.read_csv(path, keep_default_na=False, na_values=[""])
+    for c in ("municipio", "grado", "tipo_dia", "observaciones"):
+        if c in df.columns:
+            df[c] = df[c].fillna("").astype(str)
+    if expandir and "inicio_segmento" in df.columns:
+        from app.calculo import expandir_segmentos
+        df = expandir_segmentos(df, minutos)
+    return df
+
+def a_columnar(df: pd.DataFrame) -> pd.DataFrame:
+    """Fechas como datetime64, municipio/grado/tipo de día como category e importes en float64."""
+    out = df.copy()
+    for c in out.columns:
+        if c in _COLS_FECHA:
+            out[c] = pd.to_datetime(out[c], format="ISO8601")
+        elif c in _COLS_CATEGORIA:
+            if isinstance(out[c].dtype, pd.CategoricalDtype):
+                # Detalle compacto: mismas categorías que al tipar el texto (las usadas, ordenadas)
+                col = out[c].cat.remove_unused_categories()
+                out[c] = col.cat.reorder_categories(sorted(col.cat.categories))
+            else:
+                out[c] = out[c].astype("category")
+        elif c in _COLS_IMPORTE:
+            out[c] = out[c].astype("float64")
+    return out
+
+def _parquet():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("El formato parquet requiere pyarrow (pip install pyarrow)")
+    return pa, pq
+
+def _escribir(df, path: Path, anexar: bool, formato: str):
+    if formato == "parquet":
+        if anexar:
+            raise ValueError("parquet no admite anexar; use escribir_por_bloques")
+        _parquet()
+        a_columnar(df).to_parquet(path, index=False)
+        return
+    df.to_csv(path, index=False, encoding="utf-8", mode=("a" if anexar else "w"), header=not anexar)
+
+def escribir_detalle(df, path: Path, anexar: bool = False, formato: str = "csv"):
+    _escribir(df, path, anexar, formato)
+
+def escribir_resumen(df, path: Path, anexar: bool = False, formato: str = "csv"):
+    _escribir(df, path, anexar, formato)
+
+class _EscritorParquet:
+    """Un fichero parquet escrito por grupos de filas, con el esquema del primer bloque."""
+    def __init__(self, path: Path):
+        self.path = path
+        self._w = None
+
+    def escribir(self, df):
+        pa, pq = _parquet()
+        tabla = pa.Table.from_pandas(a_columnar(df), preserve_index=False)
+        if self._w is None:
+            self._w = pq.ParquetWriter(self.path, tabla.schema)
+        else:
+            tabla = tabla.cast(self._w.schema)
+        self._w.write_table(tabla)
+
+    def cerrar(self):
+        if self._w is not None:
+            self._w.close()
+        return self._w is not None
+
+def escribir_por_bloques(resultados, det_path: Path, res_path: Path, formato: str = "csv",
+                         xlsx_path: Path = None) -> int:
+    """
+    Escribe incrementalmente los pares (detalle, resumen) de `resultados` (p.ej. de
+    calculo.calcular_por_bloques). El fichero final es idéntico al de escribir el
+    resultado completo de una vez. Con `xlsx_path`, cada bloque va también al libro
+    Excel (ver `EscritorXlsx`). Devuelve el nº de guardias escritas.
+    """
+    det_iniciado = False
+    res_iniciado = False
+    n = 0
+    if xlsx_path is not None:
+        resultados = _tambien_xlsx(resultados, EscritorXlsx(xlsx_path))
+    if formato == "parquet":
+        det_w, res_w = _EscritorParquet(det_path), _EscritorParquet(res_path)
+        try:
+            for detalle, resumen in resultados:
+                if len(detalle.columns) and len(detalle):
+                    det_w.escribir(detalle)
+                res_w.escribir(resumen)
+                n += len(resumen)
+        finally:
+            det_iniciado = det_w.cerrar()
+            res_w.cerrar()
+    else:
+        for detalle, resumen in resultados:
+            if len(detalle.columns) and len(detalle):
+                escribir_detalle(detalle, det_path, anexar=det_iniciado)
+                det_iniciado = True
+            escribir_resumen(resumen, res_path, anexar=res_iniciado)
+            res_iniciado = True
+            n += len(resumen)
+    if not det_iniciado:
+        escribir_detalle(pd.DataFrame([]), det_path, formato=formato)
+    return n
+
+def _tambien_xlsx(resultados, libro):
+    for detalle, resumen in resultados:
+        libro.escribir(detalle, resumen)
+        yield detalle, resumen
+    libro.cerrar()
+
+# ---- Excel ----
+MAX_FILAS_XLSX = 1_048_575  # filas de datos por hoja (más la cabecera); el resto sigue en <hoja>_2, ...
+COLUMNAS_TOTALES = ["grado", "guardias", "total_horas", "total_importe", "total_neto"]
+
+def _celda(v):
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return None
+    return v
+
+class EscritorXlsx:
+    """
+    Libro de nómina en modo write-only de openpyxl: las filas se vuelcan a disco según se
+    añaden, así que la memoria no crece con el tamaño del detalle.
+    Hojas: detalle, resumen y totales_grado (guardias, horas, bruto y neto por grado),
+    que se acumula bloque a bloque y se escribe al cerrar.
+    """
+    def __init__(self, path: Path):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("La exportación a Excel requiere openpyxl (pip install openpyxl)")
+        self.path = Path(path)
+        self._wb = Workbook(write_only=True)
+        # Hojas creadas de entrada para fijar su orden; la cabecera se escribe con el primer bloque
+        self._hojas = {n: {"ws": self._wb.create_sheet(n), "filas": None, "parte": 1}
+                       for n in ("detalle", "resumen", "totales_grado")}
+        self._totales = {}  # grado -> [guardias, horas, bruto, neto]
+
+    def _anexar(self, nombre: str, df: pd.DataFrame):
+        if not len(df.columns):
+            return
+        h = self._hojas[nombre]
+        columnas = list(df.columns)
+        if h["filas"] is None:
+            h["ws"].append(columnas)
+            h["filas"] = 0
+        for fila in df.itertuples(index=False, name=None):
+            if h["filas"] == MAX_FILAS_XLSX:
+                h["parte"] += 1
+                h["ws"] = self._wb.create_sheet(f"{nombre}_{h['parte']}")
+                h["ws"].append(columnas)
+                h["filas"] = 0
+            h["ws"].append([_celda(v) for v in fila])
+            h["filas"] += 1
+
+    def escribir(self, detalle: pd.DataFrame, resumen: pd.DataFrame):
+        self._anexar("detalle", detalle)
+        self._anexar("resumen", resumen)
+        if "horas" in detalle.columns and len(detalle):
+            for grado, horas in detalle.groupby("grado", sort=False)["horas"].sum().items():
+                self._totales.setdefault(str(grado), [0, 0.0, 0.0, 0.0])[1] += float(horas)
+        if len(resumen):
+            g = resumen.groupby("Rango", sort=False).agg(n=("Resultado", "size"), bruto=("Resultado", "sum"),
+                                                         neto=("Total día", "sum"))
+            for grado, fila in g.iterrows():
+                t = self._totales.setdefault(str(grado), [0, 0.0, 0.0, 0.0])
+                t[0] += int(fila["n"]); t[2] += float(fila["bruto"]); t[3] += float(fila["neto"])
+
+    def cerrar(self):
+        ws = self._hojas["totales_grado"]["ws"]
+        ws.append(COLUMNAS_TOTALES)
+        for grado in sorted(self._totales):
+            n, horas, bruto, neto = self._totales[grado]
+            ws.append([grado, n, round(horas, 4), round(bruto, 4), round(neto, 4)])
+        self._wb.save(self.path)
+
+def escribir_xlsx(detalle: pd.DataFrame, resumen: pd.DataFrame, path: Path):
+    libro = EscritorXlsx(path)
+    libro.escribir(detalle, resumen)
+    libro.cerrar()
+
+UMBRAL_PARALELO = 20_000  # filas de detalle a partir de las que compensa escribir a la vez
+
+def escribir_salidas(detalle: pd.DataFrame, resumen: pd.DataFrame, det_path: Path, res_path: Path,
+                     formato: str = "csv", xlsx_path: Path = None, paralelo: bool = True) -> list:
+    """
+    Escribe detalle, resumen y, con `xlsx_path`, el libro Excel. Son ficheros independientes:
+    con `paralelo` y un detalle grande, los demás se escriben en hilos mientras este escribe el
+    primero, solapando la E/S. Todo queda en el proceso: el detalle no se copia ni se serializa
+    (la memoria no crece) y se puede llamar desde el hilo de trabajo de la GUI.
+    Devuelve las rutas escritas.
+    """
+    trabajos = [(escribir_detalle, detalle, det_path, False, formato),
+                (escribir_resumen, resumen, res_path, False, formato)]
+    if xlsx_path is not None:
+        trabajos.append((escribir_xlsx, detalle, resumen, xlsx_path))
+    if paralelo and len(detalle) >= UMBRAL_PARALELO:
+        with ThreadPoolExecutor(max_workers=len(trabajos) - 1) as pool:
+            futuros = [pool.submit(*t) for t in trabajos[1:]]
+            trabajos[0][0](*trabajos[0][1:])
+            for f in futuros:
+                f.result()
+    else:
+        for fn, *args in trabajos:
+            fn(*args)
+    return [det_path, res_path] + ([xlsx_path] if xlsx_path is not None else [])
+
+def _columnas_fichero(path: Path) -> list:
+    if path.suffix == ".parquet":
+        _, pq = _parquet()
+        return pq.read_schema(path).names
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+def leer_resultados(origen, tipo: str = "detalle", meses=None, columnas=None, minutos: int = 60) -> pd.DataFrame:
+    """
+    Carga uno o varios meses de `detalle_*`/`resumen_*` (parquet o CSV) ya tipados.
+    - origen: carpeta de salida o lista de ficheros.
+    - meses: 'YYYY-MM' o (anio, mes), uno o varios; None = todos.
+    - columnas: proyección; solo se leen esas columnas.
+    Añade la columna 'mes' (YYYY-MM, del nombre del fichero). Si un mes existe en
+    ambos formatos se usa el parquet. Los detalles por segmentos se despliegan en bloques
+    de `minutos` (como `leer_detalle`), para que todas las filas tengan la misma granularidad.
+    """
+    patron = re.compile(rf"^{tipo}_(\d{{4}}-\d{{2}})(_.*)?$")
+    if isinstance(origen, (str, Path)) and Path(origen).is_dir():
+        candidatos = sorted(p for p in Path(origen).iterdir() if p.suffix in FORMATOS.values())
+    else:
+        candidatos = [Path(p) for p in ([origen] if isinstance(origen, (str, Path)) else origen)]
+    if meses is not None:
+        if isinstance(meses, (str, tuple)):
+            meses = [meses]
+        meses = {m if isinstance(m, str) else f"{int(m[0]):04d}-{int(m[1]):02d}" for m in meses}
+
+    elegidos = {}
+    for p in candidatos:
+        m = patron.match(p.stem)
+        if not m or (meses is not None and m.group(1) not in meses):
+            continue
+        if p.stem not in elegidos or p.suffix == ".parquet":
+            elegidos[p.stem] = (p, m.group(1))
 
-def escribir_resumen(df, path: Path):
-    df.to_csv(path, index=False, encoding="utf-8")
+    partes = []
+    for p, mes in elegidos.values():
+        # Un detalle por segmentos se lee entero: hacen falta todas sus columnas para desplegarlo
+        segmentos = tipo == "detalle" and "inicio_segmento" in _columnas_fichero(p)
+        leer = None if segmentos else columnas
+        if p.suffix == ".parquet":
+            _parquet()
+            df = pd.read_parquet(p, columns=leer)
+        else:
+            df = pd.read_csv(p, usecols=leer, keep_default_na=False, na_values=[""])
+            for c in ("observaciones", "Observaciones"):
+                if c in df.columns:
+                    df[c] = df[c].fillna("").astype(str)
+        if segmentos:
+            from app.calculo import expandir_segmentos
+            df = expandir_segmentos(df, minutos)
+            if columnas is not None:
+                df = df[list(columnas)]
+        if p.suffix != ".parquet" or segmentos:
+            df = a_columnar(df)
+        partes.append(df.assign(mes=mes))
+    if not partes:
+        return pd.DataFrame(columns=(list(columnas) if columnas else []) + ["mes"])
+    out = pd.concat(partes, ignore_index=True)
+    for c in _COLS_CATEGORIA + ("mes",):
+        if c in out.columns:
+            out[c] = out[c].astype("category")
+    return out
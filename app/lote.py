@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Modo lote: calcula muchos CSV de guardias (p.ej. uno por residente y mes) en paralelo.
+- Reglas, tarifas y calendario se cargan una vez en el proceso principal y se
+  envían a cada proceso hijo al arrancarlo.
+- Por cada entrada se escriben `detalle_YYYY-MM_<nombre>` y `resumen_YYYY-MM_<nombre>` (.csv o .parquet).
+- Con `historial`, el proceso principal vuelca cada resumen en SQLite (residente = <nombre>).
+- Con `agregados`, cada proceso reescribe además `agregados/agregado_YYYY-MM_<nombre>.csv`.
+- Con `excel`, cada proceso escribe además `nomina_YYYY-MM_<nombre>.xlsx`.
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from app.io_csv import FORMATOS, leer_guardias, escribir_salidas
+from app.reglas import cargar_reglas
+from app.tarifas import CargadorTarifas
+from app.calendario import CalendarioFestivos
+from app.calculo import MOTORES, detalle_en_formato
+from app.agregados import acumular, escribir_agregado
+
+# Estado compartido de cada proceso hijo (lo fija _inicializar)
+_CTX = {}
+
+def expandir_entradas(patrones) -> list:
+    """Directorios (todos sus *.csv), globs o ficheros sueltos, sin duplicados."""
+    rutas = []
+    for pat in patrones:
+        p = Path(pat)
+        if p.is_dir():
+            rutas.extend(sorted(p.glob("*.csv")))
+        elif any(ch in str(pat) for ch in "*?["):
+            rutas.extend(Path(x) for x in sorted(glob.glob(str(pat))))
+        else:
+            rutas.append(p)
+    return list(dict.fromkeys(rutas))
+
+def nombre_salida(path: Path) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", path.stem) or "sin_nombre"
+
+class SinGuardias(ValueError):
+    """Entrada vacía sin año/mes explícitos: cada interfaz explica cómo indicarlos."""
+
+def mes_de_guardias(guardias, anio=None, mes=None):
+    """Año/mes explícitos o, si faltan, los de la primera guardia del fichero."""
+    if anio is not None and mes is not None:
+        return anio, mes
+    if guardias.empty:
+        raise SinGuardias("sin guardias: no se puede deducir el año y el mes")
+    ini = datetime.fromisoformat(str(guardias["inicio_datetime"].iloc[0]).strip())
+    return (anio if anio is not None else ini.year), (mes if mes is not None else ini.month)
+
+def _inicializar(reglas, tarifas, calendario):
+    _CTX.update(reglas=reglas, tarifas=tarifas, calendario=calendario)
+
+def _procesar(path: Path, anio, mes, motor: str, salida_dir: Path, irpf_percent: float,
+              segmentos: bool = False, formato: str = "csv", agregados: bool = False, excel: bool = False):
+    guardias = leer_guardias(path)
+    anio, mes = mes_de_guardias(guardias, anio, mes)
+    detalle, resumen = MOTORES[motor](
+        guardias, _CTX["calendario"], _CTX["tarifas"], _CTX["reglas"],
+        anio=anio, mes=mes, irpf_percent=irpf_percent
+    )
+    horas = float(detalle["horas"].sum()) if "horas" in detalle.columns else 0.0
+    nombre = nombre_salida(path)
+    if agregados:
+        escribir_agregado(acumular({}, detalle), salida_dir, nombre, anio, mes, irpf_percent)
+    detalle = detalle_en_formato(detalle, "segmentos" if segmentos else "horario", _CTX["reglas"])
+    ext = FORMATOS[formato]
+    # Un fichero por proceso del lote: los procesos ya escriben a la vez, aquí sin hilos
+    escribir_salidas(detalle, resumen, salida_dir / f"detalle_{anio:04d}-{mes:02d}_{nombre}{ext}",
+                     salida_dir / f"resumen_{anio:04d}-{mes:02d}_{nombre}{ext}", formato=formato,
+                     xlsx_path=salida_dir / f"nomina_{anio:04d}-{mes:02d}_{nombre}.xlsx" if excel else None,
+                     paralelo=False)
+    return len(guardias), horas, anio, mes
+
+def ejecutar_lote(entradas, salida_dir: Path, anio=None, mes=None, motor="vectorizado",
+                  procesos=None, municipio_default="Sevilla", irpf_percent=0.0, segmentos=False,
+                  formato="csv", historial=None, agregados=False, excel=False,
+                  reglas_path=Path("config/reglas.yml"), tarifas_path=Path("config/tarifas.xlsx")):
+    """
+    Devuelve {'ficheros', 'guardias', 'horas', 'segundos', 'errores': [(path, msg)]}.
+    Un fichero con error no detiene el resto del lote.
+    """
+    t0 = time.perf_counter()
+    reglas = cargar_reglas(reglas_path)
+    tarifas = CargadorTarifas(tarifas_path)
+    cal = CalendarioFestivos(reglas=reglas, municipio_default=municipio_default)
+    cal.precargar(cal.anios_disponibles())
+    salida_dir.mkdir(parents=True, exist_ok=True)
+
+    stats = {"ficheros": 0, "guardias": 0, "horas": 0.0, "errores": []}
+    hist = None
+    if historial is not None:
+        from app.historial import Historial, leer_resumen
+        hist = Historial(historial)
+
+    def _acumular(path, resultado=None, error=None):
+        if error is not None:
+            if isinstance(error, SinGuardias):
+                error = f"{error} (indique --anio y --mes)"
+            stats["errores"].append((path, str(error)))
+            return
+        n, horas, anio_f, mes_f = resultado
+        stats["ficheros"] += 1
+        stats["guardias"] += n
+        stats["horas"] += horas
+        if hist is not None:
+            nombre = nombre_salida(path)
+            res_p = salida_dir / f"resumen_{anio_f:04d}-{mes_f:02d}_{nombre}{FORMATOS[formato]}"
+            hist.guardar(leer_resumen(res_p), nombre, anio_f, mes_f, entrada=path, motor=motor)
+
+    procesos = procesos or os.cpu_count() or 1
+    if procesos <= 1 or len(entradas) <= 1:
+        _inicializar(reglas, tarifas, cal)
+        for path in entradas:
+            try:
+                _acumular(path, _procesar(path, anio, mes, motor, salida_dir, irpf_percent, segmentos, formato,
+                                          agregados, excel))
+            except Exception as e:
+                _acumular(path, error=e)
+    else:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(entradas)), initializer=_inicializar,
+                                 initargs=(reglas, tarifas, cal)) as pool:
+            futuros = {pool.submit(_procesar, p, anio, mes, motor, salida_dir, irpf_percent, segmentos, formato,
+                                   agregados, excel): p
+                       for p in entradas}
+            for fut, path in futuros.items():
+                try:
+                    _acumular(path, fut.result())
+                except Exception as e:
+                    _acumular(path, error=e)
+
+    if hist is not None:
+        hist.cerrar()
+    stats["segundos"] = time.perf_counter() - t0
+    return stats
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(prog="main.py lote", description="Cálculo en lote de varios CSV de guardias")
+    p.add_argument("entradas", nargs="+", help="Directorios, globs o ficheros CSV de guardias")
+    p.add_argument("--anio", type=int, help="Año (por defecto, el de la primera guardia de cada fichero)")
+    p.add_argument("--mes", type=int, help="Mes (por defecto, el de la primera guardia de cada fichero)")
+    p.add_argument("--municipio_default", type=str, default="Sevilla")
+    p.add_argument("--salida_dir", type=Path, default=Path("output"))
+    p.add_argument("--motor", choices=list(MOTORES), default="vectorizado")
+    p.add_argument("--irpf", type=float, default=0.0, help="%% IRPF aplicado al resumen")
+    p.add_argument("--detalle", choices=["horario", "segmentos"], default="horario")
+    p.add_argument("--formato", choices=list(FORMATOS), default="csv")
+    p.add_argument("--historial", nargs="?", const="", default=None, metavar="RUTA",
+                   help="Guardar cada resumen en SQLite (por defecto <salida_dir>/historial.sqlite)")
+    p.add_argument("--agregados", action="store_true",
+                   help="Reescribir los totales mensuales de cada residente en <salida_dir>/agregados/")
+    p.add_argument("--excel", action="store_true", help="Escribir además nomina_YYYY-MM_<nombre>.xlsx por fichero")
+    p.add_argument("--procesos", type=int, default=None, help="Procesos en paralelo (por defecto, nº de CPUs)")
+    return p.parse_args(argv)
+
+def _ruta_historial(args):
+    if args.historial is None:
+        return None
+    from app.historial import NOMBRE_DB
+    return Path(args.historial) if args.historial else args.salida_dir / NOMBRE_DB
+
+def main(argv=None):
+    args = parse_args(argv)
+    entradas = expandir_entradas(args.entradas)
+    if not entradas:
+        raise SystemExit("Error: no se encontraron CSV de entrada")
+    stats = ejecutar_lote(entradas, args.salida_dir, anio=args.anio, mes=args.mes, motor=args.motor,
+                          procesos=args.procesos, municipio_default=args.municipio_default,
+                          irpf_percent=args.irpf, segmentos=(args.detalle == "segmentos"), formato=args.formato,
+                          historial=_ruta_historial(args), agregados=args.agregados, excel=args.excel)
+    for path, msg in stats["errores"]:
+        print(f"ERROR {path}: {msg}")
+    seg = max(stats["segundos"], 1e-9)
+    print(f"OK {stats['ficheros']}/{len(entradas)} ficheros, {stats['guardias']} guardias, "
+          f"{stats['horas']:.0f} h en {seg:.2f} s "
+          f"({stats['guardias'] / seg:.1f} guardias/s, {stats['horas'] / seg:.1f} h/s)")
+    if stats["errores"]:
+        raise SystemExit(1)
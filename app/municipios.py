@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import csv
+from pathlib import Path
+
+# ---- Fallback de municipios ----
+_MUN_FALLBACK = [
+    "Aguadulce","Alanís","Albaida del Aljarafe","Alcalá de Guadaíra","Alcalá del Río",
+    "Alcolea del Río","Algámitas","La Algaba","Almadén de la Plata","Almensilla","Arahal",
+    "Aznalcázar","Aznalcóllar","Badolatosa","Benacazón","Bollullos de la Mitación","Bormujos",
+    "Brenes","Burguillos","Las Cabezas de San Juan","Camas","La Campana","Cantillana",
+    "Cañada Rosal","Carmona","Carrión de los Céspedes","Casariche","Castilblanco de los Arroyos",
+    "Castilleja de Guzmán","Castilleja de la Cuesta","Castilleja del Campo","El Castillo de las Guardas",
+    "Cazalla de la Sierra","Constantina","Coria del Río","Coripe","El Cuervo de Sevilla","Dos Hermanas",
+    "Écija","El Garrobo","Gelves","Gerena","Gilena","Gines","Guadalcanal","Guillena","Herrera",
+    "Huévar del Aljarafe","Isla Mayor","La Lantejuela","Lebrija","Lora de Estepa","Lora del Río",
+    "La Luisiana","El Madroño","Mairena del Alcor","Mairena del Aljarafe","Marchena","Marinaleda",
+    "Martín de la Jara","Los Molares","Montellano","Morón de la Frontera","Las Navas de la Concepción",
+    "Olivares","Osuna","Los Palacios y Villafranca","Palomares del Río","Paradas","Pedrera","El Pedroso",
+    "Peñaflor","Pilas","Pruna","La Puebla de Cazalla","La Puebla de los Infantes","La Puebla del Río",
+    "El Real de la Jara","La Rinconada","La Roda de Andalucía","El Ronquillo","El Rubio","Salteras",
+    "San Juan de Aznalfarache","San Nicolás del Puerto","Sanlúcar la Mayor","Santiponce","El Saucejo",
+    "Sevilla","Tocina","Tomares","Umbrete","Utrera","Valencina de la Concepción","Villamanrique de la Condesa",
+    "Villanueva de San Juan","Villanueva del Ariscal","Villanueva del Río y Minas","Villaverde del Río",
+    "El Viso del Alcor","El Coronil","El Palmar de Troya"
+]
+
+def cargar_municipios(path: Path = Path("data/municipios_sevilla.csv")) -> list[str]:
+    if not path.exists():
+        return _MUN_FALLBACK[:]
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            lector = csv.DictReader(f)
+            if "municipio" not in (lector.fieldnames or []):
+                return _MUN_FALLBACK[:]
+            vals = [str(r["municipio"] or "").strip() for r in lector if str(r["municipio"] or "").strip()]
+        vals = list(dict.fromkeys(vals))
+        return vals if vals else _MUN_FALLBACK[:]
+    except Exception:
+        return _MUN_FALLBACK[:]
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Cálculo de una guardia en Python puro (sin pandas ni NumPy).
+Lo comparten `calculo.calcular_importes` y la vía rápida de `app.rapido`.
+"""
+from datetime import datetime
+
+TIPOS_DIA = ("normal", "festivo", "especial")
+
+# Cadenas que pandas.read_csv trata como vacías por defecto (para leer igual sin pandas)
+VALORES_NA = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+])
+
+COLUMNAS_RESUMEN = [
+    "Rango","Fecha inicial + hora inicial","Fecha final + hora final",
+    "Resultado","% IRPF","Total día","Municipio","Observaciones"
+]
+
+def parse_dt(s: str) -> datetime:
+    return datetime.fromisoformat(str(s).strip())
+
+def limitar_irpf(irpf_percent) -> float:
+    irpf = float(irpf_percent or 0.0)
+    if irpf < 0: irpf = 0.0
+    if irpf > 100: irpf = 100.0
+    return irpf
+
+def tipos_forzados(row, inicio: datetime, fin: datetime, has_ini: bool, has_fin: bool) -> dict:
+    """{'AAAA-MM-DD': tipo} de 'tipo_ini'/'tipo_fin' (si caen el mismo día, prevalece tipo_fin)."""
+    overrides = {}
+    if has_ini and str(row.get("tipo_ini","")).strip():
+        overrides[inicio.date().isoformat()] = str(row["tipo_ini"]).strip()
+    if has_fin and str(row.get("tipo_fin","")).strip():
+        overrides[fin.date().isoformat()] = str(row["tipo_fin"]).strip()
+    return overrides
+
+def calcular_guardia(row, calendario, tarifas, irpf: float, has_ini: bool, has_fin: bool):
+    """
+    `row` es cualquier mapping con .get (fila de DataFrame o dict de csv.DictReader).
+    Devuelve (bloques del detalle, fila del resumen), ambos como dicts.
+    """
+    inicio = parse_dt(row["inicio_datetime"])
+    fin = parse_dt(row["fin_datetime"])
+    municipio = row.get("municipio", "") or ""
+    grado = row["grado"]
+    observ = row.get("observaciones", "") or ""
+
+    tipo_guardia = row.get("tipo_guardia", "") or ""
+    precios = tarifas.obtener(grado, tipo_guardia)  # {'normal': x, 'festivo': y, 'especial': z}
+
+    overrides = tipos_forzados(row, inicio, fin, has_ini, has_fin)
+
+    detalle_rows = []
+    bruto_guardia = 0.0
+    bloques = calendario.fraccionar_por_hora(inicio, fin)
+    for t0, t1 in bloques:
+        fecha_key = t0.date().isoformat()
+        if fecha_key in overrides and overrides[fecha_key] in TIPOS_DIA:
+            tipo = overrides[fecha_key]
+        else:
+            tipo = calendario.tipo_en_fecha(t0, municipio)
+
+        horas = 1.0
+        eur_hora = precios.get(tipo, precios["normal"])
+        importe = round(eur_hora * horas, 4)
+        bruto_guardia += importe
+
+        detalle_rows.append({
+            "inicio_bloque": t0.isoformat(sep=" "),
+            "fin_bloque": t1.isoformat(sep=" "),
+            "municipio": municipio,
+            "grado": grado,
+            "tipo_dia": tipo,
+            "horas": horas,
+            "eur_hora": eur_hora,
+            "importe": importe,
+            "observaciones": observ
+        })
+
+    bruto_guardia = round(bruto_guardia, 4)
+    neto_guardia = round(bruto_guardia * (1.0 - irpf / 100.0), 4)
+
+    resumen_row = {
+        "Rango": grado,
+        "Fecha inicial + hora inicial": inicio.isoformat(sep=" "),
+        "Fecha final + hora final": fin.isoformat(sep=" "),
+        "Resultado": bruto_guardia,
+        "% IRPF": irpf,
+        "Total día": neto_guardia,
+        "Municipio": municipio,
+        "Observaciones": observ,
+    }
+    return detalle_rows, resumen_row
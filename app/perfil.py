@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentación de una ejecución real (CLI --profile, casilla "Perfilar" de la GUI).
+- Por etapa: tiempo de reloj, veces que se ejecuta y pico de memoria (tracemalloc).
+- Por función del calendario (fraccionar_por_hora, tipo_en_fecha...): llamadas y tiempo acumulado.
+- Opcional: cProfile de la etapa de cálculo volcado a un fichero .pstats.
+Con `activo=False` todo es un no-op, así que el código puede instrumentarse siempre.
+tracemalloc ralentiza el cálculo; los tiempos sirven para comparar ejecuciones con --profile
+entre sí, no con ejecuciones normales (para eso está `python -m bench`).
+"""
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+VERSION = 1
+
+# Métodos de CalendarioFestivos cuyo uso se cuenta durante el cálculo
+# (_cargar_anio: festivos de un año que no estaba cargado, del fichero compilado o de los CSV)
+FUNCIONES_CALENDARIO = ("fraccionar_por_hora", "tipo_en_fecha", "tipos_para_rango", "_cargar_anio")
+
+class Perfil:
+    def __init__(self, activo: bool = True, pstats_path: Path = None):
+        self.activo = activo
+        self.pstats_path = Path(pstats_path) if pstats_path else None
+        self.etapas = {}     # nombre -> {"segundos", "llamadas", "pico_mb"} (en orden de aparición)
+        self.funciones = {}  # nombre -> {"llamadas", "segundos"}
+        self.datos = {}      # contexto libre del informe (motor, guardias, entrada...)
+        self._t0 = time.perf_counter()
+        self._prof = None    # cProfile.Profile acumulado de las etapas con `perfilar`
+        self._propio_tracemalloc = False
+        if activo and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._propio_tracemalloc = True
+
+    @contextmanager
+    def etapa(self, nombre: str, perfilar: bool = False):
+        """
+        Mide el bloque `with` (si se repite, se acumula). Con `perfilar` y `pstats_path`,
+        lo pasa además por cProfile; el .pstats se escribe en `guardar`.
+        """
+        if not self.activo:
+            yield
+            return
+        prof = None
+        if perfilar and self.pstats_path:
+            if self._prof is None:
+                import cProfile
+                self._prof = cProfile.Profile()
+            prof = self._prof
+        tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        if prof:
+            prof.enable()
+        try:
+            yield
+        finally:
+            if prof:
+                prof.disable()
+            segundos = time.perf_counter() - t0
+            pico = tracemalloc.get_traced_memory()[1] / 2**20
+            e = self.etapas.setdefault(nombre, {"segundos": 0.0, "llamadas": 0, "pico_mb": 0.0})
+            e["segundos"] += segundos
+            e["llamadas"] += 1
+            e["pico_mb"] = max(e["pico_mb"], pico)
+
+    @contextmanager
+    def contando(self, obj, nombres=FUNCIONES_CALENDARIO):
+        """Cuenta llamadas y tiempo de los métodos `nombres` de `obj` mientras dura el bloque."""
+        if not self.activo:
+            yield obj
+            return
+        envueltos = []
+        for nombre in nombres:
+            original = getattr(obj, nombre, None)
+            if original is None:
+                continue
+            stats = self.funciones.setdefault(nombre, {"llamadas": 0, "segundos": 0.0})
+
+            def envoltura(*args, _f=original, _s=stats, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return _f(*args, **kwargs)
+                finally:
+                    _s["llamadas"] += 1
+                    _s["segundos"] += time.perf_counter() - t0
+
+            setattr(obj, nombre, envoltura)
+            envueltos.append(nombre)
+        try:
+            yield obj
+        finally:
+            for nombre in envueltos:
+                delattr(obj, nombre)  # vuelve a verse el método de la clase
+
+    def informe(self) -> dict:
+        return {
+            "version": VERSION,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "comando": sys.argv,
+            **self.datos,
+            "total_s": round(time.perf_counter() - self._t0, 6),
+            "etapas": [{"nombre": n, "segundos": round(e["segundos"], 6), "llamadas": e["llamadas"],
+                        "pico_mb": round(e["pico_mb"], 3)} for n, e in self.etapas.items()],
+            "funciones": {n: {"llamadas": f["llamadas"], "segundos": round(f["segundos"], 6)}
+                          for n, f in self.funciones.items()},
+            "pstats": str(self.pstats_path) if self._prof is not None else None,
+        }
+
+    def guardar(self, path: Path) -> dict:
+        """Escribe el informe JSON (y el .pstats) y deja de trazar memoria si la traza la empezó este perfil."""
+        datos = self.informe()
+        if self.activo:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            if self._prof is not None:
+                self._prof.dump_stats(str(self.pstats_path))
+            Path(path).write_text(json.dumps(datos, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.cerrar()
+        return datos
+
+    def cerrar(self):
+        if self._propio_tracemalloc:
+            tracemalloc.stop()
+            self._propio_tracemalloc = False
+
+def resumen_texto(datos: dict) -> str:
+    """Tabla corta del informe para la consola."""
+    lineas = [f"{'etapa':<22}{'s':>10}{'llamadas':>10}{'pico MB':>10}"]
+    for e in datos["etapas"]:
+        lineas.append(f"{e['nombre']:<22}{e['segundos']:>10.3f}{e['llamadas']:>10}{e['pico_mb']:>10.1f}")
+    for n, f in datos["funciones"].items():
+        lineas.append(f"  {n:<20}{f['segundos']:>10.3f}{f['llamadas']:>10}")
+    return "\n".join(lineas)
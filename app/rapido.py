@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Vía rápida del CLI para CSV pequeños: solo biblioteca estándar (csv) más la
+instantánea precompilada de tarifas/festivos (app.instantanea). Genera exactamente
+los mismos ficheros que `calcular_importes` + `escribir_detalle`/`escribir_resumen`.
+"""
+import csv
+import math
+import os
+from pathlib import Path
+
+from app.nucleo import COLUMNAS_RESUMEN, VALORES_NA, calcular_guardia, limitar_irpf
+
+# Por encima de este tamaño de entrada compensa cargar pandas y el motor vectorizado
+LIMITE_BYTES = 256 * 1024
+
+def leer_guardias(path: Path):
+    """(filas como dicts, columnas) con el mismo tratamiento de vacíos que io_csv.leer_guardias."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        lector = csv.DictReader(f, restval="")
+        columnas = list(lector.fieldnames or [])
+        filas = [{k: ("" if v is None or v in VALORES_NA else v) for k, v in r.items() if k is not None}
+                 for r in lector]
+    return filas, columnas
+
+def calcular(filas, columnas, calendario, tarifas, irpf_percent: float = 0.0):
+    """Igual que calculo.calcular_importes, devolviendo listas de dicts."""
+    has_ini = "tipo_ini" in columnas
+    has_fin = "tipo_fin" in columnas
+    irpf = limitar_irpf(irpf_percent)
+    detalle, resumen = [], []
+    for row in filas:
+        bloques, fila = calcular_guardia(row, calendario, tarifas, irpf, has_ini, has_fin)
+        detalle.extend(bloques)
+        resumen.append(fila)
+    return detalle, resumen
+
+def _valor(v):
+    if isinstance(v, float):
+        return "" if math.isnan(v) else repr(v)
+    return v
+
+def escribir_csv(filas, columnas, path: Path):
+    """Mismo formato que DataFrame.to_csv(index=False) (pandas usa también el módulo csv)."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if not columnas:
+            f.write(os.linesep)
+            return
+        w = csv.writer(f, lineterminator=os.linesep)
+        w.writerow(columnas)
+        for r in filas:
+            w.writerow([_valor(r[c]) for c in columnas])
+
+def calcular_y_escribir(entrada: Path, det_path: Path, res_path: Path, municipio_default: str = "Sevilla",
+                        irpf_percent: float = 0.0, instantanea=None) -> int:
+    if instantanea is None:
+        from app.instantanea import cargar_instantanea
+        instantanea = cargar_instantanea()
+    filas, columnas = leer_guardias(entrada)
+    detalle, resumen = calcular(filas, columnas, instantanea.calendario(municipio_default),
+                                instantanea.tarifas(), irpf_percent)
+    escribir_csv(detalle, list(detalle[0]) if detalle else [], det_path)
+    escribir_csv(resumen, COLUMNAS_RESUMEN, res_path)
+    return len(resumen)
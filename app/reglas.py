@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
-import yaml
 from pathlib import Path
 
 def cargar_reglas(path: Path) -> dict:
+    import yaml
     with open(path, "r", encoding="utf-8") as f:
         return yaml.safe_load(f)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio local de cálculo: HTTP en localhost con reglas, tarifas y festivos de todos
+los años ya cargados, para herramientas que calculan cientos de veces seguidas.
+- `python main.py servicio [--puerto 8765]`
+- POST /calcular: guardias en JSON (`{"guardias": [...], "anio": 2025, "mes": 9, "irpf": 15}`)
+  o en CSV (`Content-Type: text/csv`, opciones en la URL: `?anio=2025&mes=9&irpf=15`).
+  Opciones: anio, mes, irpf, municipio_default, motor, detalle (horario|segmentos).
+  Responde JSON `{"detalle": [...], "resumen": [...]}`; con `?salida=detalle|resumen`, ese CSV
+  tal cual lo escribiría el CLI.
+- GET /estado: años precargados, recargas y peticiones atendidas.
+- Antes de cada petición se comparan mtime/tamaño de config/ y data/; si cambiaron, se
+  recarga todo. Cada petición usa el contexto vigente al empezar (se sustituye entero).
+"""
+import argparse
+import io
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from app.reglas import cargar_reglas
+from app.tarifas import CargadorTarifas
+from app.calendario import CalendarioFestivos
+from app.calculo import MOTORES, detalle_en_formato
+from app.cache import fuentes_config
+from app.lote import SinGuardias, mes_de_guardias
+
+MAX_BYTES = 64 * 2**20  # tamaño máximo del cuerpo de una petición
+
+def _firma(rutas) -> tuple:
+    out = []
+    for p in rutas:
+        try:
+            st = p.stat()
+            out.append((str(p), st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append((str(p), None, None))
+    return tuple(out)
+
+class Contexto:
+    """Reglas, tarifas y calendarios cargados de una vez; no se modifica tras crearse."""
+    def __init__(self, reglas_path: Path, tarifas_path: Path, base: Path, firma: tuple):
+        self.firma = firma
+        self.reglas = cargar_reglas(reglas_path)
+        self.tarifas = CargadorTarifas(tarifas_path)
+        self.base = Path(base)
+        self._cal_base = CalendarioFestivos(reglas=self.reglas, base=self.base)
+        self.anios = self._cal_base.anios_disponibles()
+        self._cal_base.max_anios = max(self._cal_base.max_anios, len(self.anios))
+        self._cal_base.precargar(self.anios)
+        self._calendarios = {}
+        self._lock = threading.Lock()
+
+    def calendario(self, municipio_default: str) -> CalendarioFestivos:
+        """Un calendario por municipio por defecto, todos sobre los mismos festivos ya leídos."""
+        with self._lock:
+            cal = self._calendarios.get(municipio_default)
+            if cal is None:
+                cal = CalendarioFestivos(reglas=self.reglas, municipio_default=municipio_default,
+                                         base=self.base, max_anios=self._cal_base.max_anios,
+                                         cargador=self._cal_base._festivos_anio)
+                self._calendarios[municipio_default] = cal
+            return cal
+
+class Servicio:
+    def __init__(self, reglas_path: Path = Path("config/reglas.yml"),
+                 tarifas_path: Path = Path("config/tarifas.xlsx"), base: Path = Path("data"),
+                 municipio_default: str = "Sevilla", motor: str = "vectorizado"):
+        self.fuentes = fuentes_config(reglas_path, tarifas_path, base)
+        self.rutas = (Path(reglas_path), Path(tarifas_path), Path(base))
+        self.municipio_default = municipio_default
+        self.motor = motor
+        self.peticiones = 0
+        self.recargas = 0
+        self._lock = threading.Lock()
+        self.ctx = Contexto(*self.rutas, firma=_firma(self.fuentes))
+
+    def contexto(self) -> Contexto:
+        """Contexto vigente; si cambió algún fichero de origen, se recarga (una sola vez)."""
+        ctx = self.ctx
+        if _firma(self._fuentes_actuales()) == ctx.firma:
+            return ctx
+        with self._lock:
+            fuentes = self._fuentes_actuales()
+            firma = _firma(fuentes)
+            if firma != self.ctx.firma:
+                self.ctx = Contexto(*self.rutas, firma=firma)
+                self.fuentes = fuentes
+                self.recargas += 1
+            return self.ctx
+
+    def _fuentes_actuales(self) -> list:
+        # Se vuelve a listar data/ por si aparece un año nuevo de festivos
+        return fuentes_config(*self.rutas)
+
+    def calcular(self, guardias: pd.DataFrame, opciones: dict):
+        ctx = self.contexto()
+        try:
+            anio, mes = mes_de_guardias(guardias, _entero(opciones.get("anio")), _entero(opciones.get("mes")))
+        except SinGuardias as e:
+            raise ValueError(f"{e} (indique anio y mes en la URL o en el JSON)") from e
+        motor = opciones.get("motor") or self.motor
+        if motor not in MOTORES:
+            raise ValueError(f"motor desconocido: {motor}")
+        cal = ctx.calendario(opciones.get("municipio_default") or self.municipio_default)
+        detalle, resumen = MOTORES[motor](guardias, cal, ctx.tarifas, ctx.reglas, anio=anio, mes=mes,
+                                          irpf_percent=float(opciones.get("irpf") or 0.0))
+        detalle = detalle_en_formato(detalle, opciones.get("detalle") or "horario", ctx.reglas)
+        with self._lock:
+            self.peticiones += 1
+        return detalle, resumen
+
+    def estado(self) -> dict:
+        ctx = self.ctx
+        return {"anios": ctx.anios, "municipios_default": sorted(ctx._calendarios),
+                "peticiones": self.peticiones, "recargas": self.recargas, "motor": self.motor}
+
+def _entero(v):
+    return None if v in (None, "") else int(v)
+
+def _registros(df: pd.DataFrame) -> list:
+    """Filas como dicts con tipos nativos de Python (NaN -> null)."""
+    out = []
+    for r in df.to_dict("records"):
+        out.append({k: (None if isinstance(v, float) and math.isnan(v) else
+                        v.item() if hasattr(v, "item") else v) for k, v in r.items()})
+    return out
+
+def leer_peticion(cuerpo: bytes, tipo: str, consulta: dict):
+    """(DataFrame de guardias, opciones) de una petición JSON o CSV."""
+    opciones = {k: v[-1] for k, v in consulta.items()}
+    if "csv" in tipo:
+        guardias = pd.read_csv(io.BytesIO(cuerpo), dtype=str, encoding="utf-8-sig").fillna("")
+        return guardias, opciones
+    datos = json.loads(cuerpo.decode("utf-8") or "{}")
+    if isinstance(datos, list):
+        datos = {"guardias": datos}
+    filas = datos.pop("guardias", None)
+    if not isinstance(filas, list):
+        raise ValueError("falta la lista 'guardias'")
+    opciones.update({k: v for k, v in datos.items() if v is not None})
+    guardias = pd.DataFrame(filas, dtype=str).fillna("")
+    return guardias, opciones
+
+class _Manejador(BaseHTTPRequestHandler):
+    server_version = "GuardiasServicio/1"
+
+    def log_message(self, formato, *args):  # una línea por petición, sin el ruido por defecto
+        if self.server.verboso:
+            super().log_message(formato, *args)
+
+    def _responder(self, codigo: int, cuerpo, tipo="application/json; charset=utf-8"):
+        if not isinstance(cuerpo, bytes):
+            cuerpo = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/estado":
+            self._responder(200, self.server.servicio.estado())
+        else:
+            self._responder(404, {"error": "ruta no encontrada"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/calcular":
+            self._responder(404, {"error": "ruta no encontrada"})
+            return
+        longitud = int(self.headers.get("Content-Length") or 0)
+        if longitud > MAX_BYTES:
+            self._responder(413, {"error": f"petición mayor de {MAX_BYTES} bytes"})
+            return
+        t0 = time.perf_counter()
+        try:
+            consulta = parse_qs(url.query)
+            guardias, opciones = leer_peticion(self.rfile.read(longitud),
+                                               self.headers.get("Content-Type", ""), consulta)
+            detalle, resumen = self.server.servicio.calcular(guardias, opciones)
+        except (ValueError, KeyError, TypeError) as e:
+            self._responder(400, {"error": str(e) or type(e).__name__})
+            return
+        except Exception as e:
+            self._responder(500, {"error": str(e) or type(e).__name__})
+            return
+
+        salida = opciones.get("salida")
+        if salida in ("detalle", "resumen"):
+            df = detalle if salida == "detalle" else resumen
+            self._responder(200, df.to_csv(index=False).encode("utf-8"), "text/csv; charset=utf-8")
+            return
+        self._responder(200, {"detalle": _registros(detalle), "resumen": _registros(resumen),
+                              "segundos": round(time.perf_counter() - t0, 6)})
+
+class ServidorCalculo(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion, servicio: Servicio, verboso: bool = False):
+        super().__init__(direccion, _Manejador)
+        self.servicio = servicio
+        self.verboso = verboso
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(prog="main.py servicio",
+                                description="Servicio HTTP local con tarifas y festivos precargados")
+    p.add_argument("--host", default="127.0.0.1", help="Dirección de escucha (por defecto solo esta máquina)")
+    p.add_argument("--puerto", type=int, default=8765)
+    p.add_argument("--municipio_default", type=str, default="Sevilla")
+    p.add_argument("--motor", choices=list(MOTORES), default="vectorizado")
+    p.add_argument("--verboso", action="store_true", help="Registrar cada petición en la consola")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    t0 = time.perf_counter()
+    servicio = Servicio(municipio_default=args.municipio_default, motor=args.motor)
+    servidor = ServidorCalculo((args.host, args.puerto), servicio, verboso=args.verboso)
+    print(f"Escuchando en http://{args.host}:{servidor.server_address[1]} "
+          f"(años {servicio.ctx.anios}, cargado en {time.perf_counter() - t0:.2f} s; Ctrl+C para parar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
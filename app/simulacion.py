@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Simulador de tarifas: qué habría cobrado cada residente con otras tablas de tarifas.
+- `python main.py simular input/ --escenarios propuesta_a.xlsx propuesta_b.xlsx`
+- Las guardias se trocean y se clasifican (calendario, 'tipo_ini'/'tipo_fin') una sola vez:
+  matriz de horas H[residente, (grado, tipo_guardia, tipo_dia)], con los mismos bloques
+  que los motores por horas.
+- Cada tabla de tarifas (la actual y los escenarios) es una columna de precios
+  P[(grado, tipo_guardia, tipo_dia), escenario]: el bruto de todos los residentes en todos
+  los escenarios es el producto H @ P, así que añadir escenarios apenas cuesta.
+- Residente: columna 'residente' del CSV si existe; si no, el nombre del fichero (como en lote).
+- El bruto es la suma horas x precio sin redondear por guardia: puede diferir del resumen
+  en el cuarto decimal.
+- Un precio vacío en la tabla (p.ej. R5) cuenta como 0 en el producto y el bruto de los
+  residentes con horas a ese precio queda vacío en ese escenario; TOTAL suma solo las
+  horas con precio, como los importes del historial.
+"""
+import argparse
+import csv
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.nucleo import TIPOS_DIA
+from app.io_csv import leer_guardias
+from app.lote import expandir_entradas, nombre_salida
+from app.reglas import cargar_reglas
+from app.tarifas import CargadorTarifas
+from app.calendario import CalendarioFestivos
+from app.calculo import horas_por_tipo_dia
+
+ACTUAL = "actual"  # nombre del escenario de la tarifa vigente
+
+def cargar_guardias(entradas) -> pd.DataFrame:
+    """Guardias de todos los CSV, con la columna 'residente' rellena."""
+    partes = []
+    for path in entradas:
+        df = leer_guardias(path)
+        nombre = nombre_salida(path)
+        if "residente" in df.columns:
+            df["residente"] = [r.strip() or nombre for r in df["residente"].tolist()]
+        else:
+            df["residente"] = nombre
+        partes.append(df)
+    if not partes:
+        return pd.DataFrame(columns=["inicio_datetime", "fin_datetime", "grado", "residente"])
+    return pd.concat(partes, ignore_index=True).fillna("")
+
+def matriz_horas(guardias: pd.DataFrame, calendario, tarifas):
+    """
+    (residentes, claves, H): H[r, k*3 + t] = horas del residente r con la tarifa
+    claves[k] = (grado, tipo_guardia) en el tipo de día TIPOS_DIA[t].
+    """
+    horas = horas_por_tipo_dia(guardias, calendario, tarifas)
+    res_cod, residentes = pd.factorize(guardias["residente"])
+    tipos = guardias["tipo_guardia"] if "tipo_guardia" in guardias.columns else [""] * len(guardias)
+    pares = pd.Series([(str(g).strip(), str(t or "").strip()) for g, t in zip(guardias["grado"], tipos)],
+                      dtype=object)
+    clave_cod, claves = pd.factorize(pares)
+    n_r, n_k = len(residentes), len(claves)
+    celda = ((res_cod * n_k + clave_cod)[:, None] * 3 + np.arange(3)).ravel()
+    H = np.bincount(celda, weights=horas.ravel(), minlength=n_r * n_k * 3).reshape(n_r, n_k * 3)
+    return list(residentes), list(claves), H
+
+def matriz_precios(claves, escenarios: dict) -> np.ndarray:
+    """P[k*3 + t, s]: precio de claves[k] en el tipo de día t con la tabla del escenario s."""
+    P = np.empty((len(claves) * 3, len(escenarios)), dtype="float64")
+    for s, (nombre, tarifas) in enumerate(escenarios.items()):
+        for k, (grado, tipo_guardia) in enumerate(claves):
+            try:
+                precios = tarifas.obtener(grado, tipo_guardia)
+            except ValueError as e:
+                raise ValueError(f"escenario '{nombre}': {e}") from None
+            P[k * 3:k * 3 + 3, s] = [precios[t] for t in TIPOS_DIA]
+    return P
+
+def simular(guardias: pd.DataFrame, calendario, escenarios: dict) -> dict:
+    """
+    `escenarios`: {nombre: CargadorTarifas}, el primero es la referencia (tarifa actual).
+    Devuelve {'residentes', 'escenarios', 'horas' (por residente), 'bruto' (residentes x escenarios,
+    solo horas con precio) y 'sin_precio' (residentes x escenarios: alguna hora a un precio vacío)}.
+    """
+    referencia = next(iter(escenarios.values()))
+    residentes, claves, H = matriz_horas(guardias, calendario, referencia)
+    P = matriz_precios(claves, escenarios)
+    vacios = np.isnan(P)
+    sin_precio = (H > 0).astype("float64") @ vacios.astype("float64") > 0
+    return {"residentes": residentes, "escenarios": list(escenarios), "horas": H.sum(axis=1),
+            "bruto": H @ np.where(vacios, 0.0, P), "sin_precio": sin_precio}
+
+def filas_informe(resultado: dict) -> list:
+    """Una fila por residente y otra de total: horas, bruto por escenario y diferencia con el primero."""
+    bruto = np.vstack([resultado["bruto"], resultado["bruto"].sum(axis=0)])
+    sin_precio = np.vstack([resultado["sin_precio"], np.zeros(bruto.shape[1], dtype=bool)])
+    horas = np.append(resultado["horas"], resultado["horas"].sum())
+    nombres = resultado["escenarios"]
+    out = []
+    for residente, h, fila, vacia in zip(resultado["residentes"] + ["TOTAL"], horas.tolist(), bruto.tolist(),
+                                         sin_precio.tolist()):
+        fila = [None if v else b for b, v in zip(fila, vacia)]
+        ref = fila[0]
+        r = {"residente": residente, "horas": round(h, 4), nombres[0]: None if ref is None else round(ref, 4)}
+        for nombre, v in zip(nombres[1:], fila[1:]):
+            r[nombre] = None if v is None else round(v, 4)
+            conocida = v is not None and ref is not None
+            r[f"{nombre}_dif"] = round(v - ref, 4) if conocida else None
+            r[f"{nombre}_dif_%"] = round((v - ref) / ref * 100, 2) if conocida and ref else None
+        out.append(r)
+    return out
+
+def _nombres_escenarios(rutas) -> list:
+    nombres = []
+    for p in rutas:
+        n = Path(p).stem
+        while n in nombres or n == ACTUAL:
+            n += "_"
+        nombres.append(n)
+    return nombres
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(prog="main.py simular",
+                                description="Bruto por residente con otras tablas de tarifas, en una pasada")
+    p.add_argument("entradas", nargs="+", help="Directorios, globs o ficheros CSV de guardias")
+    p.add_argument("--escenarios", nargs="+", type=Path, required=True, metavar="TARIFAS_XLSX",
+                   help="Tablas de tarifas candidatas (mismo formato que config/tarifas.xlsx)")
+    p.add_argument("--tarifas", type=Path, default=Path("config/tarifas.xlsx"), help="Tarifa actual (referencia)")
+    p.add_argument("--reglas", type=Path, default=Path("config/reglas.yml"))
+    p.add_argument("--municipio_default", type=str, default="Sevilla")
+    p.add_argument("--salida", type=Path, help="Guardar el informe en CSV")
+    p.add_argument("--json", action="store_true", help="Salida JSON en lugar de tabla")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    entradas = expandir_entradas(args.entradas)
+    if not entradas:
+        raise SystemExit("Error: no se encontraron CSV de entrada")
+    t0 = time.perf_counter()
+    reglas = cargar_reglas(args.reglas)
+    escenarios = {ACTUAL: CargadorTarifas(args.tarifas)}
+    for nombre, ruta in zip(_nombres_escenarios(args.escenarios), args.escenarios):
+        escenarios[nombre] = CargadorTarifas(ruta)
+    cal = CalendarioFestivos(reglas=reglas, municipio_default=args.municipio_default)
+    cal.precargar(cal.anios_disponibles())
+    guardias = cargar_guardias(entradas)
+    t1 = time.perf_counter()
+    try:
+        filas = filas_informe(simular(guardias, cal, escenarios))
+    except ValueError as e:
+        raise SystemExit(f"Error: {e}")
+    ms = (time.perf_counter() - t1) * 1000
+
+    columnas = list(filas[0])
+    if args.salida:
+        with open(args.salida, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=columnas)
+            w.writeheader()
+            w.writerows(filas)
+    if args.json:
+        print(json.dumps(filas, ensure_ascii=False, indent=2))
+        return
+    texto = [[("" if f[c] is None else f"{f[c]:.2f}" if isinstance(f[c], float) else str(f[c])) for c in columnas]
+             for f in filas]
+    anchos = [max([len(c)] + [len(t[i]) for t in texto]) for i, c in enumerate(columnas)]
+    print("  ".join(c.ljust(a) for c, a in zip(columnas, anchos)))
+    for t in texto:
+        print("  ".join(v.ljust(a) for v, a in zip(t, anchos)))
+    print(f"({len(guardias)} guardias, {len(filas) - 1} residentes, {len(escenarios) - 1} escenarios; "
+          f"carga {(t1 - t0):.2f} s, simulación {ms:.0f} ms)")
+    if args.salida:
+        print(f"Informe: {args.salida}")
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Tareas en segundo plano para la GUI: la función corre en un hilo y se comunica
+con el bucle de Tk solo a través de una cola (nada de widgets fuera del hilo principal).
+- La función recibe la tarea como primer argumento y llama a `tarea.progreso(hechas, total, texto)`;
+  si se ha pedido cancelar, `progreso` lanza `Cancelado` y la tarea termina sin resultado.
+- Mensajes en `cola`: ("progreso", hechas, total, texto), ("ok", resultado),
+  ("error", excepción) o ("cancelado", None).
+"""
+import queue
+import threading
+
+class Cancelado(Exception):
+    pass
+
+class TareaFondo:
+    def __init__(self, funcion, *args, **kwargs):
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.cola = queue.Queue()
+        self._cancelar = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        self._hilo.start()
+        return self
+
+    def _ejecutar(self):
+        try:
+            resultado = self.funcion(self, *self.args, **self.kwargs)
+        except Cancelado:
+            self.cola.put(("cancelado", None))
+        except Exception as e:
+            self.cola.put(("error", e))
+        else:
+            self.cola.put(("ok", resultado))
+
+    def progreso(self, hechas: int, total: int, texto: str = ""):
+        self.comprobar()
+        self.cola.put(("progreso", hechas, total, texto))
+
+    def comprobar(self):
+        if self._cancelar.is_set():
+            raise Cancelado()
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    @property
+    def activa(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def mensajes(self):
+        """Vacía la cola sin bloquear (para sondear desde `after`)."""
+        while True:
+            try:
+                yield self.cola.get_nowait()
+            except queue.Empty:
+                return
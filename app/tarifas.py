@@ -1,22 +1,102 @@
 # -*- coding: utf-8 -*-
 from pathlib import Path
-import pandas as pd
+from types import MappingProxyType
+
+TIPOS_DIA = ("normal", "festivo", "especial")
 
 class CargadorTarifas:
+    """
+    Tarifas por (grado, tipo_guardia), compiladas una sola vez al cargar la hoja.
+    - La columna 'tipo_guardia' es opcional; '' actúa como tarifa genérica del grado
+      (si no hay fila genérica explícita, se usa la primera fila del grado).
+    - `matriz[grado, tipo_guardia, tipo_dia]` es la tabla densa para cálculos masivos;
+      los índices se obtienen con `indices(...)`.
+    pandas y NumPy solo se importan al leer el Excel o al pedir la matriz.
+    """
     def __init__(self, path_xlsx: Path):
+        import pandas as pd
         self.df = pd.read_excel(path_xlsx, sheet_name="tarifas")
         esperadas = {"grado", "eur_hora_normal", "eur_hora_festivo", "eur_hora_especial"}
         faltan = esperadas - set(self.df.columns)
         if faltan:
             raise ValueError(f"Faltan columnas en tarifas: {faltan}")
+        if "tipo_guardia" in self.df.columns:
+            tipos = self.df["tipo_guardia"].fillna("").tolist()
+        else:
+            tipos = [""] * len(self.df)
+        self._compilar(list(zip(
+            self.df["grado"].tolist(), tipos,
+            *(self.df[f"eur_hora_{t}"].tolist() for t in TIPOS_DIA)
+        )))
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """Cargador a partir de filas (grado, tipo_guardia, normal, festivo, especial), sin Excel."""
+        obj = cls.__new__(cls)
+        obj.df = None
+        obj._compilar(filas)
+        return obj
+
+    def _compilar(self, filas):
+        self.filas = [(str(g).strip(), str(t if t is not None else "").strip(),
+                       *(float("nan") if v is None else float(v) for v in p))
+                      for g, t, *p in filas]
+        indice = {}
+        primera = {}
+        for g, t, *precios in self.filas:
+            p = MappingProxyType(dict(zip(TIPOS_DIA, precios)))
+            indice.setdefault((g, t), p)
+            primera.setdefault(g, p)
+        for g, p in primera.items():
+            indice.setdefault((g, ""), p)
+        self._indice = MappingProxyType(indice)
+
+        self.grados = tuple(primera)
+        self.tipos_guardia = ("",) + tuple(dict.fromkeys(t for _, t, *_ in self.filas if t))
+        self._pos_grado = {g: i for i, g in enumerate(self.grados)}
+        self._pos_tipo = {t: i for i, t in enumerate(self.tipos_guardia)}
+        self._matriz = None
 
-    def obtener(self, grado: str) -> dict:
-        m = self.df[self.df["grado"] == grado]
-        if m.empty:
+    @property
+    def matriz(self):
+        if self._matriz is None:
+            import numpy as np
+            matriz = np.empty((len(self.grados), len(self.tipos_guardia), len(TIPOS_DIA)), dtype="float64")
+            for gi, g in enumerate(self.grados):
+                for ti, t in enumerate(self.tipos_guardia):
+                    p = self._indice.get((g, t)) or self._indice[(g, "")]
+                    matriz[gi, ti] = [p[k] for k in TIPOS_DIA]
+            matriz.setflags(write=False)
+            self._matriz = matriz
+        return self._matriz
+
+    # Para compartir el cargador con procesos hijos: solo se envían las filas y se recompila allí
+    def __getstate__(self):
+        return {"filas": self.filas}
+
+    def __setstate__(self, estado):
+        self.df = None
+        self._compilar(estado["filas"])
+
+    def obtener(self, grado: str, tipo_guardia: str = "") -> dict:
+        g = str(grado).strip()
+        precios = self._indice.get((g, str(tipo_guardia or "").strip())) or self._indice.get((g, ""))
+        if precios is None:
             raise ValueError(f"Tarifa no definida para grado={grado}")
-        row = m.iloc[0]
-        return {
-            "normal": float(row["eur_hora_normal"]),
-            "festivo": float(row["eur_hora_festivo"]),
-            "especial": float(row["eur_hora_especial"]),
-        }
+        return precios
+
+    def indices(self, grados, tipos_guardia=None):
+        """Posiciones (grado, tipo_guardia) en `matriz` para arrays de guardias."""
+        import numpy as np
+        grados = list(grados)
+        gi = np.empty(len(grados), dtype="int64")
+        for i, grado in enumerate(grados):
+            pos = self._pos_grado.get(str(grado).strip())
+            if pos is None:
+                raise ValueError(f"Tarifa no definida para grado={grado}")
+            gi[i] = pos
+        if tipos_guardia is None:
+            return gi, np.zeros(len(grados), dtype="int64")
+        ti = np.fromiter((self._pos_tipo.get(str(t or "").strip(), 0) for t in tipos_guardia),
+                         dtype="int64", count=len(grados))
+        return gi, ti
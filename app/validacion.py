@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Validación de las guardias antes de calcular (CLI --validar, diálogo de la GUI).
+En una pasada, sin pandas ni NumPy (se ejecuta por defecto, también en la vía rápida):
+- fechas que no son ISO, rangos invertidos o vacíos (fin <= inicio),
+- guardias que no empiezan en el mes calculado,
+- grados sin tarifa y municipios fuera del listado de data/municipios_sevilla.csv,
+- duplicados y solapes por residente (columna 'residente' si existe; si no, todo el
+  fichero es de una persona): se ordena por (residente, inicio, fin) y un barrido con el
+  máximo acumulado de los fines encuentra cada guardia que empieza antes de que acabe
+  alguna anterior, sin comparar todas con todas. Desde UMBRAL_NUMPY guardias el barrido
+  se hace con arrays NumPy (se importa solo entonces); el resultado es el mismo.
+Cada incidencia es un dict {fila, tipo, gravedad, mensaje, otra_fila}; `fila` es el
+número de fila de datos (1 = primera guardia del CSV, o la fila de la tabla en la GUI).
+"""
+from datetime import datetime, timedelta, timezone
+
+from app.nucleo import parse_dt
+
+_CERO = datetime(1970, 1, 1)
+_MICRO = timedelta(microseconds=1)
+UMBRAL_NUMPY = 50_000  # guardias a partir de las que el barrido de solapes compensa importar NumPy
+
+# tipo -> gravedad ('error': el importe sería incorrecto o el cálculo fallaría)
+TIPOS_INCIDENCIA = {
+    "fecha_invalida": "error",
+    "rango_invertido": "error",
+    "duplicado": "error",
+    "solape": "error",
+    "grado_desconocido": "error",
+    "fila_descartada": "error",
+    "fuera_de_mes": "aviso",
+    "municipio_desconocido": "aviso",
+}
+
+MODOS = ("avisar", "estricto", "no")  # CLI --validar
+
+def _normalizar(texto) -> str:
+    return str(texto or "").strip().upper()
+
+def _fecha(valor):
+    """datetime sin zona (con zona: pasada a UTC), o None si no es una fecha ISO."""
+    try:
+        d = parse_dt(valor)
+    except (TypeError, ValueError):
+        return None
+    if d.tzinfo is not None:
+        d = d.astimezone(timezone.utc).replace(tzinfo=None)
+    return d
+
+def _epoch_us(d) -> int:
+    """Epoch en µs de un datetime sin zona (None -> 0)."""
+    return 0 if d is None else (d - _CERO) // _MICRO
+
+def _columna(guardias, nombre: str, n: int) -> list:
+    """Textos (sin espacios en los extremos) de una columna de un DataFrame o de una lista de dicts."""
+    if hasattr(guardias, "columns"):
+        valores = guardias[nombre].tolist() if nombre in guardias.columns else [""] * n
+    else:
+        valores = [r.get(nombre, "") for r in guardias]
+    return [str(v or "").strip() for v in valores]
+
+def incidencia(fila: int, tipo: str, mensaje: str, otra_fila: int = None) -> dict:
+    return {"fila": fila, "tipo": tipo, "gravedad": TIPOS_INCIDENCIA[tipo], "mensaje": mensaje,
+            "otra_fila": otra_fila}
+
+def validar_guardias(guardias, anio: int = None, mes: int = None, grados=None, municipios=None,
+                     municipio_default: str = "", numeros=None) -> list:
+    """
+    `guardias`: DataFrame o lista de dicts con las columnas del CSV de entrada.
+    `grados` / `municipios`: valores conocidos (None = no se comprueban).
+    `numeros`: nº de fila de cada guardia (por defecto 1..n). Devuelve las incidencias
+    ordenadas por fila.
+    """
+    if not hasattr(guardias, "columns"):
+        guardias = list(guardias)
+    n = len(guardias)
+    numeros = list(range(1, n + 1)) if numeros is None else [int(x) for x in numeros]
+    col = lambda c: _columna(guardias, c, n)
+    textos_ini, textos_fin = col("inicio_datetime"), col("fin_datetime")
+    out = []
+
+    # Fechas (el único paso por guardia costoso: datetime.fromisoformat)
+    ini_l = [_fecha(v) for v in textos_ini]
+    fin_l = [_fecha(v) for v in textos_fin]
+    valida = [a is not None and b is not None for a, b in zip(ini_l, fin_l)]
+    ini, fin = [_epoch_us(d) for d in ini_l], [_epoch_us(d) for d in fin_l]
+    for i in range(n):
+        if not valida[i]:
+            malo = textos_ini[i] if ini_l[i] is None else textos_fin[i]
+            out.append(incidencia(numeros[i], "fecha_invalida", f"fecha no válida: '{malo}'"))
+
+    invertida = [v and b <= a for v, a, b in zip(valida, ini, fin)]
+    for i in range(n):
+        if invertida[i]:
+            txt = "duración cero" if fin[i] == ini[i] else "el fin es anterior al inicio"
+            out.append(incidencia(numeros[i], "rango_invertido", f"{txt} ({textos_ini[i]} – {textos_fin[i]})"))
+
+    if anio is not None and mes is not None:
+        desde = _epoch_us(datetime(anio, mes, 1))
+        hasta = _epoch_us(datetime(anio + mes // 12, mes % 12 + 1, 1))
+        for i in range(n):
+            if valida[i] and not desde <= ini[i] < hasta:
+                out.append(incidencia(numeros[i], "fuera_de_mes",
+                                      f"empieza el {textos_ini[i][:10]}, fuera de {anio:04d}-{mes:02d}"))
+
+    if grados is not None:
+        conocidos = set(grados)
+        for i, g in enumerate(col("grado")):
+            if g not in conocidos:
+                out.append(incidencia(numeros[i], "grado_desconocido", f"grado '{g}' sin tarifa" if g else "sin grado"))
+
+    if municipios is not None:
+        conocidos = {_normalizar(m) for m in municipios}
+        for i, m in enumerate(col("municipio")):
+            nombre = m or municipio_default
+            if _normalizar(nombre) not in conocidos:
+                out.append(incidencia(numeros[i], "municipio_desconocido", f"municipio '{nombre}' no está en el listado"))
+
+    usar = [v and not inv for v, inv in zip(valida, invertida)]
+    barrido = _solapes_numpy if n >= UMBRAL_NUMPY else _solapes
+    out.extend(barrido(col("residente"), numeros, ini, fin, usar, textos_ini, textos_fin))
+    orden = list(TIPOS_INCIDENCIA)
+    out.sort(key=lambda x: (x["fila"], orden.index(x["tipo"])))
+    return out
+
+def _duplicado(i: int, j: int, numeros, textos_ini, textos_fin) -> dict:
+    return incidencia(numeros[i], "duplicado", f"repite la fila {numeros[j]} ({textos_ini[i]} – {textos_fin[i]})",
+                      numeros[j])
+
+def _solape(i: int, j: int, horas: float, numeros, textos_ini, textos_fin) -> dict:
+    return incidencia(numeros[i], "solape", f"se solapa {horas:g} h con la fila {numeros[j]} "
+                                            f"({textos_ini[j]} – {textos_fin[j]})", numeros[j])
+
+def _solapes(residentes, numeros, ini, fin, usar, textos_ini, textos_fin) -> list:
+    """
+    Duplicados y solapes por residente: orden estable por (residente, inicio, fin) y un barrido
+    con el mayor fin visto hasta el momento (y la guardia que lo marca, la última en empate).
+    """
+    pos = sorted((i for i, u in enumerate(usar) if u), key=lambda i: (residentes[i], ini[i], fin[i]))
+    out = []
+    previa = None
+    for i in pos:
+        a, b = ini[i], fin[i]
+        if previa is None or residentes[previa] != residentes[i]:
+            fin_max, duena = b, i
+        else:
+            if a == ini[previa] and b == fin[previa]:
+                out.append(_duplicado(i, previa, numeros, textos_ini, textos_fin))
+            elif a < fin_max:
+                out.append(_solape(i, duena, (min(fin_max, b) - a) / 3.6e9, numeros, textos_ini, textos_fin))
+            if b >= fin_max:
+                fin_max, duena = b, i
+        previa = i
+    return out
+
+def _solapes_numpy(residentes, numeros, ini, fin, usar, textos_ini, textos_fin) -> list:
+    """`_solapes` con arrays NumPy, para entradas grandes."""
+    import numpy as np
+    pos = np.flatnonzero(np.array(usar, dtype=bool))
+    if len(pos) < 2:
+        return []
+    _, grupo = np.unique(np.array(residentes, dtype=object)[pos], return_inverse=True)
+    grupo = grupo.reshape(-1).astype("int64")
+    a, b = np.array(ini, dtype="int64")[pos], np.array(fin, dtype="int64")[pos]
+    orden = np.lexsort((b, a, grupo))
+    g, a, b, pos = grupo[orden], a[orden], b[orden], pos[orden]
+
+    # Máximo acumulado del fin dentro de cada residente: se desplaza cada grupo por encima
+    # del anterior para que un solo np.maximum.accumulate no mezcle residentes.
+    base = int(b.min())
+    tramo = int(b.max()) - base + 1
+    clave = g * tramo + (b - base)
+    maximo = np.maximum.accumulate(clave)
+    # Posición (en el orden) de la guardia que marca ese máximo
+    duena = np.maximum.accumulate(np.where(clave == maximo, np.arange(len(clave)), -1))
+
+    mismo = g[1:] == g[:-1]
+    fin_previo = maximo[:-1] - g[1:] * tramo + base
+    dup = mismo & (a[1:] == a[:-1]) & (b[1:] == b[:-1])
+    solape = mismo & ~dup & (a[1:] < fin_previo)
+
+    out = []
+    for k in np.flatnonzero(dup).tolist():
+        out.append(_duplicado(int(pos[k + 1]), int(pos[k]), numeros, textos_ini, textos_fin))
+    for k in np.flatnonzero(solape).tolist():
+        horas = (min(int(fin_previo[k]), int(b[k + 1])) - int(a[k + 1])) / 3.6e9
+        out.append(_solape(int(pos[k + 1]), int(pos[duena[k]]), horas, numeros, textos_ini, textos_fin))
+    return out
+
+def contar(incidencias) -> dict:
+    """{'error': n, 'aviso': m}."""
+    n = {"error": 0, "aviso": 0}
+    for x in incidencias:
+        n[x["gravedad"]] += 1
+    return n
+
+def formatear(incidencias, limite: int = 20) -> str:
+    """Líneas 'fila N [gravedad] tipo: mensaje' (como mucho `limite`) y un total."""
+    lineas = [f"fila {x['fila']} [{x['gravedad']}] {x['tipo']}: {x['mensaje']}" for x in incidencias[:limite]]
+    if len(incidencias) > limite:
+        lineas.append(f"... y {len(incidencias) - limite} más")
+    n = contar(incidencias)
+    lineas.append(f"Validación: {n['error']} errores, {n['aviso']} avisos")
+    return "\n".join(lineas)
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Modo vigilancia: recalcula los CSV de `input/` según van cambiando durante el mes.
+- `python main.py vigilar [--entrada input] [--salida_dir output] [--intervalo 2]`
+- Cada pasada solo hace stat (mtime/tamaño) de los CSV de entrada, de config/ y de los
+  festivos de data/; el contenido se lee y se hashea (SHA-1) solo si cambió el stat, así
+  que tocar un fichero sin cambiarlo no recalcula nada. En reposo el coste es unas
+  decenas de stat cada `intervalo` segundos.
+- Se recalcula:
+  - una entrada nueva, modificada o a la que le falta alguna de sus salidas;
+  - todas, si cambian reglas.yml, tarifas.xlsx, municipios_sevilla.csv o las opciones de
+    cálculo;
+  - las entradas con guardias en el año AAAA, si cambia un festivos_*_AAAA.csv.
+  data/festivos.bin no se vigila: se recompila solo a partir de esos CSV.
+- Salidas como en el modo lote (`detalle_YYYY-MM_<nombre>`, `resumen_...`), escritas en
+  una carpeta temporal dentro de la de salida y movidas con os.replace: quien las lea ve
+  siempre el fichero anterior o el nuevo completo.
+- Un fichero se procesa cuando lleva `espera` segundos sin modificarse (no se lee a medio copiar).
+- El estado (stat, hash, años y salidas de cada fichero) se guarda en
+  `<salida_dir>/.vigilancia.json`: al reiniciar solo se recalcula lo que cambió entretanto.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from app.cache import fuentes_config
+from app.lote import _inicializar, _procesar, nombre_salida
+
+NOMBRE_ESTADO = ".vigilancia.json"  # dentro de la carpeta de salida
+CARPETA_TEMPORAL = ".vigilancia_tmp"
+VERSION = 1
+
+def _stat(p: Path):
+    try:
+        st = p.stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def _sha1(p: Path) -> str:
+    return hashlib.sha1(p.read_bytes()).hexdigest()
+
+def _anio_festivos(p: Path):
+    """Año de un festivos_*_AAAA.csv (None si el nombre no lo lleva: afecta a todos)."""
+    sufijo = p.stem.rsplit("_", 1)[-1]
+    return int(sufijo) if p.name.startswith("festivos_") and sufijo.isdigit() else None
+
+def anios_guardias(path: Path) -> list:
+    """Años en que empieza o acaba alguna guardia del CSV."""
+    from app.rapido import leer_guardias
+    filas, _ = leer_guardias(path)
+    anios = set()
+    for r in filas:
+        for c in ("inicio_datetime", "fin_datetime"):
+            a = str(r.get(c, "")).strip()[:4]
+            if a.isdigit():
+                anios.add(int(a))
+    return sorted(anios)
+
+class Vigilante:
+    def __init__(self, entrada: Path, salida_dir: Path, opciones: dict,
+                 reglas_path: Path = Path("config/reglas.yml"),
+                 tarifas_path: Path = Path("config/tarifas.xlsx"), base: Path = Path("data")):
+        self.entrada = Path(entrada)
+        self.salida_dir = Path(salida_dir)
+        self.opciones = dict(opciones)
+        self.rutas_config = (Path(reglas_path), Path(tarifas_path), Path(base))
+        self.ruta_estado = self.salida_dir / NOMBRE_ESTADO
+        self.estado = self._leer_estado()
+        self._contexto_cargado = False
+
+    def _leer_estado(self) -> dict:
+        vacio = {"version": VERSION, "opciones": None, "config": {}, "entradas": {}}
+        try:
+            with open(self.ruta_estado, encoding="utf-8") as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            return vacio
+        return estado if estado.get("version") == VERSION else vacio
+
+    def _guardar_estado(self):
+        self.salida_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.ruta_estado.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.estado, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.ruta_estado)
+
+    def _cambiados(self, rutas, registro: dict, espera: float) -> list:
+        """
+        Rutas cuyo contenido cambió respecto a `registro` ({ruta: {stat, sha1}}); actualiza el
+        stat de las que solo se tocaron. Las modificadas hace menos de `espera` s se dejan
+        para la siguiente pasada.
+        """
+        ahora = time.time_ns()
+        out = []
+        for p in rutas:
+            st = _stat(p)
+            previo = registro.get(str(p))
+            if previo is not None and previo["stat"] == st:
+                continue
+            if st is None:
+                out.append((p, None))
+                continue
+            if ahora - st[0] < espera * 1e9:
+                continue
+            sha1 = _sha1(p)
+            if previo is not None and previo["sha1"] == sha1:
+                previo["stat"] = st
+                continue
+            out.append((p, {"stat": st, "sha1": sha1}))
+        return out
+
+    def _cargar_contexto(self):
+        from app.reglas import cargar_reglas
+        from app.tarifas import CargadorTarifas
+        from app.calendario import CalendarioFestivos
+        reglas_path, tarifas_path, base = self.rutas_config
+        reglas = cargar_reglas(reglas_path)
+        cal = CalendarioFestivos(reglas=reglas, municipio_default=self.opciones["municipio_default"], base=base)
+        cal.precargar(cal.anios_disponibles())
+        _inicializar(reglas, CargadorTarifas(tarifas_path), cal)
+        self._contexto_cargado = True
+
+    def _calcular(self, path: Path, info: dict) -> dict:
+        """Calcula una entrada en la carpeta temporal y mueve sus salidas a su sitio."""
+        o = self.opciones
+        tmp = self.salida_dir / CARPETA_TEMPORAL / nombre_salida(path)
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        try:
+            n, horas, anio, mes = _procesar(path, None, None, o["motor"], tmp, o["irpf"],
+                                            o["detalle"] == "segmentos", o["formato"], o["agregados"], o["excel"])
+            salidas = sorted(str(p.relative_to(tmp)) for p in tmp.rglob("*") if p.is_file())
+            for rel in salidas:
+                destino = self.salida_dir / rel
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp / rel, destino)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+            try:
+                tmp.parent.rmdir()
+            except OSError:
+                pass
+        # Salidas anteriores que ya no se generan (p.ej. la entrada pasó a otro mes)
+        for rel in set(info.get("salidas", [])) - set(salidas):
+            (self.salida_dir / rel).unlink(missing_ok=True)
+        info.update(salidas=salidas, anios=anios_guardias(path), mes=f"{anio:04d}-{mes:02d}",
+                    guardias=n, horas=horas, error=None)
+        return info
+
+    def pasada(self, espera: float = 1.0) -> dict:
+        """Una comprobación completa; devuelve {'calculados', 'errores', 'retirados'}."""
+        est = self.estado
+        resultado = {"calculados": [], "errores": [], "retirados": []}
+
+        # Configuración: qué entradas quedan afectadas
+        fuentes = fuentes_config(*self.rutas_config)
+        # Un fichero que existe pero ya no es fuente (festivos.bin en estados antiguos) se olvida
+        for r in [r for r in est["config"] if Path(r) not in fuentes and Path(r).exists()]:
+            del est["config"][r]
+        retiradas = [Path(r) for r in est["config"] if Path(r) not in fuentes]
+        cambios_config = self._cambiados(fuentes + retiradas, est["config"], espera)
+        todas = est["opciones"] != self.opciones
+        anios = set()
+        for p, nuevo in cambios_config:
+            anio = _anio_festivos(p)
+            if anio is None:
+                todas = True
+            else:
+                anios.add(anio)
+
+        # Entradas nuevas, modificadas o sin alguna de sus salidas
+        rutas = sorted(self.entrada.glob("*.csv"))
+        for r in [r for r in est["entradas"] if Path(r) not in rutas]:
+            del est["entradas"][r]
+            resultado["retirados"].append(Path(r))
+        pendientes = {p: nuevo for p, nuevo in self._cambiados(rutas, est["entradas"], espera) if nuevo}
+        for r, info in est["entradas"].items():
+            p = Path(r)
+            if p in pendientes:
+                continue
+            if (todas or anios.intersection(info.get("anios", [])) or
+                    any(not (self.salida_dir / rel).exists() for rel in info.get("salidas", []))):
+                pendientes[p] = {"stat": info["stat"], "sha1": info["sha1"]}
+
+        if pendientes:
+            if cambios_config or not self._contexto_cargado:
+                self._cargar_contexto()
+            for p in sorted(pendientes):
+                info = dict(est["entradas"].get(str(p), {}), **pendientes[p])
+                try:
+                    est["entradas"][str(p)] = self._calcular(p, info)
+                    resultado["calculados"].append(p)
+                except Exception as e:
+                    # Se guarda el hash: no se reintenta hasta que el fichero cambie
+                    info["error"] = str(e)
+                    est["entradas"][str(p)] = info
+                    resultado["errores"].append((p, str(e)))
+        elif cambios_config:
+            self._contexto_cargado = False  # se recargará cuando haga falta
+
+        for p, nuevo in cambios_config:
+            if nuevo is None:
+                est["config"].pop(str(p), None)
+            else:
+                est["config"][str(p)] = nuevo
+        if cambios_config or pendientes or resultado["retirados"] or todas:
+            est["opciones"] = self.opciones
+            self._guardar_estado()
+        return resultado
+
+    def vigilar(self, intervalo: float = 2.0, espera: float = 1.0, una_vez: bool = False, avisar=print):
+        while True:
+            t0 = time.perf_counter()
+            r = self.pasada(espera)
+            ms = (time.perf_counter() - t0) * 1000
+            for p in r["calculados"]:
+                info = self.estado["entradas"][str(p)]
+                avisar(f"{time.strftime('%H:%M:%S')} OK {p} ({info['mes']}, {info['guardias']} guardias, "
+                       f"{info['horas']:.0f} h; {len(info['salidas'])} ficheros)")
+            for p, msg in r["errores"]:
+                avisar(f"{time.strftime('%H:%M:%S')} ERROR {p}: {msg}")
+            for p in r["retirados"]:
+                avisar(f"{time.strftime('%H:%M:%S')} Retirado {p} (sus salidas se conservan)")
+            if r["calculados"] or r["errores"]:
+                avisar(f"  pasada en {ms:.0f} ms")
+            if una_vez:
+                return r
+            time.sleep(intervalo)
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(prog="main.py vigilar",
+                                description="Recalcula los CSV de entrada que cambian (y los afectados por config/ y data/)")
+    p.add_argument("--entrada", type=Path, default=Path("input"), help="Carpeta con los CSV de guardias")
+    p.add_argument("--salida_dir", type=Path, default=Path("output"))
+    p.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre comprobaciones")
+    p.add_argument("--espera", type=float, default=1.0,
+                   help="Segundos sin cambios antes de procesar un fichero (copias a medias)")
+    p.add_argument("--una_vez", action="store_true", help="Una sola pasada y salir")
+    p.add_argument("--municipio_default", type=str, default="Sevilla")
+    p.add_argument("--motor", choices=["iterativo", "vectorizado", "intervalos"], default="vectorizado")
+    p.add_argument("--irpf", type=float, default=0.0, help="%% IRPF aplicado al resumen")
+    p.add_argument("--detalle", choices=["horario", "segmentos"], default="horario")
+    p.add_argument("--formato", choices=["csv", "parquet"], default="csv")
+    p.add_argument("--agregados", action="store_true",
+                   help="Reescribir también los totales mensuales en <salida_dir>/agregados/")
+    p.add_argument("--excel", action="store_true", help="Escribir además nomina_YYYY-MM_<nombre>.xlsx")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.entrada.is_dir():
+        raise SystemExit(f"Error: no existe la carpeta de entrada {args.entrada}")
+    opciones = {"motor": args.motor, "irpf": args.irpf, "detalle": args.detalle, "formato": args.formato,
+                "agregados": args.agregados, "excel": args.excel, "municipio_default": args.municipio_default}
+    vigilante = Vigilante(args.entrada, args.salida_dir, opciones)
+    if not args.una_vez:
+        print(f"Vigilando {args.entrada} (cada {args.intervalo:g} s; Ctrl+C para parar)")
+    try:
+        r = vigilante.vigilar(args.intervalo, args.espera, una_vez=args.una_vez)
+    except KeyboardInterrupt:
+        return
+    if r is not None and not any(r.values()):
+        print("Sin cambios")
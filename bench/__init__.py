@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks del cálculo de guardias: `python -m bench --help` (ejecutar desde la raíz del repo)."""
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Mide cada etapa del cálculo a varias escalas y guarda los resultados en JSON.
+- Tiempo: mejor de N repeticiones (perf_counter).
+- Memoria: pico de tracemalloc en una ejecución aparte (no contamina el tiempo).
+- `--baseline`: compara con un JSON anterior y marca las etapas más lentas que `--umbral`.
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from app.reglas import cargar_reglas
+from app.tarifas import CargadorTarifas
+from app.calendario import CalendarioFestivos
+from app.calculo import MOTORES, _parse_dt, detalle_texto
+from app.io_csv import escribir_detalle, escribir_resumen
+from bench.generador import ESCALAS, generar_escala
+
+def medir(fn, repeticiones: int = 3):
+    """(mejor tiempo en s, pico de memoria en MB)."""
+    mejor = float("inf")
+    for _ in range(max(1, repeticiones)):
+        t0 = time.perf_counter()
+        fn()
+        mejor = min(mejor, time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return mejor, pico / 2**20
+
+def etapas(guardias, reglas_path: Path, tarifas_path: Path, salida_dir: Path):
+    """Lista de (nombre, función sin argumentos) para una escala ya generada."""
+    reglas = cargar_reglas(reglas_path)
+    tarifas = CargadorTarifas(tarifas_path)
+    inicios = [_parse_dt(v) for v in guardias["inicio_datetime"]]
+    fines = [_parse_dt(v) for v in guardias["fin_datetime"]]
+    anios = sorted({d.year for d in inicios + fines})
+    cal = CalendarioFestivos(reglas=reglas)
+    cal.precargar(anios)
+    bloques = [(t0, m) for i, f, m in zip(inicios, fines, guardias["municipio"])
+               for t0, _ in cal.fraccionar_por_hora(i, f)]
+    pares = list(zip(guardias["grado"], guardias["tipo_guardia"]))
+    resultado = {}
+
+    def _calendario():
+        CalendarioFestivos(reglas=reglas).precargar(anios)
+
+    def _obtener():
+        for g, t in pares:
+            tarifas.obtener(g, t)
+
+    def _fraccionar():
+        for i, f in zip(inicios, fines):
+            cal.fraccionar_por_hora(i, f)
+
+    def _tipos():
+        for t0, m in bloques:
+            cal.tipo_en_fecha(t0, m)
+
+    def _motor(nombre):
+        def _fn():
+            resultado["calculo"] = MOTORES[nombre](guardias, cal, tarifas, reglas, anio=anios[0], mes=12)
+        return _fn
+
+    def _escribir():
+        detalle, resumen = resultado["calculo"]
+        escribir_detalle(detalle_texto(detalle), salida_dir / "detalle.csv")  # el texto se genera al escribir
+        escribir_resumen(resumen, salida_dir / "resumen.csv")
+
+    return [
+        ("cargar_reglas", lambda: cargar_reglas(reglas_path)),
+        ("cargar_tarifas", lambda: CargadorTarifas(tarifas_path)),
+        ("cargar_calendario", _calendario),
+        ("tarifas_obtener", _obtener),
+        ("fraccionar_por_hora", _fraccionar),
+        ("tipo_en_fecha", _tipos),
+        *[(f"calcular_{m}", _motor(m)) for m in MOTORES],
+        ("escribir_csv", _escribir),
+    ], len(bloques)
+
+def ejecutar(escalas, repeticiones: int, reglas_path: Path, tarifas_path: Path) -> dict:
+    resultados = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for escala in escalas:
+            guardias = generar_escala(escala)
+            lista, n_horas = etapas(guardias, reglas_path, tarifas_path, Path(tmp))
+            for nombre, fn in lista:
+                seg, pico = medir(fn, repeticiones)
+                resultados.append({
+                    "escala": escala, "etapa": nombre, "segundos": seg, "pico_mb": pico,
+                    "guardias": len(guardias), "horas": n_horas,
+                })
+                print(f"{escala:<18} {nombre:<22} {seg * 1000:10.2f} ms {pico:9.2f} MB")
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "repeticiones": repeticiones,
+        "resultados": resultados,
+    }
+
+def comparar(actual: dict, baseline: dict, umbral: float) -> list:
+    """Etapas cuyo tiempo supera `umbral` veces el de la baseline: [(escala, etapa, ratio)]."""
+    base = {(r["escala"], r["etapa"]): r for r in baseline.get("resultados", [])}
+    regresiones = []
+    for r in actual["resultados"]:
+        b = base.get((r["escala"], r["etapa"]))
+        if not b or b["segundos"] <= 0:
+            continue
+        ratio = r["segundos"] / b["segundos"]
+        marca = "  <-- REGRESIÓN" if ratio > umbral else ""
+        print(f"{r['escala']:<18} {r['etapa']:<22} x{ratio:6.2f} "
+              f"(mem {r['pico_mb']:.2f} / {b['pico_mb']:.2f} MB){marca}")
+        if ratio > umbral:
+            regresiones.append((r["escala"], r["etapa"], ratio))
+    return regresiones
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(prog="python -m bench", description="Benchmarks por etapa y escala")
+    p.add_argument("--escalas", nargs="+", choices=list(ESCALAS), default=list(ESCALAS))
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.add_argument("--salida", type=Path, default=Path("bench/resultados.json"))
+    p.add_argument("--baseline", type=Path, help="JSON de una ejecución anterior con el que comparar")
+    p.add_argument("--umbral", type=float, default=1.25, help="Ratio de tiempo a partir del cual hay regresión")
+    p.add_argument("--estricto", action="store_true", help="Salir con código 1 si hay regresiones")
+    p.add_argument("--reglas", type=Path, default=Path("config/reglas.yml"))
+    p.add_argument("--tarifas", type=Path, default=Path("config/tarifas.xlsx"))
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    actual = ejecutar(args.escalas, args.repeticiones, args.reglas, args.tarifas)
+    args.salida.parent.mkdir(parents=True, exist_ok=True)
+    args.salida.write_text(json.dumps(actual, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Resultados: {args.salida}")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regresiones = comparar(actual, baseline, args.umbral)
+        if regresiones and args.estricto:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
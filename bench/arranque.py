@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Arranque en frío: cada medida es un proceso nuevo (intérprete + imports + cálculo).
+- `cli_rapido`: main.py con un residente-mes (vía rápida sin pandas).
+- `cli_pandas`: lo mismo con --sin_rapido.
+- `gui_import`: importar app.gui (lo que tarda en poder abrirse la ventana).
+- `ejecutable`: el binario congelado (PyInstaller), si se indica o existe en dist/.
+Uso: python -m bench.arranque [--ejecutable RUTA] [--presupuesto_ms 400]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.generador import generar_escala
+
+_RAIZ = Path(__file__).resolve().parents[1]
+
+_CANDIDATOS_EXE = [
+    Path("dist/Calculoguardias/Calculoguardias.exe"),
+    Path("dist/Calculoguardias/Calculoguardias"),
+    Path("dist/Calculoguardias.exe"),
+    Path("dist/Calculoguardias"),
+]
+
+def _medir(cmd, repeticiones: int) -> dict:
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return {"mediana_ms": statistics.median(tiempos), "min_ms": min(tiempos), "muestras": len(tiempos)}
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(prog="python -m bench.arranque", description="Arranque en frío del CLI/GUI")
+    p.add_argument("--repeticiones", type=int, default=5)
+    p.add_argument("--ejecutable", type=Path, help="Binario congelado a medir con los mismos argumentos")
+    p.add_argument("--presupuesto_ms", type=float, help="Falla si la mediana de cli_rapido lo supera")
+    p.add_argument("--salida", type=Path, default=Path("bench/arranque.json"))
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    resultados = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        entrada = Path(tmp) / "guardias.csv"
+        generar_escala("residente_mes").drop(columns=["residente"]).to_csv(entrada, index=False)
+        cli = [str(_RAIZ / "main.py"), "--anio", "2025", "--mes", "12", "--entrada", str(entrada), "--salida_dir", tmp]
+        # Primera ejecución fuera de la medida: deja la instantánea y los .pyc generados
+        subprocess.run([sys.executable] + cli, check=True, stdout=subprocess.DEVNULL)
+
+        casos = {
+            "python_vacio": [sys.executable, "-c", "pass"],
+            "cli_rapido": [sys.executable] + cli,
+            "cli_pandas": [sys.executable] + cli + ["--sin_rapido"],
+            "gui_import": [sys.executable, "-c", f"import sys; sys.path.insert(0, {str(_RAIZ)!r}); import app.gui"],
+        }
+        exe = args.ejecutable or next((p for p in _CANDIDATOS_EXE if p.exists()), None)
+        if exe is not None:
+            casos["ejecutable"] = [str(exe)] + cli[1:]
+        for nombre, cmd in casos.items():
+            resultados[nombre] = _medir(cmd, args.repeticiones)
+            print(f"{nombre:<14} mediana {resultados[nombre]['mediana_ms']:8.1f} ms  "
+                  f"mín {resultados[nombre]['min_ms']:8.1f} ms")
+
+    args.salida.parent.mkdir(parents=True, exist_ok=True)
+    args.salida.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+    if args.presupuesto_ms and resultados["cli_rapido"]["mediana_ms"] > args.presupuesto_ms:
+        raise SystemExit(f"Arranque por encima del presupuesto: "
+                         f"{resultados['cli_rapido']['mediana_ms']:.0f} ms > {args.presupuesto_ms:.0f} ms")
+
+if __name__ == "__main__":
+    main()
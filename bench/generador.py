@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Generador determinista de guardias sintéticas para benchmarks.
+- Turnos de 12, 17 y 24 h con horas de entrada habituales (08, 09, 15, 20).
+- Grados R1..R5 repartidos entre residentes; municipios de toda la provincia.
+- Diciembre lleva más guardias y cubre 24, 25 y 31 (festivos especiales).
+"""
+import random
+from datetime import datetime, timedelta
+import calendar as _cal
+import pandas as pd
+
+from app.municipios import cargar_municipios
+
+GRADOS = ["R1", "R2", "R3", "R4", "R5"]
+COLUMNAS = [
+    "inicio_datetime", "fin_datetime", "municipio", "tipo_guardia", "grado",
+    "observaciones", "tipo_ini", "tipo_fin", "residente",
+]
+
+# nombre -> (residentes, meses del año 2025 a partir de diciembre hacia atrás)
+ESCALAS = {
+    "residente_mes": (1, 1),
+    "servicio_mes": (25, 1),
+    "servicio_anio": (25, 12),
+    "departamento_anio": (120, 12),
+}
+
+_TURNOS = [(15, 17), (8, 24), (9, 24), (8, 12), (20, 12)]
+
+def _guardias_mes(rng: random.Random, anio: int, mes: int):
+    ndias = _cal.monthrange(anio, mes)[1]
+    n = rng.randint(7, 9) if mes == 12 else rng.randint(4, 7)
+    dias = set(rng.sample(range(1, ndias + 1), n))
+    if mes == 12:
+        dias |= {24, 25, 31}
+    for dia in sorted(dias):
+        hora, duracion = rng.choice(_TURNOS)
+        inicio = datetime(anio, mes, dia, hora, 0)
+        yield inicio, inicio + timedelta(hours=duracion)
+
+def generar_guardias(residentes: int = 1, meses=((2025, 12),), semilla: int = 2025,
+                     municipios=None) -> pd.DataFrame:
+    """Misma semilla y parámetros => mismo DataFrame (columnas de input/guardias_mes.csv + residente)."""
+    rng = random.Random(semilla)
+    municipios = list(municipios or cargar_municipios())
+    filas = []
+    for r in range(residentes):
+        grado = GRADOS[r % len(GRADOS)]
+        municipio = rng.choice(municipios)
+        for anio, mes in meses:
+            for inicio, fin in _guardias_mes(rng, anio, mes):
+                tipo_ini = "festivo" if rng.random() < 0.05 else ""
+                filas.append({
+                    "inicio_datetime": inicio.strftime("%Y-%m-%d %H:%M"),
+                    "fin_datetime": fin.strftime("%Y-%m-%d %H:%M"),
+                    "municipio": municipio if rng.random() < 0.9 else rng.choice(municipios),
+                    "tipo_guardia": "",
+                    "grado": grado,
+                    "observaciones": "refuerzo" if rng.random() < 0.1 else "",
+                    "tipo_ini": tipo_ini,
+                    "tipo_fin": "",
+                    "residente": f"residente_{r + 1:03d}",
+                })
+    return pd.DataFrame(filas, columns=COLUMNAS)
+
+def generar_escala(nombre: str, semilla: int = 2025) -> pd.DataFrame:
+    residentes, n_meses = ESCALAS[nombre]
+    meses = [(2025, m) for m in range(12, 12 - n_meses, -1)]
+    return generar_guardias(residentes, meses, semilla=semilla)
@@ -4,10 +4,26 @@
 CLI o GUI: cálculo de importe por guardias (MIR).
 - CLI: requiere --anio y --mes
 - GUI: solo --gui
+- Lote: `main.py lote <dir|glob|csv>...` (ver app/lote.py)
+- Servicio: `main.py servicio [--puerto 8765]` (ver app/servicio.py)
+- Historial: `main.py historial --anio 2025 --por residente` (ver app/historial.py)
+- Agregados: `main.py agregados --anio 2025 --hasta 2025-06 --por grado` (ver app/agregados.py)
+- Festivos compilados: `main.py festivos` (ver app/festivos_compilados.py)
 """
 import argparse
+import sys
 from pathlib import Path
 
+SUBCOMANDOS = {
+    "lote": "app.lote",
+    "servicio": "app.servicio",
+    "historial": "app.historial",
+    "agregados": "app.agregados",
+    "festivos": "app.festivos_compilados",
+    "vigilar": "app.vigilancia",
+    "simular": "app.simulacion",
+}
+
 def parse_args():
     p = argparse.ArgumentParser()
     p.add_argument('--gui', action='store_true', help='Abrir interfaz gráfica')
@@ -16,9 +32,140 @@ def parse_args():
     p.add_argument("--entrada", type=Path, default=Path("input/guardias_mes.csv"))
     p.add_argument("--municipio_default", type=str, default="Sevilla")
     p.add_argument("--salida_dir", type=Path, default=Path("output"))
+    p.add_argument("--motor", choices=["iterativo", "vectorizado", "intervalos"], default="iterativo",
+                   help="Motor de cálculo (vectorizado = arrays NumPy, mismo resultado; "
+                        "intervalos = un tramo por día, con la resolución de config/reglas.yml)")
+    p.add_argument("--detalle", choices=["horario", "segmentos"], default="horario",
+                   help="Detalle por hora o por segmentos (horas consecutivas con mismo tipo y precio)")
+    p.add_argument("--formato", choices=["csv", "parquet"], default="csv",
+                   help="Formato de salida (parquet: columnas tipadas, requiere pyarrow)")
+    p.add_argument("--excel", action="store_true",
+                   help="Escribir además nomina_YYYY-MM.xlsx (hojas detalle, resumen y totales por grado)")
+    p.add_argument("--cache", action="store_true",
+                   help="Reutilizar resultados de guardias ya calculadas (.cache/resultados.pkl)")
+    p.add_argument("--sin_rapido", action="store_true",
+                   help="No usar la vía rápida sin pandas para entradas pequeñas")
+    p.add_argument("--por_bloques", type=int, default=0, metavar="N",
+                   help="Procesar la entrada en bloques de N guardias con memoria acotada (0 = todo junto)")
+    p.add_argument("--historial", nargs="?", const="", default=None, metavar="RUTA",
+                   help="Guardar las guardias calculadas en SQLite (por defecto <salida_dir>/historial.sqlite)")
+    p.add_argument("--agregados", action="store_true",
+                   help="Actualizar los totales del mes por grado, tipo de día y municipio (<salida_dir>/agregados/)")
+    p.add_argument("--residente", type=str,
+                   help="Residente en el historial y los agregados (por defecto, el nombre de la entrada)")
+    p.add_argument("--validar", choices=["avisar", "estricto", "no"], default="avisar",
+                   help="Antes de calcular, buscar solapes, duplicados, fechas y grados no válidos... "
+                        "(estricto: si hay errores no se calcula)")
+    p.add_argument("--profile", action="store_true",
+                   help="Medir tiempo, llamadas y memoria por etapa (perfil_YYYY-MM.json junto a las salidas)")
+    p.add_argument("--profile_pstats", action="store_true",
+                   help="Con --profile, volcar además cProfile del cálculo en perfil_YYYY-MM.pstats")
     return p.parse_args()
 
+def _via_rapida(args) -> bool:
+    """Entrada pequeña y salida CSV horaria: se calcula con la biblioteca estándar (app/rapido.py)."""
+    if args.sin_rapido or args.profile or args.agregados or args.excel or args.motor != "iterativo" or args.formato != "csv" or args.detalle != "horario":
+        return False
+    if args.por_bloques > 0:
+        return False
+    from app.rapido import LIMITE_BYTES
+    try:
+        return args.entrada.stat().st_size <= LIMITE_BYTES
+    except OSError:
+        return False
+
+def _calcular_con_cache(args):
+    """Recalcula solo las guardias nuevas o modificadas; sin pandas si la salida es CSV horario."""
+    from app.cache import RUTA_CACHE, CacheResultados, huella_cache
+    from app.instantanea import cargar_instantanea
+    from app.nucleo import COLUMNAS_RESUMEN
+    from app.rapido import leer_guardias, escribir_csv
+
+    inst = cargar_instantanea()
+    # La caché guarda lo que calcula el núcleo por horas (app/nucleo.py), igual para los tres
+    # motores salvo el de intervalos con otra resolución: ese caso no se puede reutilizar.
+    if args.motor == "intervalos" and int(inst.reglas.get("resolucion_horas") or 60) != 60:
+        raise SystemExit("Error: --cache calcula por horas; con resolucion_horas distinta de 60 "
+                         "use --motor intervalos sin --cache")
+    huella = huella_cache()
+    cache = CacheResultados(RUTA_CACHE)
+    filas, columnas = leer_guardias(args.entrada)
+    detalle, resumen = cache.calcular(filas, columnas, inst.calendario(args.municipio_default), inst.tarifas(),
+                                      huella, municipio_default=args.municipio_default)
+    cache.guardar()
+
+    args.salida_dir.mkdir(parents=True, exist_ok=True)
+    nombre = f"{args.anio:04d}-{args.mes:02d}"
+    if args.formato == "csv" and args.detalle == "horario" and not args.excel:
+        escribir_csv(detalle, list(detalle[0]) if detalle else [], args.salida_dir / f"detalle_{nombre}.csv")
+        escribir_csv(resumen, COLUMNAS_RESUMEN, args.salida_dir / f"resumen_{nombre}.csv")
+        _guardar_historial(args, args.salida_dir / f"resumen_{nombre}.csv")
+    else:
+        import pandas as pd
+        from app.io_csv import FORMATOS, escribir_salidas
+        from app.calculo import comprimir_detalle
+        det_df = pd.DataFrame(detalle)
+        if args.detalle == "segmentos":
+            det_df = comprimir_detalle(det_df)
+        ext = FORMATOS[args.formato]
+        escribir_salidas(det_df, pd.DataFrame(resumen, columns=COLUMNAS_RESUMEN),
+                         args.salida_dir / f"detalle_{nombre}{ext}", args.salida_dir / f"resumen_{nombre}{ext}",
+                         formato=args.formato, xlsx_path=_ruta_excel(args))
+        _guardar_historial(args, args.salida_dir / f"resumen_{nombre}{ext}")
+    _guardar_agregados(args, detalle)
+    print(f"OK ({cache.aciertos} guardias reutilizadas, {cache.fallos} calculadas)")
+
+def _validar(args):
+    """Valida la entrada antes de calcular (app/validacion.py); en modo estricto, un error para el cálculo."""
+    if args.validar == "no":
+        return
+    from app.instantanea import cargar_instantanea
+    from app.municipios import cargar_municipios
+    from app.rapido import leer_guardias
+    from app.validacion import contar, formatear, validar_guardias
+    filas, _ = leer_guardias(args.entrada)
+    incidencias = validar_guardias(filas, args.anio, args.mes, grados=cargar_instantanea().tarifas().grados,
+                                   municipios=cargar_municipios(), municipio_default=args.municipio_default)
+    if not incidencias:
+        return
+    print(formatear(incidencias))
+    if args.validar == "estricto" and contar(incidencias)["error"]:
+        raise SystemExit("Error: la entrada no pasa la validación (--validar avisar para calcular igualmente)")
+
+def _ruta_excel(args):
+    return args.salida_dir / f"nomina_{args.anio:04d}-{args.mes:02d}.xlsx" if args.excel else None
+
+def _residente(args) -> str:
+    import re
+    # Mismo saneado que lote.nombre_salida, sin importar pandas en la vía rápida
+    return args.residente or re.sub(r"[^A-Za-z0-9_-]+", "_", args.entrada.stem) or "sin_nombre"
+
+def _guardar_agregados(args, detalle=None, acum=None):
+    """Reescribe el agregado del mes a partir del detalle calculado (o de lo ya acumulado)."""
+    if not args.agregados:
+        return
+    from app.agregados import acumular, escribir_agregado
+    if acum is None:
+        acum = acumular({}, detalle)
+    path = escribir_agregado(acum, args.salida_dir, _residente(args), args.anio, args.mes)
+    print(f"Agregados: {path}")
+
+def _guardar_historial(args, res_p: Path):
+    """Vuelca en el historial SQLite el resumen que se acaba de escribir."""
+    if args.historial is None:
+        return
+    from app.historial import NOMBRE_DB, Historial, leer_resumen
+    ruta = Path(args.historial) if args.historial else args.salida_dir / NOMBRE_DB
+    residente = _residente(args)
+    with Historial(ruta) as h:
+        n = h.guardar(leer_resumen(res_p), residente, args.anio, args.mes, entrada=args.entrada, motor=args.motor)
+    print(f"Historial: {n} guardias de {residente} en {ruta}")
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMANDOS:
+        import importlib
+        return importlib.import_module(SUBCOMANDOS[sys.argv[1]]).main(sys.argv[2:])
+
     args = parse_args()
     if args.gui:
         from app.gui import launch
@@ -28,21 +175,89 @@ def main():
     if args.anio is None or args.mes is None:
         raise SystemExit("Error: en modo CLI son obligatorios --anio y --mes")
 
-    from app.io_csv import leer_guardias, escribir_detalle, escribir_resumen
+    args.profile = args.profile or args.profile_pstats
+    _validar(args)
+    if args.cache:
+        if args.profile:
+            raise SystemExit("Error: --cache no se puede combinar con --profile")
+        if args.por_bloques > 0:
+            raise SystemExit("Error: --cache no se puede combinar con --por_bloques")
+        _calcular_con_cache(args)
+        return
+
+    if _via_rapida(args):
+        from app.rapido import calcular_y_escribir
+        args.salida_dir.mkdir(parents=True, exist_ok=True)
+        res_p = args.salida_dir / f"resumen_{args.anio:04d}-{args.mes:02d}.csv"
+        calcular_y_escribir(args.entrada,
+                            args.salida_dir / f"detalle_{args.anio:04d}-{args.mes:02d}.csv",
+                            res_p, municipio_default=args.municipio_default)
+        _guardar_historial(args, res_p)
+        print("OK")
+        return
+
+    from app.io_csv import (FORMATOS, leer_guardias, leer_guardias_por_bloques,
+                            escribir_salidas, escribir_por_bloques)
     from app.reglas import cargar_reglas
     from app.tarifas import CargadorTarifas
     from app.calendario import CalendarioFestivos
-    from app.calculo import calcular_importes
+    from app.calculo import MOTORES, calcular_por_bloques, detalle_en_formato
+    from app.perfil import Perfil, resumen_texto
+
+    nombre = f"{args.anio:04d}-{args.mes:02d}"
+    perfil = Perfil(activo=args.profile,
+                    pstats_path=args.salida_dir / f"perfil_{nombre}.pstats" if args.profile_pstats else None)
+    perfil.datos.update({"entrada": str(args.entrada), "motor": args.motor, "detalle": args.detalle,
+                         "formato": args.formato, "por_bloques": args.por_bloques})
 
-    reglas = cargar_reglas(Path("config/reglas.yml"))
-    tarifas = CargadorTarifas(Path("config/tarifas.xlsx"))
-    cal = CalendarioFestivos(anio=args.anio, reglas=reglas, municipio_default=args.municipio_default)
-    guardias = leer_guardias(args.entrada)
-    detalle, resumen = calcular_importes(guardias, cal, tarifas, reglas, anio=args.anio, mes=args.mes)
+    with perfil.etapa("reglas"):
+        reglas = cargar_reglas(Path("config/reglas.yml"))
+    with perfil.etapa("tarifas"):
+        tarifas = CargadorTarifas(Path("config/tarifas.xlsx"))
+    with perfil.etapa("festivos"):
+        cal = CalendarioFestivos(anio=args.anio, reglas=reglas, municipio_default=args.municipio_default)
     args.salida_dir.mkdir(parents=True, exist_ok=True)
-    escribir_detalle(detalle, args.salida_dir / f"detalle_{args.anio:04d}-{args.mes:02d}.csv")
-    escribir_resumen(resumen, args.salida_dir / f"resumen_{args.anio:04d}-{args.mes:02d}.csv")
+    ext = FORMATOS[args.formato]
+    det_p = args.salida_dir / f"detalle_{nombre}{ext}"
+    res_p = args.salida_dir / f"resumen_{nombre}{ext}"
+    acum = {}
+    with perfil.contando(cal):
+        if args.por_bloques > 0:
+            # Lectura, cálculo y escritura van intercaladas: se miden como una sola etapa
+            with perfil.etapa("calculo_por_bloques", perfilar=True):
+                resultados = calcular_por_bloques(
+                    leer_guardias_por_bloques(args.entrada, args.por_bloques), cal, tarifas, reglas,
+                    anio=args.anio, mes=args.mes, motor=args.motor
+                )
+                resultados = ((detalle_en_formato(d, args.detalle, reglas), r) for d, r in resultados)
+                if args.agregados:
+                    from app.agregados import acumulando
+                    resultados = acumulando(resultados, acum)
+                escribir_por_bloques(resultados, det_p, res_p, formato=args.formato, xlsx_path=_ruta_excel(args))
+        else:
+            with perfil.etapa("leer_entrada"):
+                guardias = leer_guardias(args.entrada)
+            perfil.datos["guardias"] = len(guardias)
+            with perfil.etapa("calculo", perfilar=True):
+                detalle, resumen = MOTORES[args.motor](guardias, cal, tarifas, reglas, anio=args.anio, mes=args.mes)
+            if args.agregados:
+                from app.agregados import acumular
+                with perfil.etapa("agregados"):
+                    acumular(acum, detalle)
+            with perfil.etapa("segmentos" if args.detalle == "segmentos" else "formato"):
+                detalle = detalle_en_formato(detalle, args.detalle, reglas)
+            with perfil.etapa("escritura"):
+                escribir_salidas(detalle, resumen, det_p, res_p, formato=args.formato, xlsx_path=_ruta_excel(args))
+    _guardar_agregados(args, acum=acum)
+    _guardar_historial(args, res_p)
+    if args.profile:
+        informe = args.salida_dir / f"perfil_{nombre}.json"
+        print(resumen_texto(perfil.guardar(informe)))
+        print(f"Perfil: {informe}")
     print("OK")
 
 if __name__ == "__main__":
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()  # ejecutable congelado + procesos hijos (modo lote)
     main()
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+import sys
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+@pytest.fixture(autouse=True)
+def _en_raiz(monkeypatch):
+    """Los módulos leen config/ y data/ con rutas relativas a la raíz del proyecto."""
+    monkeypatch.chdir(RAIZ)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import csv
+import math
+
+from app.agregados import acumular, consultar, escribir_agregado
+
+def _bloque(municipio, grado="R1", importe=13.13):
+    return {"grado": grado, "tipo_dia": "normal", "municipio": municipio, "horas": 1.0, "importe": importe}
+
+def _filas(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def test_municipio_normalizado_como_en_el_calendario(tmp_path):
+    acum = acumular({}, [_bloque("Dos Hermanas"), _bloque("dos hermanas"), _bloque(" DOS HERMANAS ")])
+    assert acum == {("R1", "normal", "Dos Hermanas"): [3.0, 39.39]}
+    path = escribir_agregado(acum, tmp_path, "ana", 2025, 3)
+    assert [(r["municipio"], r["horas"], r["bruto"]) for r in _filas(path)] == [("Dos Hermanas", "3.0", "39.39")]
+
+def test_consulta_une_municipios_escritos_sin_normalizar(tmp_path):
+    escribir_agregado({("R1", "normal", "dos hermanas"): [1.0, 10.0]}, tmp_path, "ana", 2025, 3)
+    escribir_agregado({("R1", "normal", "Dos Hermanas"): [2.0, 20.0]}, tmp_path, "ana", 2025, 4)
+    assert consultar(tmp_path / "agregados", por=["municipio"], municipio="DOS HERMANAS") == [
+        {"municipio": "Dos Hermanas", "horas": 3.0, "bruto": 30.0, "neto": 30.0}]
+
+def test_importe_nan_de_tarifa_vacia(tmp_path):
+    acum = acumular({}, [_bloque("Sevilla", "R5", math.nan), _bloque("Sevilla", "R5", math.nan),
+                         _bloque("Sevilla", "R1"), _bloque("Sevilla", "R1", math.nan)])
+    assert acum == {("R1", "normal", "Sevilla"): [2.0, 13.13], ("R5", "normal", "Sevilla"): [2.0, None]}
+    path = escribir_agregado(acum, tmp_path, "ana", 2025, 3, irpf_percent=10.0)
+    assert [(r["grado"], r["horas"], r["bruto"], r["neto"]) for r in _filas(path)] == [
+        ("R1", "2.0", "13.13", "11.817"), ("R5", "2.0", "", "")]
+    assert consultar(tmp_path / "agregados", por=[]) == [{"horas": 4.0, "bruto": 13.13, "neto": 11.817}]
+
+def test_residente_no_escapa_de_la_carpeta(tmp_path):
+    path = escribir_agregado({}, tmp_path / "out", "../../fuera/ana", 2025, 3)
+    assert path == tmp_path / "out/agregados/agregado_2025-03__fuera_ana.csv"
+    assert path.exists() and not (tmp_path / "fuera").exists()
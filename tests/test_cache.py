@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import shutil
+
+import openpyxl
+import pytest
+
+import main
+from app.cache import CacheResultados, huella_cache
+from app.festivos_compilados import NOMBRE_COMPILADO, compilar
+from app.instantanea import cargar_instantanea
+from app.nucleo import COLUMNAS_RESUMEN
+from app.rapido import calcular, escribir_csv, leer_guardias
+
+GUARDIAS = """inicio_datetime,fin_datetime,municipio,tipo_guardia,grado,observaciones
+2025-09-12 15:00,2025-09-13 08:00,Sevilla,,R1,
+2025-09-14 20:00,2025-09-15 09:30,Utrera,,R2,
+2025-09-15 08:00,2025-09-16 08:00,,,R3,noche larga
+2025-09-28 09:00,2025-09-28 21:00,dos hermanas,,R4,
+"""
+
+def _config(tmp_path):
+    """Copia de config/ y data/ (con festivos.bin compilado) y guardias de prueba en tmp_path."""
+    shutil.copytree("config", tmp_path / "config")
+    shutil.copytree("data", tmp_path / "data", ignore=shutil.ignore_patterns(NOMBRE_COMPILADO))
+    compilar(tmp_path / "data")
+    (tmp_path / "input").mkdir()
+    (tmp_path / "input/guardias.csv").write_text(GUARDIAS, encoding="utf-8")
+    return tmp_path / "config/reglas.yml", tmp_path / "config/tarifas.xlsx", tmp_path / "data"
+
+def _calcular(cache, tmp_path):
+    reglas, tarifas, base = tmp_path / "config/reglas.yml", tmp_path / "config/tarifas.xlsx", tmp_path / "data"
+    inst = cargar_instantanea(reglas, tarifas, base, ruta=tmp_path / ".cache/instantanea.json")
+    huella = huella_cache(reglas, tarifas, base)
+    filas, columnas = leer_guardias(tmp_path / "input/guardias.csv")
+    return cache.calcular(filas, columnas, inst.calendario("Sevilla"), inst.tarifas(), huella,
+                          municipio_default="Sevilla")
+
+def _editar_reglas(tmp_path):
+    with open(tmp_path / "config/reglas.yml", "a", encoding="utf-8") as f:
+        f.write("# revisado\n")
+
+def _editar_tarifas(tmp_path):
+    ruta = tmp_path / "config/tarifas.xlsx"
+    wb = openpyxl.load_workbook(ruta)
+    ws = wb["tarifas"]
+    ws.cell(row=2, column=2).value = (ws.cell(row=2, column=2).value or 0) + 1
+    wb.save(ruta)
+
+def _editar_festivos(tmp_path):
+    with open(tmp_path / "data/festivos_es_andalucia_2025.csv", "a", encoding="utf-8") as f:
+        f.write("2025-09-15,autonomico,,nuevo\n")
+
+def _editar_compilado(tmp_path):
+    otra = tmp_path / "otra"
+    shutil.copytree(tmp_path / "data", otra)
+    with open(otra / "festivos_es_andalucia_2025.csv", "a", encoding="utf-8") as f:
+        f.write("2025-09-15,autonomico,,nuevo\n")
+    compilar(otra, tmp_path / "data" / NOMBRE_COMPILADO)
+
+@pytest.mark.parametrize("editar", [_editar_reglas, _editar_tarifas, _editar_festivos, _editar_compilado])
+def test_editar_una_fuente_cambia_la_huella_y_recalcula(tmp_path, editar):
+    reglas, tarifas, base = _config(tmp_path)
+    cache = CacheResultados()
+    _, resumen = _calcular(cache, tmp_path)
+    n = len(resumen)
+    assert n == 4
+    _calcular(cache, tmp_path)
+    assert (cache.aciertos, cache.fallos) == (n, 0)
+    huella = huella_cache(reglas, tarifas, base)
+
+    editar(tmp_path)
+    assert huella_cache(reglas, tarifas, base) != huella
+    _calcular(cache, tmp_path)
+    assert (cache.aciertos, cache.fallos) == (0, n)
+
+def test_acierto_identico_a_calcular_sin_cache(tmp_path):
+    _config(tmp_path)
+    ruta = tmp_path / "resultados.pkl"
+    salidas = []
+    for _ in range(2):
+        cache = CacheResultados(ruta)
+        detalle, resumen = _calcular(cache, tmp_path)
+        cache.guardar()
+        d, r = tmp_path / f"d{len(salidas)}.csv", tmp_path / f"r{len(salidas)}.csv"
+        escribir_csv(detalle, list(detalle[0]), d)
+        escribir_csv(resumen, COLUMNAS_RESUMEN, r)
+        salidas.append((d.read_bytes(), r.read_bytes()))
+    assert cache.fallos == 0 and cache.aciertos == len(resumen)
+    assert salidas[0] == salidas[1]
+
+    inst = cargar_instantanea(tmp_path / "config/reglas.yml", tmp_path / "config/tarifas.xlsx",
+                              tmp_path / "data", ruta=tmp_path / ".cache/instantanea.json")
+    filas, columnas = leer_guardias(tmp_path / "input/guardias.csv")
+    assert calcular(filas, columnas, inst.calendario("Sevilla"), inst.tarifas()) == (detalle, resumen)
+
+def test_cache_con_intervalos_exige_resolucion_horaria(tmp_path, monkeypatch):
+    _config(tmp_path)
+    reglas = tmp_path / "config/reglas.yml"
+    reglas.write_text(reglas.read_text(encoding="utf-8").replace("resolucion_horas: 60", "resolucion_horas: 30"),
+                      encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    argv = ["main.py", "--entrada", "input/guardias.csv", "--anio", "2025", "--mes", "9", "--salida_dir", "out",
+            "--cache", "--validar", "no"]
+    monkeypatch.setattr("sys.argv", argv + ["--motor", "intervalos"])
+    with pytest.raises(SystemExit, match="resolucion_horas"):
+        main.main()
+    monkeypatch.setattr("sys.argv", argv + ["--motor", "vectorizado"])
+    main.main()
+    assert (tmp_path / "out/resumen_2025-09.csv").exists()
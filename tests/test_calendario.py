@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import time
+from datetime import date, datetime
+
+from app.calendario import CalendarioFestivos
+from app.festivos_compilados import NOMBRE_COMPILADO
+from app.instantanea import cargar_instantanea
+
+CABECERA = "fecha,ambito,municipio,descripcion\n"
+
+def _festivos(base, anio, generales=(), locales=()):
+    (base / f"festivos_es_andalucia_{anio}.csv").write_text(
+        CABECERA + "".join(f"{f},autonomico,,\n" for f in generales), encoding="utf-8")
+    (base / f"festivos_locales_sevilla_{anio}.csv").write_text(
+        CABECERA + "".join(f"{f},local,{m},\n" for f, m in locales), encoding="utf-8")
+
+def test_guardia_de_nochevieja_usa_el_calendario_del_anio_siguiente(tmp_path):
+    _festivos(tmp_path, 2025, ["2025-12-08"])
+    _festivos(tmp_path, 2026, ["2026-01-01"], [("2026-01-02", "Utrera")])
+    cal = CalendarioFestivos(base=tmp_path)
+    tipos = cal.tipos_para_rango(datetime(2025, 12, 31, 20), datetime(2026, 1, 1, 8), "Sevilla")
+    assert tipos == ["normal"] * 4 + ["festivo"] * 8
+    tipos = cal.tipos_para_rango(datetime(2026, 1, 1, 22), datetime(2026, 1, 2, 2), "utrera")
+    assert tipos == ["festivo"] * 4
+    assert sorted(cal._anios) == [2025, 2026]
+
+def test_lru_descarta_el_anio_menos_usado(tmp_path):
+    cargados = []
+    def cargador(anio):
+        cargados.append(anio)
+        return set(), {}
+    cal = CalendarioFestivos(max_anios=2, cargador=cargador)
+    for anio in (2025, 2026, 2025, 2027):
+        cal.tipo_en_fecha(date(anio, 3, 3), "Sevilla")
+    assert list(cal._anios) == [2025, 2027]  # 2026 era el menos usado
+    cal.tipo_en_fecha(date(2026, 3, 3), "Sevilla")
+    assert cargados == [2025, 2026, 2027, 2026]
+    assert list(cal._anios) == [2027, 2026]
+
+def test_festivos_bin_se_recompila_y_lo_comparte_la_instantanea(tmp_path):
+    shutil.copytree("config", tmp_path / "config")
+    base = tmp_path / "data"
+    base.mkdir()
+    _festivos(base, 2025, ["2025-12-08"])
+    assert CalendarioFestivos(base=base).tipo_en_fecha(date(2025, 9, 15), "Sevilla") == "normal"
+    assert (base / NOMBRE_COMPILADO).exists()
+
+    _festivos(base, 2025, ["2025-12-08", "2025-09-15"], [("2025-09-16", "Utrera")])
+    futuro = time.time() + 5  # más reciente que el fichero compilado aunque el reloj sea grueso
+    for p in base.glob("festivos_*.csv"):
+        os.utime(p, (futuro, futuro))
+    inst = cargar_instantanea(tmp_path / "config/reglas.yml", tmp_path / "config/tarifas.xlsx", base,
+                              ruta=tmp_path / "instantanea.json")
+    for cal in (CalendarioFestivos(base=base), inst.calendario("Sevilla")):
+        assert cal.tipo_en_fecha(date(2025, 9, 15), "Sevilla") == "festivo"
+        assert cal.tipo_en_fecha(date(2025, 9, 16), "utrera") == "festivo"
+        assert cal.archivos_leidos == 0  # sin leer los CSV: todo sale de festivos.bin
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import math
+
+import pandas as pd
+
+from app.historial import Historial
+
+def _fila(rango, ini, fin, resultado, irpf, total):
+    return {"Rango": rango, "Fecha inicial + hora inicial": ini, "Fecha final + hora final": fin,
+            "Resultado": resultado, "% IRPF": irpf, "Total día": total,
+            "Municipio": "Sevilla", "Observaciones": ""}
+
+def test_guardia_r5_sin_tarifa_se_guarda_con_importes_null(tmp_path):
+    # Resumen leído del CSV: la tarifa vacía de R5 deja las celdas en blanco
+    filas = [_fila("R1", "2025-03-03 15:00:00", "2025-03-04 08:00:00", "223.21", "10.0", "200.89"),
+             _fila("R5", "2025-03-05 15:00:00", "2025-03-06 08:00:00", "", "10.0", "")]
+    with Historial(tmp_path / "h.sqlite") as h:
+        assert h.guardar(filas, "ana", 2025, 3) == 2
+        r5 = h.con.execute("SELECT bruto, neto FROM guardias WHERE grado = 'R5'").fetchone()
+        ejecucion = h.con.execute("SELECT guardias, horas, bruto, neto FROM ejecuciones").fetchone()
+        total = h.agregados(por=[])
+    assert r5 == (None, None)
+    assert ejecucion == (2, 34.0, 223.21, 200.89)
+    assert total == [{"guardias": 2, "horas": 34.0, "bruto": 223.21, "neto": 200.89}]
+
+def test_guardia_r5_en_dataframe_con_nan(tmp_path):
+    resumen = pd.DataFrame([_fila("R5", "2025-03-05 15:00:00", "2025-03-06 08:00:00", math.nan, 0.0, math.nan)])
+    with Historial(tmp_path / "h.sqlite") as h:
+        h.guardar(resumen, "ana", 2025, 3)
+        assert h.con.execute("SELECT bruto, irpf, neto FROM guardias").fetchone() == (None, 0.0, None)
+        assert h.con.execute("SELECT bruto, neto FROM ejecuciones").fetchone() == (0.0, 0.0)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from app.reglas import cargar_reglas
+from app.tarifas import CargadorTarifas
+from app.calendario import CalendarioFestivos
+from app.calculo import MOTORES, detalle_en_formato
+
+COLUMNAS = ["inicio_datetime", "fin_datetime", "municipio", "tipo_guardia", "grado", "observaciones",
+            "tipo_ini", "tipo_fin"]
+
+SIN_ZONA = [
+    ("2025-03-03 15:00", "2025-03-04 08:00", "Sevilla", "", "R1", ""),
+    ("2025-03-05 09:30", "2025-03-06 09:45", "Utrera", "", "R3", "refuerzo"),
+    ("2025-12-24 20:00", "2025-12-26 08:00", "Dos Hermanas", "", "R2", ""),
+]
+CON_ZONA = [
+    ("2025-03-03T10:00:00+01:00", "2025-03-04T08:30:00+01:00", "Sevilla", "", "R1", ""),
+    # Cruza el cambio de hora: el fin lleva otro offset que el inicio
+    ("2025-03-29T20:15:00+01:00", "2025-03-30T12:00:00+02:00", "Utrera", "", "R2", "cambio de hora"),
+]
+
+# 'tipo_ini'/'tipo_fin' fuerzan el tipo del primer/último día (un valor no reconocido se ignora)
+CON_TIPOS = [
+    ("2025-03-03 15:00", "2025-03-04 08:00", "Sevilla", "", "R1", "", "festivo", ""),
+    ("2025-03-05 15:00", "2025-03-06 08:00", "Sevilla", "", "R2", "", "", "especial"),
+    ("2025-03-07 08:00", "2025-03-07 20:00", "Utrera", "", "R3", "", "especial", ""),
+    ("2025-12-24 20:00", "2025-12-26 08:00", "Dos Hermanas", "", "R4", "", "normal", "festivo"),
+    ("2025-03-10 15:00", "2025-03-11 08:00", "Sevilla", "", "R1", "", "otro", ""),
+]
+
+@pytest.fixture(scope="module")
+def contexto():
+    reglas = cargar_reglas("config/reglas.yml")
+    cal = CalendarioFestivos(reglas=reglas)
+    return reglas, cal, CargadorTarifas("config/tarifas.xlsx")
+
+def _salidas(filas, contexto, modo="horario"):
+    reglas, cal, tarifas = contexto
+    df = pd.DataFrame(filas, columns=COLUMNAS[:len(filas[0])])
+    out = {}
+    for nombre, fn in MOTORES.items():
+        detalle, resumen = fn(df, cal, tarifas, reglas, anio=2025, mes=3)
+        out[nombre] = (detalle_en_formato(detalle, modo, reglas).to_csv(index=False), resumen.to_csv(index=False))
+    return out
+
+@pytest.mark.parametrize("filas", [SIN_ZONA, CON_ZONA, CON_TIPOS], ids=["sin_zona", "con_zona", "con_tipos"])
+def test_motores_dan_el_mismo_detalle_horario_y_resumen(filas, contexto):
+    salidas = _salidas(filas, contexto)
+    assert salidas["vectorizado"] == salidas["iterativo"]
+    assert salidas["intervalos"] == salidas["iterativo"]
+
+def test_tipos_forzados_cambian_el_importe(contexto):
+    sin = _salidas([f[:6] + ("", "") for f in CON_TIPOS], contexto)["vectorizado"][1]
+    con = _salidas(CON_TIPOS, contexto)["vectorizado"][1]
+    brutos = lambda csv: [l.split(",")[3] for l in csv.splitlines()[1:]]
+    cambia = [a != b for a, b in zip(brutos(sin), brutos(con))]
+    assert cambia[:4] == [True, True, True, True] and cambia[4] is False
+
+def test_detalle_horario_con_zona_conserva_el_offset(contexto):
+    detalle = _salidas(CON_ZONA[:1], contexto)["intervalos"][0].splitlines()
+    assert detalle[1].startswith("2025-03-03 10:00:00+01:00,2025-03-03 11:00:00+01:00,")
+    assert detalle[-1].startswith("2025-03-04 08:00:00+01:00,2025-03-04 08:30:00+01:00,")
+
+def test_vacios_como_nan_o_none_equivalen_a_texto_vacio(contexto):
+    con_nan = [(i, f, float("nan"), None, g, float("nan")) for i, f, _, _, g, _ in SIN_ZONA]
+    vacios = [(i, f, "", "", g, "") for i, f, _, _, g, _ in SIN_ZONA]
+    assert _salidas(con_nan, contexto) == _salidas(vacios, contexto)
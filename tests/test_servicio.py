@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import json
+import shutil
+import threading
+import urllib.error
+import urllib.request
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import main
+from app.servicio import Servicio, ServidorCalculo
+
+GUARDIAS = """inicio_datetime,fin_datetime,municipio,tipo_guardia,grado,observaciones
+2025-09-12 15:00,2025-09-13 08:00,Sevilla,,R1,
+2025-09-14 20:00,2025-09-15 09:30,Utrera,,R2,"nota, con coma"
+2025-09-28 09:00,2025-09-28 21:00,dos hermanas,,R4,
+"""
+
+@pytest.fixture
+def servidor():
+    srv = ServidorCalculo(("127.0.0.1", 0), Servicio())
+    hilo = threading.Thread(target=srv.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+def _post(url, cuerpo: bytes, tipo: str):
+    req = urllib.request.Request(url, data=cuerpo, headers={"Content-Type": tipo}, method="POST")
+    try:
+        with urllib.request.urlopen(req) as r:
+            return r.status, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+def test_csv_igual_que_el_cli(servidor, tmp_path, monkeypatch):
+    entrada = tmp_path / "guardias.csv"
+    entrada.write_text(GUARDIAS, encoding="utf-8")
+    monkeypatch.setattr("sys.argv", ["main.py", "--entrada", str(entrada), "--anio", "2025", "--mes", "9",
+                                     "--salida_dir", str(tmp_path / "out"), "--validar", "no"])
+    main.main()
+    for salida in ("detalle", "resumen"):
+        estado, cuerpo = _post(f"{servidor}/calcular?anio=2025&mes=9&salida={salida}",
+                               GUARDIAS.encode("utf-8"), "text/csv")
+        assert estado == 200
+        assert cuerpo == (tmp_path / f"out/{salida}_2025-09.csv").read_bytes()
+
+def test_json(servidor):
+    guardias = [{"inicio_datetime": "2025-09-12 15:00", "fin_datetime": "2025-09-13 08:00",
+                 "municipio": "Sevilla", "grado": "R1"}]
+    estado, cuerpo = _post(f"{servidor}/calcular", json.dumps({"guardias": guardias, "irpf": 15}).encode(),
+                           "application/json")
+    assert estado == 200
+    datos = json.loads(cuerpo)
+    assert len(datos["detalle"]) == 17
+    (fila,) = datos["resumen"]
+    assert (fila["Rango"], fila["Fecha inicial + hora inicial"]) == ("R1", "2025-09-12 15:00:00")
+    assert fila["Resultado"] == pytest.approx(sum(d["importe"] for d in datos["detalle"]))
+    assert fila["Total día"] == pytest.approx(round(fila["Resultado"] * 0.85, 4))
+
+def test_errores_400(servidor):
+    fila = {"inicio_datetime": "2025-09-12 15:00", "fin_datetime": "2025-09-13 08:00", "grado": "R9"}
+    estado, cuerpo = _post(f"{servidor}/calcular", json.dumps([fila]).encode(), "application/json")
+    assert estado == 400 and "R9" in json.loads(cuerpo)["error"]
+    estado, cuerpo = _post(f"{servidor}/calcular", json.dumps([]).encode(), "application/json")
+    assert estado == 400 and "indique anio y mes" in json.loads(cuerpo)["error"]
+
+def test_recarga_al_cambiar_las_tarifas(tmp_path):
+    shutil.copytree("config", tmp_path / "config")
+    tarifas = tmp_path / "config/tarifas.xlsx"
+    servicio = Servicio(tmp_path / "config/reglas.yml", tarifas, "data")
+    guardias = [{"inicio_datetime": "2025-09-12 15:00", "fin_datetime": "2025-09-12 17:00",
+                 "municipio": "Sevilla", "grado": "R1"}]
+    antes = servicio.calcular(pd.DataFrame(guardias), {})[1]["Resultado"].iloc[0]
+    ctx = servicio.contexto()
+
+    wb = openpyxl.load_workbook(tarifas)
+    ws = wb["tarifas"]
+    fila_r1 = next(r for r in ws.iter_rows(min_row=2) if r[0].value == "R1")
+    fila_r1[1].value = float(fila_r1[1].value) + 10
+    wb.save(tarifas)
+
+    despues = servicio.calcular(pd.DataFrame(guardias), {})[1]["Resultado"].iloc[0]
+    assert servicio.contexto() is not ctx and servicio.recargas == 1
+    assert despues == pytest.approx(antes + 20)
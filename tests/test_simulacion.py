@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import json
+import math
+
+import pandas as pd
+import pytest
+
+from app.reglas import cargar_reglas
+from app.tarifas import CargadorTarifas
+from app.calendario import CalendarioFestivos
+from app.calculo import calcular_importes
+from app.simulacion import ACTUAL, filas_informe, simular
+
+COLUMNAS = ["inicio_datetime", "fin_datetime", "municipio", "tipo_guardia", "grado", "observaciones",
+            "tipo_ini", "tipo_fin", "residente"]
+
+SIN_ZONA = [
+    ("2025-03-03 15:00", "2025-03-04 08:00", "Sevilla", "", "R1", "", "", "", "ana"),
+    ("2025-03-05 09:30", "2025-03-06 09:45", "Utrera", "", "R3", "", "festivo", "", "ana"),
+    ("2025-12-24 20:00", "2025-12-26 08:00", "Dos Hermanas", "", "R2", "", "", "especial", "luis"),
+    ("2025-03-07 08:00", "2025-03-07 20:00", "Utrera", "", "R4", "", "especial", "", "luis"),
+    ("2025-03-10 15:00", "2025-03-11 08:00", "Sevilla", "", "R1", "", "otro", "", "eva"),
+]
+CON_ZONA = [
+    ("2025-03-03T10:00:00+01:00", "2025-03-04T08:30:00+01:00", "Sevilla", "", "R1", "", "", "", "ana"),
+    ("2025-03-29T20:15:00+01:00", "2025-03-30T12:00:00+02:00", "Utrera", "", "R2", "", "", "", "luis"),
+    ("2025-10-25T15:00:00+02:00", "2025-10-26T08:00:00+01:00", "Sevilla", "", "R3", "", "", "festivo", "luis"),
+]
+# R5 no tiene tarifa en config/tarifas.xlsx: sus precios son NaN
+MIXTA = [
+    ("2025-03-03 15:00", "2025-03-04 08:00", "Sevilla", "", "R1", "", "", "", "ana"),
+    ("2025-03-05 15:00", "2025-03-06 08:00", "Sevilla", "", "R1", "", "", "", "luis"),
+    ("2025-03-07 15:00", "2025-03-08 08:00", "Sevilla", "", "R5", "", "", "", "luis"),
+    ("2025-03-09 09:00", "2025-03-09 21:00", "Utrera", "", "R2", "", "", "", "eva"),
+]
+
+@pytest.fixture(scope="module")
+def contexto():
+    reglas = cargar_reglas("config/reglas.yml")
+    return reglas, CalendarioFestivos(reglas=reglas), CargadorTarifas("config/tarifas.xlsx")
+
+def _brutos_resumen(df, contexto):
+    """Suma de 'Resultado' de calcular_importes por residente (NaN si alguna guardia no tiene precio)."""
+    reglas, cal, tarifas = contexto
+    _, resumen = calcular_importes(df, cal, tarifas, reglas, anio=2025, mes=3)
+    return resumen["Resultado"].groupby(df["residente"].values).agg(lambda s: s.sum(skipna=False)).to_dict()
+
+@pytest.mark.parametrize("filas", [SIN_ZONA, CON_ZONA], ids=["sin_zona", "con_zona"])
+def test_tarifa_actual_igual_que_calcular_importes(filas, contexto):
+    _, cal, tarifas = contexto
+    df = pd.DataFrame(filas, columns=COLUMNAS)
+    r = simular(df, cal, {ACTUAL: tarifas})
+    esperado = _brutos_resumen(df, contexto)
+    assert dict(zip(r["residentes"], r["bruto"][:, 0].tolist())) == pytest.approx(esperado, abs=1e-6)
+
+def test_precio_vacio_deja_vacio_solo_al_residente_afectado(contexto):
+    _, cal, tarifas = contexto
+    df = pd.DataFrame(MIXTA, columns=COLUMNAS)
+    filas = {f["residente"]: f for f in filas_informe(simular(df, cal, {ACTUAL: tarifas, "otra": tarifas}))}
+    esperado = _brutos_resumen(df, contexto)
+    assert math.isnan(esperado["luis"])
+    assert filas["luis"][ACTUAL] is None and filas["luis"]["otra_dif"] is None
+    for residente in ("ana", "eva"):
+        assert filas[residente][ACTUAL] == pytest.approx(esperado[residente], abs=1e-3)
+        assert filas[residente]["otra_dif"] == 0
+    assert math.isfinite(filas["TOTAL"][ACTUAL])
+    json.dumps(list(filas.values()), allow_nan=False)
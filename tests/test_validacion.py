@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import subprocess
+import sys
+
+import pytest
+
+from app import validacion
+from app.validacion import validar_guardias
+
+FILAS = [
+    {"inicio_datetime": "2025-03-01 08:00", "fin_datetime": "2025-03-02 08:00", "residente": "ana"},
+    {"inicio_datetime": "2025-03-01 20:00", "fin_datetime": "2025-03-02 08:00", "residente": "ana"},
+    {"inicio_datetime": "2025-03-01 20:00", "fin_datetime": "2025-03-02 08:00", "residente": "ana"},
+    {"inicio_datetime": "2025-03-01 20:00", "fin_datetime": "2025-03-02 08:00", "residente": "luis"},
+    {"inicio_datetime": "2025-03-03 15:00", "fin_datetime": "2025-03-03 15:00", "residente": "luis"},
+    {"inicio_datetime": "2025-04-01 15:00", "fin_datetime": "2025-04-02 08:00", "residente": "luis"},
+    {"inicio_datetime": "ayer", "fin_datetime": "2025-03-02 08:00", "residente": "luis"},
+]
+
+def test_incidencias():
+    tipos = [(x["fila"], x["tipo"], x["otra_fila"]) for x in validar_guardias(FILAS, 2025, 3)]
+    assert tipos == [(2, "solape", 1), (3, "duplicado", 2),
+                     (5, "rango_invertido", None), (6, "fuera_de_mes", None), (7, "fecha_invalida", None)]
+
+@pytest.mark.parametrize("umbral", [0, 10**9], ids=["numpy", "python"])
+def test_barridos_equivalentes(monkeypatch, umbral):
+    esperado = validar_guardias(FILAS, 2025, 3)
+    monkeypatch.setattr(validacion, "UMBRAL_NUMPY", umbral)
+    assert validar_guardias(FILAS, 2025, 3) == esperado
+
+def test_validar_entrada_pequena_no_importa_numpy():
+    codigo = ("import sys; from app.validacion import validar_guardias; "
+              f"validar_guardias({FILAS!r}, 2025, 3); print('numpy' in sys.modules)")
+    salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True)
+    assert salida.stdout.strip() == "False"
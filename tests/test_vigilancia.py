@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+
+import pytest
+
+from app.vigilancia import Vigilante
+
+CABECERA = "inicio_datetime,fin_datetime,municipio,tipo_guardia,grado,observaciones\n"
+OPCIONES = {"motor": "vectorizado", "irpf": 0.0, "detalle": "horario", "formato": "csv",
+            "agregados": False, "excel": False, "municipio_default": "Sevilla"}
+
+@pytest.fixture
+def vigilante(tmp_path):
+    shutil.copytree("config", tmp_path / "config")
+    shutil.copytree("data", tmp_path / "data", ignore=shutil.ignore_patterns("festivos.bin"))
+    (tmp_path / "input").mkdir()
+    (tmp_path / "input/a.csv").write_text(CABECERA + "2025-09-12 15:00,2025-09-13 08:00,Sevilla,,R1,\n",
+                                          encoding="utf-8")
+    (tmp_path / "input/b.csv").write_text(CABECERA + "2026-03-02 08:00,2026-03-02 20:00,Sevilla,,R2,\n",
+                                          encoding="utf-8")
+    v = Vigilante(tmp_path / "input", tmp_path / "output", OPCIONES, tmp_path / "config/reglas.yml",
+                  tmp_path / "config/tarifas.xlsx", tmp_path / "data")
+    assert _pasada(v)["calculados"] == [tmp_path / "input/a.csv", tmp_path / "input/b.csv"]
+    return v
+
+def _pasada(v):
+    return v.vigilar(intervalo=0, espera=0, una_vez=True, avisar=lambda _msg: None)
+
+def test_tocar_sin_cambiar_no_recalcula(vigilante):
+    for p in vigilante.entrada.glob("*.csv"):
+        os.utime(p)
+    os.utime(vigilante.rutas_config[1])
+    assert _pasada(vigilante) == {"calculados": [], "errores": [], "retirados": []}
+
+def test_solo_se_recalcula_la_entrada_editada(vigilante):
+    a = vigilante.entrada / "a.csv"
+    with open(a, "a", encoding="utf-8") as f:
+        f.write("2025-09-20 08:00,2025-09-20 20:00,Utrera,,R3,\n")
+    assert _pasada(vigilante)["calculados"] == [a]
+    resumen = (vigilante.salida_dir / "resumen_2025-09_a.csv").read_text(encoding="utf-8")
+    assert "Utrera" in resumen
+
+def test_festivos_de_un_anio_recalculan_solo_sus_entradas(vigilante):
+    b = vigilante.salida_dir / "resumen_2026-03_b.csv"
+    antes = b.read_text(encoding="utf-8")
+    with open(vigilante.rutas_config[2] / "festivos_es_andalucia_2026.csv", "a", encoding="utf-8") as f:
+        f.write("2026-03-02,autonomico,,nuevo\n")
+    assert _pasada(vigilante)["calculados"] == [vigilante.entrada / "b.csv"]
+    assert b.read_text(encoding="utf-8") != antes  # el 2 de marzo pasa a festivo
+    assert _pasada(vigilante)["calculados"] == []  # recompilar festivos.bin no dispara nada
+
+def test_entrada_borrada_se_informa_como_retirada(vigilante):
+    a = vigilante.entrada / "a.csv"
+    a.unlink()
+    r = _pasada(vigilante)
+    assert r["retirados"] == [a] and r["calculados"] == []
+    assert str(a) not in vigilante.estado["entradas"]
+    assert (vigilante.salida_dir / "resumen_2025-09_a.csv").exists()  # las salidas se conservan